@@ -0,0 +1,49 @@
+# app/db/config.py
+from typing import Optional
+
+from pydantic import model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+# SQLite local con DB_MODO=sqlite cuando no hay DATABASE_URL (desarrollo y benchmarks)
+SQLITE_POR_DEFECTO = "sqlite+aiosqlite:///./artificial.db"
+
+
+# ---------------------------------------------------------------------
+# Configuración tipada del motor (variables de entorno o .env)
+# ---------------------------------------------------------------------
+class ConfiguracionDB(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    database_url: Optional[str] = None
+    db_modo: Optional[str] = None               # "sqlite": habilita SQLite (con migraciones al arrancar), nunca por defecto
+    database_replica_url: Optional[str] = None  # Réplica de lectura opcional para los GET
+    db_echo: bool = False                       # Loguear cada sentencia SQL
+    db_pool_size: int = 5
+    db_max_overflow: int = 5
+    db_pool_timeout: float = 30                 # Segundos esperando una conexión libre
+    db_pool_recycle: int = 300                  # Renovar conexiones antes de que el servidor las corte
+    db_pre_ping: bool = False                   # Un round trip extra por checkout; con recycle no suele hacer falta
+    db_statement_cache_size: Optional[int] = None  # Cache de sentencias preparadas de asyncpg (0 con pgbouncer)
+    db_ssl: bool = True                         # Render exige TLS en Postgres
+    db_lectura_ventana: float = 5               # Tras escribir, ese cliente lee de la primaria (read-your-writes)
+    db_replica_reintento: float = 30            # Segundos sin usar una réplica caída antes de volver a probarla
+    db_replica_ping: float = 10                 # Cada cuánto se confirma con SELECT 1 que la réplica responde
+    db_migrar_al_iniciar: bool = False          # Aplicar migraciones pendientes al arrancar (siempre en SQLite)
+
+    # Sin DATABASE_URL no se cae en silencio a SQLite: en producción eso sería una base vacía que se migra sola
+    @model_validator(mode="after")
+    def _sqlite_explicito(self) -> "ConfiguracionDB":
+        if self.db_modo == "sqlite":
+            self.database_url = self.database_url or SQLITE_POR_DEFECTO
+        elif not self.database_url:
+            raise ValueError("DATABASE_URL no está definida (DB_MODO=sqlite para usar SQLite local)")
+        elif self.database_url.startswith("sqlite"):
+            raise ValueError("DATABASE_URL apunta a SQLite: requiere DB_MODO=sqlite (sólo desarrollo y benchmarks)")
+        return self
+
+    @property
+    def es_sqlite(self) -> bool:
+        return self.database_url.startswith("sqlite")
+
+
+config_db = ConfiguracionDB()
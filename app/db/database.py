@@ -1,9 +1,17 @@
 # app/db/database.py
-import os
 import ssl
+import time
+import logging
 from dotenv import load_dotenv
+from sqlalchemy import MetaData, event, exc
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, StaticPool
+
+from app.db.config import config_db
+from app.utils.instrumentacion import instrumentar_motor, registrar_espera_pool
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------
 # Cargar variables de entorno
@@ -16,34 +24,135 @@ load_dotenv()
 def _normalize_url(url: str) -> str:
     if not url:
         raise RuntimeError("DATABASE_URL no está definida")
+    if url.startswith("sqlite"):
+        return url
     # Si llega con el prefijo viejo, normalizar a asyncpg
     if url.startswith("postgres://"):
         url = url.replace("postgres://", "postgresql+asyncpg://", 1)
     # Asegurar SSL para asyncpg (Render lo exige)
-    if "ssl=" not in url and "sslmode=" not in url:
+    if config_db.db_ssl and "ssl=" not in url and "sslmode=" not in url:
         url += ("&" if "?" in url else "?") + "ssl=true"
     return url
 
+
+# Pool que mide cuánto espera cada checkout por una conexión libre
+class PoolMedido(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metricas = {"checkouts": 0, "espera_total_ms": 0.0, "espera_max_ms": 0.0, "timeouts": 0}
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metricas["timeouts"] += 1
+            raise
+        finally:
+            espera = (time.perf_counter() - inicio) * 1000
+            self.metricas["checkouts"] += 1
+            self.metricas["espera_total_ms"] += espera
+            self.metricas["espera_max_ms"] = max(self.metricas["espera_max_ms"], espera)
+            registrar_espera_pool(espera)
+
+
+def _connect_args(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {"check_same_thread": False} if ":memory:" in url else {}
+    connect_args = {}
+    if config_db.db_ssl:
+        connect_args["ssl"] = ssl.create_default_context()  # Contexto TLS explícito (verifica CA y hostname)
+    if config_db.db_statement_cache_size is not None:
+        connect_args["statement_cache_size"] = config_db.db_statement_cache_size
+    return connect_args
+
+
+def _opciones_motor(url: str) -> dict:
+    opciones = {"connect_args": _connect_args(url)}
+
+    if url.startswith("sqlite"):
+        if ":memory:" in url:
+            # Una sola conexión compartida: cada conexión nueva sería otra base vacía
+            opciones.update(poolclass=StaticPool)
+            return opciones
+        opciones.update(poolclass=PoolMedido, pool_size=config_db.db_pool_size,
+                        max_overflow=config_db.db_max_overflow, pool_timeout=config_db.db_pool_timeout)
+        return opciones
+
+    opciones.update(
+        poolclass=PoolMedido,
+        pool_pre_ping=config_db.db_pre_ping,
+        pool_size=config_db.db_pool_size,
+        max_overflow=config_db.db_max_overflow,
+        pool_timeout=config_db.db_pool_timeout,
+        pool_recycle=config_db.db_pool_recycle,
+    )
+    return opciones
+
 # ---------------------------------------------------------------------
 # Configuración DB
 # ---------------------------------------------------------------------
-raw_url = os.getenv("DATABASE_URL", "")
-DATABASE_URL = _normalize_url(raw_url)
-
-print("🔗 Conectando a la base de datos externa en Render")
-
-# Contexto TLS explícito (verifica CA y hostname)
-_ssl_ctx = ssl.create_default_context()
-
-# Motor asincrónico SQLAlchemy + asyncpg
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=True,                      # logs SQL en consola
-    connect_args={"ssl": _ssl_ctx}, # <- clave para Render + asyncpg
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=5,
-)
+DATABASE_URL = _normalize_url(config_db.database_url)
+
+if config_db.es_sqlite:
+    logger.info("🔗 Usando SQLite local (%s)", DATABASE_URL)
+else:
+    logger.info("🔗 Conectando a la base de datos externa en Render")
+
+# DB_ECHO sube el nivel del logger en vez de usar echo=True, que agrega su propio handler
+# escribiendo a stdout en el mismo hilo; así las sentencias también pasan por la cola de logs
+if config_db.db_echo:
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+
+
+# SQLite no aplica claves foráneas (ni ON DELETE CASCADE) salvo que se active por conexión
+def _activar_claves_foraneas(conexion, _registro):
+    cursor = conexion.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _crear_motor(url: str, **opciones):
+    motor = create_async_engine(url, **(opciones or _opciones_motor(url)))
+    if url.startswith("sqlite"):
+        event.listen(motor.sync_engine, "connect", _activar_claves_foraneas)
+    instrumentar_motor(motor)
+    return motor
+
+
+# Motor sin pool para Alembic (puede correr en otro event loop que el de la app)
+def motor_para_migraciones():
+    return _crear_motor(DATABASE_URL, poolclass=NullPool, connect_args=_connect_args(DATABASE_URL))
+
+
+# Motor asincrónico SQLAlchemy (asyncpg o aiosqlite)
+engine = _crear_motor(DATABASE_URL)
+
+# Réplica de lectura opcional: la usan los GET a través de app.db.dependency.get_db (SesionLectura)
+engine_lectura = None
+if config_db.database_replica_url:
+    engine_lectura = _crear_motor(_normalize_url(config_db.database_replica_url))
+    logger.info("🔗 Réplica de lectura configurada")
+
+
+# Estado actual del pool: conexiones en uso, overflow y espera por checkout
+def estado_pool(motor=None) -> dict:
+    pool = (motor or engine).pool
+    estado = {"clase": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        estado.update(
+            tamano=pool.size(),
+            en_uso=pool.checkedout(),
+            libres=pool.checkedin(),
+            overflow=max(0, pool.overflow()),  # Negativo mientras no se pase de pool_size
+            max_overflow=config_db.db_max_overflow,
+        )
+    metricas = getattr(pool, "metricas", None)
+    if metricas:
+        estado.update(metricas)
+        if metricas["checkouts"]:
+            estado["espera_media_ms"] = round(metricas["espera_total_ms"] / metricas["checkouts"], 3)
+    return estado
 
 # Session factory asincrónica
 SessionLocal = sessionmaker(
@@ -54,5 +163,9 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
-# Base para modelos ORM
-Base = declarative_base()
+# Base para modelos ORM; los nombres de PK y FK siguen los que genera Postgres, así coinciden con las migraciones
+Base = declarative_base(metadata=MetaData(naming_convention={
+    "ix": "ix_%(column_0_label)s",
+    "pk": "%(table_name)s_pkey",
+    "fk": "%(table_name)s_%(column_0_name)s_fkey",
+}))
@@ -1,10 +1,139 @@
 # app/db/dependency.py
 
-from typing import AsyncGenerator
+import time
+import logging
+from collections import OrderedDict
+from typing import AsyncGenerator, Optional
+from fastapi import Request
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.database import SessionLocal
+from sqlalchemy.orm import Session, sessionmaker
+from app.db.config import config_db
+from app.db.database import SessionLocal, engine, engine_lectura
+from app.utils.jwt import verificar_token
 
-# Dependencia para obtener una sesión de base de datos asincrónica
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+logger = logging.getLogger(__name__)
+
+METODOS_LECTURA = ("GET", "HEAD")
+_MAX_CLIENTES = 10000
+
+
+# Errores que indican que la réplica no responde (no los de una consulta en particular)
+def _es_desconexion(error: Exception) -> bool:
+    if isinstance(error, exc.DBAPIError):
+        return error.connection_invalidated or isinstance(error, (exc.OperationalError, exc.InterfaceError))
+    return isinstance(error, OSError)
+
+
+# Decide si un request puede leer de la réplica y recuerda quién escribió hace poco
+class RuteoLecturas:
+    def __init__(self):
+        self._escrituras: "OrderedDict[str, float]" = OrderedDict()
+        self._caida_hasta = 0.0
+        self._verificada_hasta = 0.0
+        self.metricas = {"replica": 0, "primaria": 0, "read_your_writes": 0, "caidas": 0, "pings": 0}
+
+    # Cliente identificado por el sujeto (email) de su token; los anónimos no se distinguen entre sí
+    # (detrás de un proxy comparten IP), así que no se registran
+    def sujeto(self, request: Request) -> Optional[str]:
+        esquema, _, token = request.headers.get("authorization", "").partition(" ")
+        if esquema.lower() != "bearer" or not token:
+            return None
+        payload = verificar_token(token)
+        return payload.get("sub") if payload else None
+
+    def registrar_escritura(self, sujeto: Optional[str]) -> None:
+        if not sujeto:
+            return
+        self._escrituras[sujeto] = time.monotonic()
+        self._escrituras.move_to_end(sujeto)
+        while len(self._escrituras) > _MAX_CLIENTES:
+            self._escrituras.popitem(last=False)
+
+    def usar_replica(self, request: Request) -> bool:
+        if engine_lectura is None or request.method not in METODOS_LECTURA:
+            return False
+        if time.monotonic() < self._caida_hasta:
+            return False
+        sujeto = self.sujeto(request)
+        escritura = self._escrituras.get(sujeto) if sujeto else None
+        if escritura is not None and time.monotonic() - escritura < config_db.db_lectura_ventana:
+            self.metricas["read_your_writes"] += 1
+            return False
+        return True
+
+    def marcar_caida(self, error: Exception) -> None:
+        self._caida_hasta = time.monotonic() + config_db.db_replica_reintento
+        self._verificada_hasta = 0.0
+        self.metricas["caidas"] += 1
+        logger.warning("⚠️ Réplica de lectura no disponible, se usa la primaria: %s", error)
+
+    # True si la réplica respondió un SELECT 1 hace menos de DB_REPLICA_PING segundos (si no, lo prueba ahora).
+    # Corre dentro del greenlet de la sesión: el motor sincrónico puede conectarse desde acá.
+    def replica_disponible(self) -> bool:
+        ahora = time.monotonic()
+        if ahora < self._caida_hasta:
+            return False
+        if ahora < self._verificada_hasta:
+            return True
+        self._verificada_hasta = ahora + config_db.db_replica_ping  # Un solo ping aunque lleguen varios juntos
+        self.metricas["pings"] += 1
+        try:
+            with engine_lectura.sync_engine.connect() as conexion:
+                conexion.exec_driver_sql("SELECT 1")
+        except Exception as e:
+            self.marcar_caida(e)
+            return False
+        return True
+
+
+ruteo_lecturas = RuteoLecturas()
+
+
+# Al emitir un token (registro o login): el primer GET con ese token va a la primaria, que ya tiene
+# lo que se acaba de escribir aunque la réplica todavía no lo haya recibido
+def registrar_escritura_de(sujeto: str) -> None:
+    ruteo_lecturas.registrar_escritura(sujeto)
+
+
+# Sesión de los GET: no toma conexión hasta la primera consulta (los hits del cache del muro y los 304
+# no pasan por el pool) y en ese momento elige la réplica si responde, si no la primaria
+class SesionLectura(Session):
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        motor = self.info.get("motor")
+        if motor is None:
+            replica = ruteo_lecturas.replica_disponible()
+            ruteo_lecturas.metricas["replica" if replica else "primaria"] += 1
+            self.info["replica"] = replica
+            motor = self.info["motor"] = engine_lectura.sync_engine if replica else engine.sync_engine
+        return motor
+
+
+SessionLectura = sessionmaker(
+    class_=AsyncSession,
+    sync_session_class=SesionLectura,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+# Única dependencia de sesión: routers y dependencias de autenticación la comparten,
+# así FastAPI la resuelve una vez y cada request usa como mucho una conexión del pool.
+# Los GET van a la réplica (si hay) salvo que el dueño del token haya escrito hace poco.
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    if ruteo_lecturas.usar_replica(request):
+        async with SessionLectura() as session:
+            try:
+                yield session
+            except Exception as e:
+                # La réplica se cayó en medio del request: los siguientes van a la primaria
+                if session.info.get("replica") and _es_desconexion(e):
+                    ruteo_lecturas.marcar_caida(e)
+                raise
+        return
+
+    ruteo_lecturas.metricas["primaria"] += 1
     async with SessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+    if request.method not in METODOS_LECTURA:
+        ruteo_lecturas.registrar_escritura(ruteo_lecturas.sujeto(request))
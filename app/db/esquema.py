@@ -0,0 +1,59 @@
+# app/db/esquema.py
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.db.config import config_db
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+def _config_alembic() -> Config:
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    config.attributes["configurar_logging"] = False  # No pisar el logging de la app
+    return config
+
+
+# Última migración del repositorio (se lee de los archivos, sin tocar la base)
+def version_esperada() -> str:
+    return ScriptDirectory.from_config(_config_alembic()).get_current_head()
+
+
+# Versión aplicada en la base, o None si nunca se migró
+async def version_actual() -> Optional[str]:
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+        except DBAPIError:
+            return None
+        return result.scalar_one_or_none()
+
+
+# Una sola consulta al arrancar en lugar de create_all. En SQLite (DB_MODO=sqlite) o con DB_MIGRAR_AL_INICIAR
+# se aplican las migraciones pendientes; en el resto hay que correr `alembic upgrade head` antes del deploy.
+async def verificar_esquema() -> None:
+    esperada = version_esperada()
+    actual = await version_actual()
+    if actual == esperada:
+        logger.info("✅ Esquema de la base al día (%s)", actual)
+        return
+
+    if config_db.db_migrar_al_iniciar or config_db.es_sqlite:
+        logger.info("🛠️ Migrando esquema de %s a %s...", actual or "vacío", esperada)
+        await asyncio.to_thread(command.upgrade, _config_alembic(), "head")
+        return
+
+    raise RuntimeError(
+        f"Esquema de la base en {actual or 'sin versión'}, se esperaba {esperada}: ejecutar `alembic upgrade head`"
+    )
@@ -1,18 +1,26 @@
 # Imports estándar
 import os
-import logging
 from pathlib import Path
 
 # Imports de terceros
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import cloudinary
 
 # Imports internos
-from app.routers import usuarios, obras
-from app.db.database import engine, Base
+from app.utils.logs import configurar_logging
+
+# Logging antes que el resto de los imports: algunos módulos ya loguean al importarse
+configurar_logging()
+
+from app.routers import usuarios, obras, interno, imagenes, metricas
+from app.db.esquema import verificar_esquema
+from app.utils.instrumentacion import InstrumentacionMiddleware
+from app.services.generador import cerrar_horde_client
+from app.services.cola import cola_generacion
+from app.services.ingesta import ingesta_imagenes
+from app.services.google_auth import verificador_google
 
 # Cargar variables de entorno desde .env
 load_dotenv()
@@ -23,11 +31,17 @@ app = FastAPI()
 # Incluir routers
 app.include_router(usuarios.router, prefix="/usuarios")
 app.include_router(obras.router, prefix="/obras")
+app.include_router(interno.router, prefix="/interno")
+app.include_router(imagenes.router, prefix="/imagenes")
+app.include_router(metricas.router)
 
-# Configurar logging
-logging.basicConfig(level=logging.DEBUG)
-
-cloudinary.config(secure=True)
+# Cloudinary: credenciales explícitas (la librería lee el entorno al importarse, antes de load_dotenv)
+cloudinary.config(
+    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+    api_key=os.getenv("CLOUDINARY_API_KEY"),
+    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+    secure=True,
+)
 
 # Configuración de CORS
 allowed_origins = os.getenv(
@@ -36,10 +50,21 @@ allowed_origins = os.getenv(
 ).split(",")
 
 @app.on_event("startup")
-async def crear_tablas_si_no_existen():
-    async with engine.begin() as conn:
-        print("🛠️ Creando tablas si no existen...")
-        await conn.run_sync(Base.metadata.create_all)
+async def verificar_esquema_de_la_base():
+    await verificar_esquema()
+
+
+@app.on_event("startup")
+async def iniciar_cola_generacion():
+    await cola_generacion.iniciar()
+
+
+@app.on_event("shutdown")
+async def cerrar_clientes_externos():
+    await cola_generacion.detener()
+    await cerrar_horde_client()
+    await ingesta_imagenes.cerrar()
+    await verificador_google.cerrar()
 
 
 app.add_middleware(
@@ -50,11 +75,11 @@ app.add_middleware(
     allow_headers=["*"],  # Permitir todos los encabezados (incluido Authorization)
 )
 
+# Server-Timing, histogramas de /metrics y log de requests lentos (el más externo: mide todo)
+app.add_middleware(InstrumentacionMiddleware)
+
 # Directorio de salida para imágenes generadas
 output_path = Path(__file__).resolve().parents[1] / "output"
 os.makedirs(output_path, exist_ok=True)
 
-# Montar carpeta estática para servir imágenes
-app.mount("/imagenes", StaticFiles(directory=output_path), name="imagenes")
-
 # Ejecutar con: uvicorn app.main:app --reload
\ No newline at end of file
@@ -0,0 +1,22 @@
+# Imports estándar
+from datetime import datetime
+
+# Imports de terceros
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger
+
+# Imports internos
+from app.db.database import Base
+
+
+# Modelo de la tabla "blobs_imagen" (índice hash SHA-256 -> imagen almacenada)
+class BlobImagen(Base):
+    __tablename__ = "blobs_imagen"
+
+    # Columnas de la tabla
+    hash = Column(String(64), primary_key=True)
+    url = Column(String, nullable=False, unique=True, index=True)
+    almacen = Column(String, nullable=False)     # local | cloudinary
+    ubicacion = Column(String, nullable=False)   # nombre de archivo o public_id
+    tamano = Column(BigInteger, nullable=False)
+    referencias = Column(Integer, default=0, nullable=False)
+    fecha = Column(DateTime, default=datetime.utcnow)
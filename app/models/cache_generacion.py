@@ -0,0 +1,18 @@
+# Imports estándar
+from datetime import datetime
+
+# Imports de terceros
+from sqlalchemy import Column, String, DateTime
+
+# Imports internos
+from app.db.database import Base
+
+
+# Modelo de la tabla "cache_generaciones" (prompt normalizado -> URL de la imagen)
+class CacheGeneracion(Base):
+    __tablename__ = "cache_generaciones"
+
+    # Columnas de la tabla
+    clave = Column(String, primary_key=True)
+    url = Column(String, nullable=False)
+    fecha = Column(DateTime, default=datetime.utcnow, nullable=False)
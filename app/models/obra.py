@@ -3,7 +3,7 @@ from datetime import datetime
 import uuid
 
 # Imports de terceros
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Index, Integer
 from sqlalchemy.orm import relationship
 
 # Imports internos
@@ -23,6 +23,18 @@ class Obra(Base):
     fecha = Column(DateTime, default=datetime.utcnow)
     autor_id = Column(String, ForeignKey("usuarios.id"))
 
+    # Agregados de valoraciones mantenidos al valorar (evitan el GROUP BY en cada listado)
+    suma_puntuacion = Column(Integer, default=0, server_default="0", nullable=False)
+    cantidad_valoraciones = Column(Integer, default=0, server_default="0", nullable=False)
+
     # Relaciones con otras tablas
     autor = relationship("Usuario", back_populates="obrasPropias")
-    valoraciones = relationship("Valoracion", back_populates="obra", cascade="all, delete")
\ No newline at end of file
+    # Las valoraciones las borra la base (ON DELETE CASCADE), sin cargarlas una por una
+    valoraciones = relationship("Valoracion", back_populates="obra", cascade="all, delete", passive_deletes=True)
+
+    # Índices para la paginación por (fecha, id) del muro, mis obras y el listado completo
+    __table_args__ = (
+        Index("ix_obras_publicada_fecha_id", publicada, fecha.desc(), id.desc()),
+        Index("ix_obras_autor_fecha_id", autor_id, fecha.desc(), id.desc()),
+        Index("ix_obras_fecha_id", fecha.desc(), id.desc()),
+    )
\ No newline at end of file
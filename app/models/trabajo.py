@@ -0,0 +1,36 @@
+# Imports estándar
+from datetime import datetime
+import uuid
+
+# Imports de terceros
+from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey
+
+# Imports internos
+from app.db.database import Base
+
+# Estados posibles de un trabajo de generación
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_PROCESANDO = "procesando"
+ESTADO_COMPLETADO = "completado"
+ESTADO_FALLIDO = "fallido"
+
+
+# Modelo de la tabla "trabajos_generacion"
+class TrabajoGeneracion(Base):
+    __tablename__ = "trabajos_generacion"
+
+    # Columnas de la tabla
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    estado = Column(String, default=ESTADO_PENDIENTE, index=True, nullable=False)
+    nombre = Column(String)
+    descripcion = Column(String)
+    tipoArte = Column(String)
+    prompt = Column(String, nullable=False)
+    solo_generar = Column(Boolean, default=False)
+    usar_cache = Column(Boolean, default=True)
+    archivoJPG = Column(String, nullable=True)
+    obra_id = Column(String, nullable=True)  # Sin FK: la obra puede borrarse después
+    error = Column(String, nullable=True)
+    autor_id = Column(String, ForeignKey("usuarios.id"))
+    fecha = Column(DateTime, default=datetime.utcnow)
+    actualizado = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,5 +1,5 @@
 # Imports de terceros
-from sqlalchemy import Column, Integer, ForeignKey, String, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, String, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 
 # Imports internos
@@ -16,14 +16,15 @@ class Valoracion(Base):
     # Columnas de la tabla
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     puntuacion = Column(Integer, nullable=False)
-    obra_id = Column(String, ForeignKey("obras.id"))
+    obra_id = Column(String, ForeignKey("obras.id", ondelete="CASCADE"))
     usuario_id = Column(String, ForeignKey("usuarios.id"))
 
     # Relaciones con otras tablas
     obra = relationship("Obra", back_populates="valoraciones")
     usuario = relationship("Usuario", back_populates="valoraciones")
 
-    # Restricciones únicas
+    # Restricciones únicas e índices (la única ya sirve de índice por obra_id)
     __table_args__ = (
         UniqueConstraint("obra_id", "usuario_id", name="una_valoracion_por_usuario"),
+        Index("ix_valoraciones_usuario_id", "usuario_id"),
     )
\ No newline at end of file
@@ -0,0 +1,143 @@
+# Imports estándar
+import os
+import asyncio
+import hashlib
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Imports de terceros
+import aiofiles
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+# Imports internos
+from app.services.almacen import OUTPUT_DIR
+from app.services.derivados import obtener_derivado
+
+router = APIRouter()
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+_CHUNK = 64 * 1024
+
+# ETag fuerte por archivo, recalculado sólo si cambia tamaño o fecha de modificación
+_etags: Dict[Tuple[str, int, int], str] = {}
+
+
+def _calcular_etag(ruta: Path) -> str:
+    digest = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(_CHUNK), b""):
+            digest.update(bloque)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+async def _etag(ruta: Path, stat: os.stat_result) -> str:
+    clave = (str(ruta), stat.st_size, stat.st_mtime_ns)
+    etag = _etags.get(clave)
+    if etag is None:
+        etag = await asyncio.to_thread(_calcular_etag, ruta)
+        _etags[clave] = etag
+    return etag
+
+
+# Interpreta un único rango "bytes=inicio-fin" (devuelve None si no aplica)
+def _rango(cabecera: str, tamano: int) -> Optional[Tuple[int, int]]:
+    if not cabecera.startswith("bytes=") or "," in cabecera:
+        return None
+    inicio_txt, _, fin_txt = cabecera[6:].strip().partition("-")
+    try:
+        if inicio_txt == "":
+            largo = int(fin_txt)
+            if largo <= 0:
+                raise ValueError
+            return max(0, tamano - largo), tamano - 1
+        inicio = int(inicio_txt)
+        fin = int(fin_txt) if fin_txt else tamano - 1
+    except ValueError:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{tamano}"})
+    if inicio >= tamano or fin < inicio:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{tamano}"})
+    return inicio, min(fin, tamano - 1)
+
+
+# If-Modified-Since: True si el archivo no cambió desde esa fecha (se ignora si no se puede interpretar)
+def _no_modificado_desde(cabecera: str, mtime: float) -> bool:
+    try:
+        fecha = parsedate_to_datetime(cabecera)
+    except (TypeError, ValueError):
+        return False
+    return fecha.tzinfo is not None and int(mtime) <= fecha.timestamp()
+
+
+async def _leer(ruta: Path, inicio: int, largo: int):
+    async with aiofiles.open(ruta, "rb") as archivo:
+        await archivo.seek(inicio)
+        restante = largo
+        while restante > 0:
+            bloque = await archivo.read(min(_CHUNK, restante))
+            if not bloque:
+                break
+            restante -= len(bloque)
+            yield bloque
+
+
+# Sirve un archivo con ETag fuerte, caché inmutable, GET condicional (ETag o fecha) y rangos
+async def _servir(request: Request, ruta: Path) -> Response:
+    stat = ruta.stat()
+    etag = await _etag(ruta, stat)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+    }
+
+    # If-None-Match manda; If-Modified-Since sólo se mira si el cliente no mandó ETag
+    si_no_coincide = request.headers.get("if-none-match")
+    if si_no_coincide:
+        if si_no_coincide.strip() == "*" or etag in [e.strip() for e in si_no_coincide.split(",")]:
+            return Response(status_code=304, headers=headers)
+    elif _no_modificado_desde(request.headers.get("if-modified-since", ""), stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(ruta.name)[0] or "application/octet-stream"
+    rango = None
+    cabecera_rango = request.headers.get("range")
+    si_rango = request.headers.get("if-range")
+    if cabecera_rango and (not si_rango or si_rango.strip() == etag):
+        rango = _rango(cabecera_rango, stat.st_size)
+
+    if rango is None:
+        inicio, largo, status_code = 0, stat.st_size, 200
+    else:
+        inicio, fin = rango
+        largo, status_code = fin - inicio + 1, 206
+        headers["Content-Range"] = f"bytes {inicio}-{fin}/{stat.st_size}"
+    headers["Content-Length"] = str(largo)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(_leer(ruta, inicio, largo), status_code=status_code, headers=headers, media_type=media_type)
+
+
+# 🖼️ Derivado (miniatura / mediana / completa) en webp o jpg, generado la primera vez que se pide
+@router.api_route("/{tamano}/{nombre}", methods=["GET", "HEAD"])
+async def servir_derivado(tamano: str, nombre: str, request: Request):
+    base, _, formato = nombre.rpartition(".")
+    if not base or base.startswith("."):
+        raise HTTPException(status_code=404, detail="Imagen no encontrada")
+    ruta = await obtener_derivado(base, tamano, formato.lower())
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="Imagen no encontrada")
+    return await _servir(request, ruta)
+
+
+# 🖼️ Imagen original
+@router.api_route("/{nombre}", methods=["GET", "HEAD"])
+async def servir_original(nombre: str, request: Request):
+    ruta = OUTPUT_DIR / nombre
+    if nombre.startswith(".") or not ruta.is_file():
+        raise HTTPException(status_code=404, detail="Imagen no encontrada")
+    return await _servir(request, ruta)
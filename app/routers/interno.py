@@ -0,0 +1,68 @@
+# Imports de terceros
+from fastapi import APIRouter, Depends
+
+# Imports internos
+from app.db.database import estado_pool, engine_lectura
+from app.db.dependency import ruteo_lecturas
+from app.services.generador import get_horde_client
+from app.services.cache import cache_generaciones
+from app.services.almacen import metricas_almacen
+from app.services.cache_muro import cache_muro
+from app.services.google_auth import verificador_google
+from app.utils.auth import cache_usuarios, verificar_acceso_interno
+from app.utils.logs import estado_logging
+
+# Métricas operativas: sólo con el secreto compartido (INTERNO_TOKEN)
+router = APIRouter(dependencies=[Depends(verificar_acceso_interno)])
+
+
+# 📈 Contadores del poller compartido de Stable Horde
+@router.get("/horde")
+async def metricas_horde():
+    return get_horde_client().poller.metricas
+
+
+# 📈 Aciertos y coalescencias del cache de generaciones
+@router.get("/cache-generaciones")
+async def metricas_cache_generaciones():
+    return cache_generaciones.metricas
+
+
+# 📈 Subidas evitadas por deduplicación de imágenes
+@router.get("/almacen")
+async def metricas_imagenes():
+    return metricas_almacen
+
+
+# 📈 Aciertos, 304 e invalidaciones del cache del muro público
+@router.get("/muro")
+async def metricas_muro():
+    return cache_muro.estado()
+
+
+# 📈 Tasa de aciertos del cache de usuarios autenticados
+@router.get("/auth")
+async def metricas_auth():
+    return cache_usuarios.estado()
+
+
+# 📈 Verificaciones de ID tokens de Google y descargas de certificados
+@router.get("/google")
+async def metricas_google():
+    return verificador_google.metricas
+
+
+# 📈 Conexiones en uso, overflow y espera por checkout del pool de la base
+@router.get("/pool")
+async def metricas_pool():
+    estado = estado_pool()
+    if engine_lectura is not None:
+        estado["replica"] = estado_pool(engine_lectura)
+    estado["ruteo"] = ruteo_lecturas.metricas
+    return estado
+
+
+# 📈 Modo del logging, registros pendientes en la cola y eventos muestreados
+@router.get("/logs")
+async def metricas_logs():
+    return estado_logging()
@@ -0,0 +1,16 @@
+# Imports de terceros
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+# Imports internos
+from app.utils.instrumentacion import metricas_prometheus
+from app.utils.auth import verificar_acceso_interno
+
+# Métricas operativas: sólo con el secreto compartido (INTERNO_TOKEN)
+router = APIRouter(dependencies=[Depends(verificar_acceso_interno)])
+
+
+# 📈 Histogramas por ruta en formato Prometheus
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metricas():
+    return PlainTextResponse(metricas_prometheus(), media_type="text/plain; version=0.0.4")
@@ -1,99 +1,131 @@
 # Imports estándar
 import os
-import time
-from typing import List, Optional
-from math import floor
-import traceback
-import uuid
+from typing import List, Optional, Union
 
 # Imports de terceros
-import cloudinary
-import cloudinary.uploader
-import requests
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import RedirectResponse
-from fastapi.security import HTTPBearer
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, RedirectResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
-from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
 # Imports internos
 from app.db.database import SessionLocal
+from app.db.dependency import get_db
 from app.models.obra import Obra
 from app.models.usuario import Usuario
 from app.models.valoracion import Valoracion
-from app.schemas.obra import ObraCreate, ObraOut, ObraSimple
-from app.services.generador import generar_imagen
-from app.utils.jwt import verificar_token
-from app.utils.auth import get_current_user, get_current_user_optional
+from app.models.trabajo import TrabajoGeneracion
+from app.schemas.obra import ObraCreate, ObraOut, ObraSimple, PaginaObras, PaginaObrasSimple
+from app.schemas.trabajo import TrabajoOut
+from app.services.cola import cola_generacion
+from app.services.ingesta import ingesta_imagenes, IngestaError
+from app.services.almacen import sumar_referencia
+from app.services.borrado import eliminar_obras, informar_progreso
+from app.services.cache_muro import cache_muro, serializar, calcular_etag
+from app.services.derivados import urls_derivados
+from app.services.valoraciones import sumar_valoracion, sumar_valoraciones, insertar_valoraciones, promedio_truncado
+from app.utils.auth import UsuarioActual, get_current_user, get_current_user_optional
+from app.utils.paginacion import paginar_por_fecha, cortar_pagina, LIMITE_POR_DEFECTO, LIMITE_MAXIMO
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Cloudinary configuración
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True,
-)
-
 router = APIRouter()
-oauth2_scheme = HTTPBearer()
-API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+EXPORTACION_LOTE = int(os.getenv("EXPORTACION_LOTE", 1000))
 
 
 class ValoracionRequest(BaseModel):
     puntuacion: int
 
 
-async def get_db():
-    async with SessionLocal() as session:
-        yield session
+class ValoracionLoteItem(BaseModel):
+    obra_id: str
+    puntuacion: int
+
+
+class ValoracionLoteRequest(BaseModel):
+    valoraciones: List[ValoracionLoteItem] = Field(..., min_length=1, max_length=500)
+
+
+# Columnas que usan los feeds: se leen como tuplas, sin hidratar objetos Obra
+COLUMNAS_FEED = (
+    Obra.id, Obra.nombre, Obra.descripcion, Obra.tipoArte, Obra.archivoJPG, Obra.publicada,
+    Obra.fecha, Obra.autor_id, Usuario.userName, Obra.suma_puntuacion, Obra.cantidad_valoraciones,
+)
+
+
+# Fila de COLUMNAS_FEED -> item con la forma de ObraOut, listo para orjson
+def _item_feed(fila) -> dict:
+    obra_id, nombre, descripcion, tipo_arte, archivo, publicada, fecha, autor_id, autor_nombre, suma, cantidad = fila
+    return {
+        "id": obra_id,
+        "nombre": nombre,
+        "descripcion": descripcion,
+        "tipoArte": tipo_arte,
+        "archivoJPG": archivo,
+        "publicada": publicada,
+        "fecha": fecha,
+        "autor_id": autor_id,
+        "autor_nombre": autor_nombre,
+        "promedio_valoracion": promedio_truncado(suma, cantidad),
+        "cantidad_valoraciones": cantidad,
+        "ya_valorada": False,
+        "derivados": urls_derivados(archivo),
+    }
 
 
 # 🚀 Generar y subir imagen
 @router.post("/generar")
 async def generar_obra(
     obra: ObraCreate,
+    response: Response,
     db: AsyncSession = Depends(get_db),
-    usuario: Usuario = Depends(get_current_user),
-    solo_generar: bool = Query(False)
+    usuario: UsuarioActual = Depends(get_current_user),
+    solo_generar: bool = Query(False),
+    sin_cache: bool = Query(False)
 ):
     if usuario is None:
         raise HTTPException(status_code=401, detail="Usuario no autenticado")
 
-    # 🤖 Generar con IA si imagen está vacía
+    # 🤖 Generar con IA si imagen está vacía: se encola y se responde de inmediato
     if not obra.imagen:
-        imagen_url = await generar_imagen(
+        trabajo = TrabajoGeneracion(
+            nombre=obra.nombre,
+            descripcion=obra.descripcion,
+            tipoArte=obra.tipoArte,
             prompt=obra.nombre,
-            model=obra.tipoArte or "stable_diffusion"
+            solo_generar=solo_generar,
+            usar_cache=not sin_cache,
+            autor_id=usuario.id
         )
-    else:
-        # Descargar imagen desde URL
-        response = requests.get(obra.imagen)
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="No se pudo descargar la imagen")
+        db.add(trabajo)
+        await db.commit()
+        await cola_generacion.encolar(trabajo.id)
 
-        # Subir a Cloudinary
+        response.status_code = 202
+        return {"mensaje": "Generación encolada", "trabajo_id": trabajo.id, "estado": trabajo.estado}
+
+    # Dos intentos: si un borrado concurrente libera el blob deduplicado antes de tomar la referencia,
+    # la imagen se vuelve a descargar y guardar en lugar de apuntar a un archivo borrado
+    for _ in range(2):
+        # Descargar la imagen en streaming y subirla al almacén
         try:
-            result = cloudinary.uploader.upload(
-                response.content,
-                resource_type="image",
-                folder="art-ificial",
-                overwrite=True,
-                public_id=f"obra_{uuid.uuid4().hex}"
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error al subir a Cloudinary: {e}")
+            imagen_url = await ingesta_imagenes.ingerir(obra.imagen)
+        except IngestaError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
 
-        imagen_url = result["secure_url"]
+        # Si solo quiere generar la imagen y no guardar en DB
+        if solo_generar:
+            return {"mensaje": "Imagen generada temporalmente", "archivo": imagen_url}
 
-    # Si solo quiere generar la imagen y no guardar en DB
-    if solo_generar:
-        return {"mensaje": "Imagen generada temporalmente", "archivo": imagen_url}
+        if await sumar_referencia(db, imagen_url):
+            break
+        await db.rollback()
+    else:
+        raise HTTPException(status_code=503, detail="La imagen se borró mientras se guardaba, reintentar")
 
     # Guardar en DB
     nueva = Obra(
@@ -107,38 +139,51 @@ async def generar_obra(
     db.add(nueva)
     await db.commit()
     await db.refresh(nueva)
+    cache_muro.invalidar()
 
     return {"mensaje": "Obra generada y guardada", "archivo": imagen_url}
 
-@router.get("/mis-obras", response_model=List[ObraOut])
-async def mis_obras(current_user: Usuario = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    stmt = (
-        select(
-            Obra,
-            Usuario.userName,
-            func.avg(Valoracion.puntuacion).label("promedio_valoracion"),
-            func.count(Valoracion.id).label("cantidad_valoraciones")
+
+# 📋 Estado de un trabajo de generación
+@router.get("/jobs/{trabajo_id}", response_model=TrabajoOut)
+async def estado_trabajo(trabajo_id: str, db: AsyncSession = Depends(get_db), usuario: UsuarioActual = Depends(get_current_user)):
+    result = await db.execute(
+        select(TrabajoGeneracion).where(
+            TrabajoGeneracion.id == trabajo_id,
+            TrabajoGeneracion.autor_id == usuario.id
         )
+    )
+    trabajo = result.scalar_one_or_none()
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+@router.get("/mis-obras", response_model=Union[PaginaObras, List[ObraOut]])
+async def mis_obras(
+    current_user: UsuarioActual = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = Query(None),
+    sin_paginar: bool = Query(False)
+):
+    stmt = (
+        select(*COLUMNAS_FEED)
         .join(Usuario, Usuario.id == Obra.autor_id)
-        .outerjoin(Valoracion, Valoracion.obra_id == Obra.id)
         .where(Obra.autor_id == current_user.id)
-        .group_by(Obra.id, Usuario.userName)
     )
+    stmt = paginar_por_fecha(stmt, cursor, None if sin_paginar else limit)
     result = await db.execute(stmt)
-    filas = result.all()
-
-    obras = []
-    for obra, autor_nombre, promedio, cantidad in filas:
-        promedio_truncado = floor(promedio * 100) / 100 if promedio is not None else None
-        obra_dict = {
-            **obra.__dict__,
-            "archivoJPG": obra.archivoJPG,
-            "autor_nombre": autor_nombre,
-            "promedio_valoracion": promedio_truncado,
-            "cantidad_valoraciones": cantidad
-        }
-        obras.append(obra_dict)
-    return obras
+    filas, next_cursor = result.all(), None
+    if not sin_paginar:
+        filas, next_cursor = cortar_pagina(filas, limit, obra_de_fila=lambda fila: fila)
+
+    # Se responde ya serializado: los items tienen la forma de ObraOut y no se vuelven a validar
+    obras = [_item_feed(fila) for fila in filas]
+
+    # Compatibilidad: lista completa sin envoltorio
+    if sin_paginar:
+        return ORJSONResponse(obras)
+    return ORJSONResponse({"items": obras, "next_cursor": next_cursor})
 
 
 @router.patch("/{id}/publicar")
@@ -153,103 +198,177 @@ async def cambiar_visibilidad(id: str, body: dict, db: AsyncSession = Depends(ge
     obra.publicada = body.get("publicada", True)
     await db.commit()
     await db.refresh(obra)
+    cache_muro.invalidar()
     return {"mensaje": "Visibilidad actualizada", "id": obra.id, "publicada": obra.publicada}
 
 
-@router.get("/muro", response_model=List[ObraOut])
-async def muro_publico(db: AsyncSession = Depends(get_db), usuario: Optional[Usuario] = Depends(get_current_user_optional)):
+# Muro público sin datos del usuario, con el formato de ObraOut
+async def _consultar_muro(db: AsyncSession, limit: int, cursor: Optional[str], sin_paginar: bool):
     stmt = (
-        select(
-            Obra,
-            Usuario.userName,
-            func.avg(Valoracion.puntuacion).label("promedio_valoracion"),
-            func.count(Valoracion.id).label("cantidad_valoraciones")
-        )
+        select(*COLUMNAS_FEED)
         .join(Usuario, Usuario.id == Obra.autor_id)
-        .outerjoin(Valoracion, Valoracion.obra_id == Obra.id)
         .where(Obra.publicada == True)
-        .group_by(Obra.id, Usuario.userName)
-        .order_by(Obra.fecha.desc())
     )
+    stmt = paginar_por_fecha(stmt, cursor, None if sin_paginar else limit)
     result = await db.execute(stmt)
+    filas, next_cursor = result.all(), None
+    if not sin_paginar:
+        filas, next_cursor = cortar_pagina(filas, limit, obra_de_fila=lambda fila: fila)
+    return [_item_feed(fila) for fila in filas], next_cursor
 
-    obras = []
-    for obra, autor_nombre, promedio, cantidad in result.all():
-        ya_valorada = False
-        puntuacion_usuario = None
-
-        if usuario:
-            valoracion_user = await db.execute(
-                select(Valoracion).where(
-                    Valoracion.obra_id == obra.id,
-                    Valoracion.usuario_id == usuario.id
-                )
-            )
-            valoracion = valoracion_user.scalar_one_or_none()
-            if valoracion:
-                ya_valorada = True
-                puntuacion_usuario = valoracion.puntuacion
-
-        promedio_truncado = floor(promedio * 100) / 100 if promedio is not None else None
 
-        obras.append({
-            **obra.__dict__,
-            "archivoJPG": obra.archivoJPG,
-            "autor_nombre": autor_nombre,
-            "promedio_valoracion": promedio_truncado,
-            "cantidad_valoraciones": cantidad,
-            "ya_valorada": ya_valorada,
-            "puntuacion_usuario": puntuacion_usuario
-        })
+@router.get("/muro", response_model=Union[PaginaObras, List[ObraOut]])
+async def muro_publico(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    usuario: Optional[UsuarioActual] = Depends(get_current_user_optional),
+    limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = Query(None),
+    sin_paginar: bool = Query(False)
+):
+    # La parte pública sale del cache mientras no cambie la versión del muro
+    clave = (None if sin_paginar else limit, cursor, sin_paginar)
+    entrada = cache_muro.obtener(clave)
+    if entrada is None:
+        version = cache_muro.version
+        obras, next_cursor = await _consultar_muro(db, limit, cursor, sin_paginar)
+        entrada = cache_muro.guardar(
+            clave, version, obras, next_cursor, sin_paginar, desde_replica=db.info.get("replica", False)
+        )
 
-    return obras
+    # Anónimo: el cuerpo ya serializado (o 304) sin tocar la base
+    if usuario is None:
+        return cache_muro.responder(request, entrada.cuerpo, entrada.etag, privada=False)
+
+    # Con sesión: sólo se consultan sus valoraciones de las obras de la página
+    ids = [obra["id"] for obra in entrada.items]
+    valoradas = set()
+    if ids:
+        result = await db.execute(
+            select(Valoracion.obra_id).where(
+                Valoracion.usuario_id == usuario.id,
+                Valoracion.obra_id.in_(ids)
+            )
+        )
+        valoradas = set(result.scalars().all())
+    obras = [
+        {**obra, "ya_valorada": True} if obra["id"] in valoradas else obra
+        for obra in entrada.items
+    ]
+    cuerpo = serializar(entrada.contenido(obras))
+    return cache_muro.responder(request, cuerpo, calcular_etag(cuerpo), privada=True)
 
 
 @router.delete("/{obra_id}")
-async def eliminar_obra(obra_id: str, db: AsyncSession = Depends(get_db), usuario_actual: Usuario = Depends(get_current_user)):
-    result = await db.execute(
-        select(Obra).where(Obra.id == obra_id, Obra.autor_id == usuario_actual.id)
-    )
-    obra = result.scalar_one_or_none()
-    if not obra:
+async def eliminar_obra(obra_id: str, db: AsyncSession = Depends(get_db), usuario_actual: UsuarioActual = Depends(get_current_user)):
+    # Mismo camino que el borrado masivo: un DELETE, las valoraciones caen por cascada
+    if not await eliminar_obras(db, Obra.id == obra_id, Obra.autor_id == usuario_actual.id):
         raise HTTPException(status_code=404, detail="Obra no encontrada o no autorizada")
-
-    await db.delete(obra)
-    await db.commit()
     return {"detail": "Obra eliminada"}
 
 
 @router.post("/{obra_id}/valorar")
-async def valorar_obra(obra_id: str, data: ValoracionRequest, db: AsyncSession = Depends(get_db), usuario_actual: Usuario = Depends(get_current_user)):
+async def valorar_obra(obra_id: str, data: ValoracionRequest, db: AsyncSession = Depends(get_db), usuario_actual: UsuarioActual = Depends(get_current_user)):
     if data.puntuacion < 1 or data.puntuacion > 5:
         raise HTTPException(status_code=400, detail="Puntuación inválida")
 
-    result = await db.execute(
-        select(Valoracion).where(
-            Valoracion.obra_id == obra_id,
-            Valoracion.usuario_id == usuario_actual.id
-        )
-    )
-    valoracion_existente = result.scalar_one_or_none()
+    # Un único INSERT ... ON CONFLICT DO NOTHING: sin carrera entre la verificación y la inserción
+    try:
+        insertadas = await insertar_valoraciones(db, usuario_actual.id, [(obra_id, data.puntuacion)])
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Obra no encontrada")
 
-    if valoracion_existente:
+    if not insertadas:
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Ya valoraste esta obra")
 
-    nueva_valoracion = Valoracion(
-        puntuacion=data.puntuacion,
-        obra_id=obra_id,
-        usuario_id=usuario_actual.id
-    )
-    db.add(nueva_valoracion)
+    if not await sumar_valoracion(db, obra_id, data.puntuacion):
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Obra no encontrada")
+
     await db.commit()
+    cache_muro.invalidar()
     return {"detail": "Valoración registrada"}
 
 
-@router.get("/obras/todas", response_model=List[ObraSimple])
-async def obtener_todas_las_obras(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Obra).order_by(Obra.fecha.desc()))
+# ⭐ Valorar varias obras de una vez (valoraciones encoladas sin conexión)
+@router.post("/valorar-lote")
+async def valorar_lote(data: ValoracionLoteRequest, db: AsyncSession = Depends(get_db), usuario_actual: UsuarioActual = Depends(get_current_user)):
+    if any(v.puntuacion < 1 or v.puntuacion > 5 for v in data.valoraciones):
+        raise HTTPException(status_code=400, detail="Puntuación inválida")
+
+    # Una valoración por obra: si viene repetida, vale la primera
+    pedidas = {}
+    for v in data.valoraciones:
+        pedidas.setdefault(v.obra_id, v.puntuacion)
+
+    result = await db.execute(select(Obra.id).where(Obra.id.in_(list(pedidas))))
+    existentes = set(result.scalars().all())
+    filas = [(obra_id, puntuacion) for obra_id, puntuacion in pedidas.items() if obra_id in existentes]
+
+    try:
+        insertadas = await insertar_valoraciones(db, usuario_actual.id, filas)
+    except IntegrityError:
+        # Alguna obra se borró entre la verificación y la inserción
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Alguna obra ya no existe, reintentar")
+    await sumar_valoraciones(db, insertadas)
+    await db.commit()
+    if insertadas:
+        cache_muro.invalidar()
+
+    registradas = {obra_id for obra_id, _ in insertadas}
+    return {
+        "registradas": len(insertadas),
+        "ya_valoradas": [obra_id for obra_id, _ in filas if obra_id not in registradas],
+        "no_encontradas": [obra_id for obra_id in pedidas if obra_id not in existentes],
+    }
+
+
+# Recorre la tabla con un cursor del servidor y emite las obras de a una (NDJSON o arreglo JSON)
+async def _exportar_obras(stmt, formato: str):
+    # Sesión propia: la de la dependencia ya está cerrada cuando empieza el streaming
+    async with SessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORTACION_LOTE))
+        primera = True
+        if formato == "json":
+            yield b"["
+        async for fila in result:
+            linea = ObraSimple.model_validate(fila._mapping).model_dump_json().encode("utf-8")
+            if formato == "ndjson":
+                yield linea + b"\n"
+            else:
+                yield linea if primera else b"," + linea
+            primera = False
+        if formato == "json":
+            yield b"]"
+
+
+@router.get("/obras/todas", response_model=Union[PaginaObrasSimple, List[ObraSimple]])
+async def obtener_todas_las_obras(
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(LIMITE_POR_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = Query(None),
+    sin_paginar: bool = Query(False),
+    exportar: Optional[str] = Query(None, pattern="^(ndjson|json)$")
+):
+    # Exportación completa en streaming: memoria constante sin importar la cantidad de obras
+    if exportar:
+        columnas = [getattr(Obra, campo) for campo in ObraSimple.model_fields]
+        stmt = paginar_por_fecha(select(*columnas), cursor, None)
+        media_type = "application/x-ndjson" if exportar == "ndjson" else "application/json"
+        return StreamingResponse(_exportar_obras(stmt, exportar), media_type=media_type)
+
+    stmt = paginar_por_fecha(select(Obra), cursor, None if sin_paginar else limit)
+    result = await db.execute(stmt)
     obras = result.scalars().all()
-    return obras
+
+    # Compatibilidad: lista completa sin envoltorio
+    if sin_paginar:
+        return obras
+    obras, next_cursor = cortar_pagina(obras, limit, obra_de_fila=lambda obra: obra)
+    return {"items": obras, "next_cursor": next_cursor}
 
 
 @router.get("/imagenes/{nombre}")
@@ -259,11 +378,5 @@ async def redirigir_a_cloudinary(nombre: str):
 
 @router.delete("/obras/eliminar-todas")
 async def eliminar_todas_las_obras(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Obra))
-    obras = result.scalars().all()
-
-    for obra in obras:
-        await db.delete(obra)
-    await db.commit()
-
-    return {"mensaje": f"Se eliminaron {len(obras)} obras correctamente."}
+    borradas = await eliminar_obras(db, progreso=informar_progreso)
+    return {"mensaje": f"Se eliminaron {borradas} obras correctamente."}
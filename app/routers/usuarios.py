@@ -1,21 +1,20 @@
 # Imports estándar
-import os
+from typing import Optional
 
 # Imports de terceros
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from pydantic import BaseModel
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from dotenv import load_dotenv
 
 # Imports internos
-from app.db.dependency import get_db
+from app.db.dependency import get_db, registrar_escritura_de
 from app.models.usuario import Usuario
 from app.schemas.usuario import UsuarioCreate
-from app.utils.security import hashear_password
+from app.utils.security import hashear_password_async, verificar_password
 from app.utils.jwt import crear_token
+from app.services.google_auth import verificador_google
 
 # Cargar variables de entorno
 load_dotenv()
@@ -23,15 +22,18 @@ load_dotenv()
 # Configuración del router
 router = APIRouter()
 
-# Obtener Google Client ID desde .env
-GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
-
 
 # Esquema para login con Google
 class GoogleLoginRequest(BaseModel):
     credential: str
 
 
+# Credenciales en el cuerpo: en la query string la contraseña quedaría en logs y proxies
+class LoginRequest(BaseModel):
+    email: str
+    password: Optional[str] = None
+
+
 # Registro tradicional (opcional)
 @router.post("/registrar")
 async def registrar_usuario(usuario: UsuarioCreate, db: AsyncSession = Depends(get_db)):
@@ -44,25 +46,46 @@ async def registrar_usuario(usuario: UsuarioCreate, db: AsyncSession = Depends(g
     nuevo = Usuario(
         email=usuario.email,
         userName=usuario.userName,
-        password=hashear_password(usuario.password)
+        password=await hashear_password_async(usuario.password)  # Fuera del event loop
     )
     db.add(nuevo)
     await db.commit()
     await db.refresh(nuevo)
+    registrar_escritura_de(nuevo.email)  # El token que reciba al iniciar sesión lee primero de la primaria
 
     return {"mensaje": "Usuario registrado con éxito", "id": nuevo.id}
 
 
-# Login simple por email (prueba)
+# Login por email; si viene contraseña se verifica (y se rehace el hash si usa un costo viejo)
 @router.post("/login")
-async def login(email: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Usuario).where(Usuario.email == email))
+async def login(
+    data: Optional[LoginRequest] = None,
+    email: Optional[str] = Query(None, deprecated=True),  # Contrato anterior: ?email= (sin contraseña)
+    db: AsyncSession = Depends(get_db)
+):
+    if data is None:
+        if not email:
+            raise HTTPException(status_code=422, detail="Falta el email")
+        data = LoginRequest(email=email)
+
+    result = await db.execute(select(Usuario).where(Usuario.email == data.email))
     usuario = result.scalar_one_or_none()
 
     if not usuario:
         raise HTTPException(status_code=401, detail="Usuario no encontrado")
 
+    if data.password is not None:
+        if not usuario.password:
+            raise HTTPException(status_code=401, detail="Credenciales inválidas")
+        valida, hash_nuevo = await verificar_password(data.password, usuario.password)
+        if not valida:
+            raise HTTPException(status_code=401, detail="Credenciales inválidas")
+        if hash_nuevo:
+            usuario.password = hash_nuevo
+            await db.commit()
+
     token = crear_token(usuario)
+    registrar_escritura_de(usuario.email)
     return {
         "token": token,
         "user": {
@@ -77,11 +100,8 @@ async def login(email: str, db: AsyncSession = Depends(get_db)):
 @router.post("/google-login")
 async def google_login(data: GoogleLoginRequest, db: AsyncSession = Depends(get_db)):
     try:
-        idinfo = id_token.verify_oauth2_token(
-            data.credential,
-            requests.Request(),
-            audience=GOOGLE_CLIENT_ID  # Ahora viene de .env
-        )
+        # Firma verificada localmente con los certificados de Google cacheados
+        idinfo = await verificador_google.verificar(data.credential)
 
         email = idinfo["email"]
         name = idinfo.get("name", "")
@@ -97,6 +117,7 @@ async def google_login(data: GoogleLoginRequest, db: AsyncSession = Depends(get_
             await db.refresh(user)
 
         token = crear_token(user)
+        registrar_escritura_de(user.email)
 
         return {
             "token": token,
@@ -1,7 +1,7 @@
 from pydantic import BaseModel # type: ignore
 from uuid import UUID
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
 class ObraCreate(BaseModel):
     nombre: str
@@ -36,6 +36,15 @@ class ObraOut(BaseModel):
     promedio_valoracion: Optional[float] = None
     cantidad_valoraciones: Optional[int] = 0
     ya_valorada: Optional[bool] = False
+    derivados: Optional[Dict[str, Dict[str, str]]] = None
 
     class Config:
         from_attributes = True
+
+class PaginaObras(BaseModel):
+    items: List[ObraOut]
+    next_cursor: Optional[str] = None
+
+class PaginaObrasSimple(BaseModel):
+    items: List[ObraSimple]
+    next_cursor: Optional[str] = None
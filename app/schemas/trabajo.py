@@ -0,0 +1,15 @@
+from pydantic import BaseModel # type: ignore
+from datetime import datetime
+from typing import Optional
+
+class TrabajoOut(BaseModel):
+    id: str
+    estado: str
+    archivoJPG: Optional[str] = None
+    obra_id: Optional[str] = None
+    error: Optional[str] = None
+    fecha: datetime
+    actualizado: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,31 @@
+# Verifica (y opcionalmente reconstruye) los agregados suma_puntuacion / cantidad_valoraciones de obras.
+#
+# Uso: python -m app.scripts.agregados_valoraciones [--reconstruir]
+
+# Imports estándar
+import sys
+import asyncio
+
+# Imports internos
+from app.db.database import SessionLocal
+from app.models.usuario import Usuario  # Registra las relaciones de Obra
+from app.services.valoraciones import contar_inconsistencias, reconstruir_agregados
+
+
+async def main(reconstruir: bool) -> None:
+    async with SessionLocal() as db:
+        inconsistentes = await contar_inconsistencias(db)
+        print(f"🔎 Obras con agregados inconsistentes: {inconsistentes}")
+
+        if reconstruir:
+            actualizadas = await reconstruir_agregados(db)
+            await db.commit()
+            print(f"🛠️ Agregados recalculados en {actualizadas} obras")
+            print(f"🔎 Inconsistencias restantes: {await contar_inconsistencias(db)}")
+        elif inconsistentes:
+            print("   (ejecutar con --reconstruir para corregirlos)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(reconstruir="--reconstruir" in sys.argv))
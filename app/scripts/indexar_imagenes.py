@@ -0,0 +1,178 @@
+# Construye el índice hash -> imagen (blobs_imagen) a partir de output/ y de Obra.archivoJPG,
+# e informa cuánto espacio y cuántas subidas ahorra la deduplicación.
+#
+# Uso: python -m app.scripts.indexar_imagenes [--descargar] [--aplicar]
+#   --descargar  también descarga las URLs remotas (Cloudinary, etc.) para calcular su hash
+#   --aplicar    apunta las obras duplicadas a una única copia y borra los archivos locales repetidos
+
+# Imports estándar
+import sys
+import logging
+import asyncio
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Imports de terceros
+import httpx
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+# Imports internos
+from app.db.database import SessionLocal
+from app.models.obra import Obra
+from app.models.usuario import Usuario  # Registra las relaciones de Obra
+from app.models.valoracion import Valoracion  # Registra las relaciones de Obra
+from app.models.blob_imagen import BlobImagen
+from app.services.almacen import AlmacenLocal, OUTPUT_DIR, archivo_temporal, calcular_hash
+from app.utils.logs import configurar_logging
+
+logger = logging.getLogger(__name__)
+
+
+# public_id de Cloudinary a partir de la URL (sin versión ni extensión)
+def _public_id_cloudinary(url: str) -> Optional[str]:
+    if "res.cloudinary.com" not in url or "/upload/" not in url:
+        return None
+    ruta = url.split("/upload/", 1)[1]
+    partes = ruta.split("/")
+    if partes and partes[0].startswith("v") and partes[0][1:].isdigit():
+        partes = partes[1:]
+    return "/".join(partes).rsplit(".", 1)[0]
+
+
+def _hash_local(ruta: Path) -> Tuple[str, int]:
+    with open(ruta, "rb") as archivo:
+        return calcular_hash(archivo)
+
+
+async def _hash_remoto(client: httpx.AsyncClient, url: str) -> Optional[Tuple[str, int]]:
+    try:
+        with archivo_temporal() as archivo:
+            async with client.stream("GET", url) as response:
+                if response.status_code != 200:
+                    return None
+                async for chunk in response.aiter_bytes():
+                    archivo.write(chunk)
+            return calcular_hash(archivo)
+    except httpx.HTTPError as e:
+        logger.warning("⚠️ No se pudo descargar %s: %s", url, e)
+        return None
+
+
+async def main(descargar: bool, aplicar: bool) -> None:
+    almacen_local = AlmacenLocal()
+
+    # 1. Archivos locales agrupados por contenido
+    archivos: Dict[str, Tuple[str, int]] = {}
+    por_hash: Dict[str, List[str]] = {}
+    for ruta in sorted(OUTPUT_DIR.iterdir()) if OUTPUT_DIR.exists() else []:
+        if not ruta.is_file() or ruta.name.startswith("."):
+            continue
+        digest, tamano = await asyncio.to_thread(_hash_local, ruta)
+        archivos[ruta.name] = (digest, tamano)
+        por_hash.setdefault(digest, []).append(ruta.name)
+
+    bytes_duplicados = sum(archivos[nombres[0]][1] * (len(nombres) - 1) for nombres in por_hash.values())
+    archivos_duplicados = sum(len(nombres) - 1 for nombres in por_hash.values())
+
+    async with SessionLocal() as db:
+        existentes = {
+            blob.hash: blob
+            for blob in (await db.execute(select(BlobImagen))).scalars().all()
+        }
+
+        # Copia canónica por hash (la ya indexada si existe): url, almacén, ubicación y tamaño
+        canonicas: Dict[str, Tuple[str, str, str, int]] = {}
+        for digest, nombres in por_hash.items():
+            blob = existentes.get(digest)
+            if blob is not None and blob.almacen == "local" and blob.ubicacion in nombres:
+                nombres.remove(blob.ubicacion)
+                nombres.insert(0, blob.ubicacion)
+            canonicas[digest] = (almacen_local.url(nombres[0]), "local", nombres[0], archivos[nombres[0]][1])
+
+        # 2. Obras: a qué contenido apunta cada una
+        filas = (await db.execute(select(Obra.id, Obra.archivoJPG))).all()
+
+        hash_de_obra: Dict[str, str] = {}
+        async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
+            for obra_id, url in filas:
+                if not url:
+                    continue
+                nombre = url.rsplit("/", 1)[-1]
+                if "/imagenes/" in url and nombre in archivos:
+                    hash_de_obra[obra_id] = archivos[nombre][0]
+                    continue
+                if not descargar or not url.startswith("http"):
+                    continue
+                resultado = await _hash_remoto(client, url)
+                if resultado is None:
+                    continue
+                digest, tamano = resultado
+                hash_de_obra[obra_id] = digest
+                public_id = _public_id_cloudinary(url)
+                if digest not in canonicas and public_id:
+                    canonicas[digest] = (url, "cloudinary", public_id, tamano)
+
+        referencias: Dict[str, int] = {}
+        subidas_repetidas = 0
+        for digest in hash_de_obra.values():
+            if digest in referencias:
+                subidas_repetidas += 1
+            referencias[digest] = referencias.get(digest, 0) + 1
+
+        # 3. Índice: alta de los blobs nuevos y recuento de referencias
+        nuevos = 0
+        for digest, (url, almacen, ubicacion, tamano) in canonicas.items():
+            blob = existentes.get(digest)
+            if blob is None:
+                db.add(BlobImagen(
+                    hash=digest,
+                    url=url,
+                    almacen=almacen,
+                    ubicacion=ubicacion,
+                    tamano=tamano,
+                    referencias=referencias.get(digest, 0),
+                ))
+                nuevos += 1
+            else:
+                blob.referencias = referencias.get(digest, 0)
+
+        # 4. Opcional: una sola copia por contenido
+        reapuntadas = 0
+        borrados = 0
+        if aplicar:
+            for obra_id, digest in hash_de_obra.items():
+                if digest not in canonicas:
+                    continue
+                url_canonica = existentes[digest].url if digest in existentes else canonicas[digest][0]
+                result = await db.execute(
+                    update(Obra)
+                    .where(Obra.id == obra_id, Obra.archivoJPG != url_canonica)
+                    .values(archivoJPG=url_canonica)
+                )
+                reapuntadas += result.rowcount
+        await db.commit()
+
+    if aplicar:
+        for nombres in por_hash.values():
+            for nombre in nombres[1:]:
+                (OUTPUT_DIR / nombre).unlink(missing_ok=True)
+                borrados += 1
+
+    # 5. Informe
+    print("📦 Deduplicación de imágenes")
+    print(f"   Archivos en output/:          {len(archivos)} ({len(por_hash)} contenidos distintos)")
+    print(f"   Archivos repetidos:           {archivos_duplicados} ({bytes_duplicados / 1024 / 1024:.2f} MB)")
+    print(f"   Obras analizadas:             {len(filas)} ({len(hash_de_obra)} con hash conocido)")
+    print(f"   Subidas evitables en obras:   {subidas_repetidas}")
+    print(f"   Blobs nuevos en el índice:    {nuevos}")
+    if aplicar:
+        print(f"   Obras reapuntadas:            {reapuntadas}")
+        print(f"   Archivos locales borrados:    {borrados}")
+    elif archivos_duplicados or subidas_repetidas:
+        print("   (ejecutar con --aplicar para quedarse con una sola copia)")
+
+
+if __name__ == "__main__":
+    configurar_logging()
+    asyncio.run(main(descargar="--descargar" in sys.argv, aplicar="--aplicar" in sys.argv))
@@ -0,0 +1,225 @@
+# Imports estándar
+import os
+import logging
+import glob
+import shutil
+import asyncio
+import hashlib
+import secrets
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Protocol, Tuple
+
+# Imports de terceros
+import cloudinary
+import cloudinary.uploader
+from sqlalchemy import update, delete, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+# Imports internos
+from app.db.database import SessionLocal
+from app.models.blob_imagen import BlobImagen
+from app.services.cache import cache_generaciones
+from app.utils.instrumentacion import medir_externo
+
+logger = logging.getLogger(__name__)
+
+# Configuración del almacén de imágenes
+IMAGENES_STORE = os.getenv("IMAGENES_STORE", "cloudinary")  # cloudinary | local
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+CLOUDINARY_FOLDER = os.getenv("CLOUDINARY_FOLDER", "art-ificial")
+CLOUDINARY_CHUNK = int(os.getenv("CLOUDINARY_CHUNK", 6 * 1024 * 1024))
+BUFFER_EN_MEMORIA = int(os.getenv("IMAGENES_BUFFER_EN_MEMORIA", 512 * 1024))
+OUTPUT_DIR = Path(__file__).resolve().parents[2] / "output"
+
+metricas_almacen = {"subidas": 0, "duplicadas": 0, "bytes_ahorrados": 0, "eliminadas": 0}
+
+
+# Archivo temporal que pasa a disco al superar BUFFER_EN_MEMORIA (memoria acotada por imagen)
+def archivo_temporal() -> BinaryIO:
+    return tempfile.SpooledTemporaryFile(max_size=BUFFER_EN_MEMORIA)
+
+
+# SHA-256 y tamaño del contenido, leyendo por bloques
+def calcular_hash(origen: BinaryIO) -> Tuple[str, int]:
+    origen.seek(0)
+    digest = hashlib.sha256()
+    tamano = 0
+    for bloque in iter(lambda: origen.read(64 * 1024), b""):
+        digest.update(bloque)
+        tamano += len(bloque)
+    origen.seek(0)
+    return digest.hexdigest(), tamano
+
+
+class Almacen(Protocol):
+    nombre: str
+
+    # Devuelve (url pública, ubicación interna para poder borrarla)
+    async def guardar(self, origen: BinaryIO, extension: str, nombre: str) -> Tuple[str, str]: ...
+    async def eliminar(self, ubicacion: str) -> None: ...
+
+
+# Carpeta local output/, servida en /imagenes
+class AlmacenLocal:
+    nombre = "local"
+
+    def __init__(self, directorio: Path = OUTPUT_DIR, base_url: str = API_BASE_URL):
+        self.directorio = directorio
+        self.base_url = base_url.rstrip("/")
+
+    def _copiar(self, origen: BinaryIO, destino: Path) -> None:
+        origen.seek(0)
+        with open(destino, "wb") as archivo:
+            shutil.copyfileobj(origen, archivo, 64 * 1024)
+
+    def url(self, archivo: str) -> str:
+        return f"{self.base_url}/imagenes/{archivo}"
+
+    async def guardar(self, origen: BinaryIO, extension: str, nombre: str) -> Tuple[str, str]:
+        os.makedirs(self.directorio, exist_ok=True)
+        archivo = f"{nombre}.{extension}"
+        await asyncio.to_thread(self._copiar, origen, self.directorio / archivo)
+        return self.url(archivo), archivo
+
+    def _borrar(self, nombre: str) -> None:
+        (self.directorio / nombre).unlink(missing_ok=True)
+        # También los derivados (miniatura, mediana...) generados a partir de esta imagen
+        base = glob.escape(nombre.rsplit(".", 1)[0])
+        for derivado in self.directorio.glob(f".derivados/*/{base}.*"):
+            derivado.unlink(missing_ok=True)
+
+    async def eliminar(self, ubicacion: str) -> None:
+        await asyncio.to_thread(self._borrar, Path(ubicacion).name)
+
+
+# Cloudinary: subida por partes fuera del event loop
+class AlmacenCloudinary:
+    nombre = "cloudinary"
+
+    def _subir(self, origen: BinaryIO, public_id: str) -> dict:
+        origen.seek(0)
+        return cloudinary.uploader.upload_large(
+            origen,
+            resource_type="image",
+            folder=CLOUDINARY_FOLDER,
+            overwrite=True,
+            public_id=public_id,
+            chunk_size=CLOUDINARY_CHUNK,
+        )
+
+    async def guardar(self, origen: BinaryIO, extension: str, nombre: str) -> Tuple[str, str]:
+        with medir_externo("cloudinary"):
+            result = await asyncio.to_thread(self._subir, origen, nombre)
+        return result["secure_url"], result["public_id"]
+
+    async def eliminar(self, ubicacion: str) -> None:
+        with medir_externo("cloudinary"):
+            await asyncio.to_thread(cloudinary.uploader.destroy, ubicacion, resource_type="image")
+
+
+_almacenes = {}
+
+
+def get_almacen(nombre: str = IMAGENES_STORE) -> Almacen:
+    if nombre not in _almacenes:
+        _almacenes[nombre] = AlmacenLocal() if nombre == "local" else AlmacenCloudinary()
+    return _almacenes[nombre]
+
+
+# Guarda la imagen direccionada por contenido: si esos bytes ya se subieron, devuelve la URL existente.
+# Cada subida usa un nombre propio (hash + sufijo): si el blob anterior con ese contenido se está borrando,
+# la nueva copia no comparte ubicación con el archivo que el borrado pendiente va a eliminar
+async def guardar_imagen(origen: BinaryIO, extension: str) -> str:
+    digest, tamano = await asyncio.to_thread(calcular_hash, origen)
+
+    async with SessionLocal() as db:
+        existente = await db.get(BlobImagen, digest)
+        if existente is not None:
+            metricas_almacen["duplicadas"] += 1
+            metricas_almacen["bytes_ahorrados"] += tamano
+            return existente.url
+
+    almacen = get_almacen()
+    url, ubicacion = await almacen.guardar(origen, extension, f"{digest}-{secrets.token_hex(4)}")
+    metricas_almacen["subidas"] += 1
+
+    async with SessionLocal() as db:
+        db.add(BlobImagen(
+            hash=digest,
+            url=url,
+            almacen=almacen.nombre,
+            ubicacion=ubicacion,
+            tamano=tamano,
+            referencias=0,
+        ))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Otra subida concurrente de los mismos bytes ganó: se usa la suya y se borra esta copia
+            await db.rollback()
+            existente = await db.get(BlobImagen, digest)
+            if existente is not None:
+                await eliminar_blobs([BlobImagen(url=url, almacen=almacen.nombre, ubicacion=ubicacion)])
+                return existente.url
+    return url
+
+
+# URL servida por alguno de nuestros almacenes (y por lo tanto registrada en el índice de blobs)
+def es_url_propia(url: str) -> bool:
+    if url.startswith(get_almacen("local").url("")):
+        return True
+    return "res.cloudinary.com" in url and f"/{CLOUDINARY_FOLDER}/" in url
+
+
+# Suma una referencia al blob de esa URL (dentro de la transacción que crea la obra).
+# Devuelve False si la URL es nuestra pero su blob ya no está: un borrado concurrente lo liberó entre
+# que se obtuvo la URL y ahora, y el archivo se borra o ya se borró. Hay que volver a guardar la imagen.
+async def sumar_referencia(db: AsyncSession, url: str) -> bool:
+    result = await db.execute(
+        update(BlobImagen)
+        .where(BlobImagen.url == url)
+        .values(referencias=BlobImagen.referencias + 1)
+    )
+    return result.rowcount > 0 or not es_url_propia(url)
+
+
+# Descuenta referencias por las URLs de obras borradas y quita del índice los blobs que quedan sin uso.
+# Devuelve los blobs a borrar del almacén, lo que debe hacerse después del commit.
+async def liberar_referencias(db: AsyncSession, urls: Iterable[str]) -> List[BlobImagen]:
+    conteo = {}
+    for url in urls:
+        if url:
+            conteo[url] = conteo.get(url, 0) + 1
+    if not conteo:
+        return []
+
+    # Una sola sentencia ejecutada en lote para todas las URLs
+    blobs = BlobImagen.__table__
+    await db.execute(
+        update(blobs)
+        .where(blobs.c.url == bindparam("b_url"))
+        .values(referencias=blobs.c.referencias - bindparam("b_cantidad")),
+        [{"b_url": url, "b_cantidad": cantidad} for url, cantidad in conteo.items()]
+    )
+
+    result = await db.execute(
+        select(BlobImagen).where(BlobImagen.url.in_(list(conteo)), BlobImagen.referencias <= 0)
+    )
+    huerfanos = list(result.scalars().all())
+    if huerfanos:
+        await db.execute(delete(BlobImagen).where(BlobImagen.hash.in_([b.hash for b in huerfanos])))
+    return huerfanos
+
+
+# Borra del almacén los blobs ya quitados del índice (best effort)
+async def eliminar_blobs(blobs: Iterable[BlobImagen]) -> None:
+    for blob in blobs:
+        try:
+            await get_almacen(blob.almacen).eliminar(blob.ubicacion)
+            metricas_almacen["eliminadas"] += 1
+        except Exception as e:
+            logger.warning("⚠️ No se pudo borrar la imagen %s: %s", blob.ubicacion, e)
+        await cache_generaciones.invalidar_url(blob.url)
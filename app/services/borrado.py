@@ -0,0 +1,59 @@
+# Imports estándar
+import os
+import logging
+from typing import Callable, Optional
+
+# Imports de terceros
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+# Imports internos
+from app.models.obra import Obra
+from app.services.almacen import liberar_referencias, eliminar_blobs
+from app.services.cache_muro import cache_muro
+
+logger = logging.getLogger(__name__)
+
+# Obras borradas por sentencia (y por transacción)
+BORRADO_LOTE = int(os.getenv("BORRADO_LOTE", 5000))
+
+
+# Progreso por consola de un borrado masivo
+def informar_progreso(borradas: int, lotes: int) -> None:
+    logger.info("🗑️ Obras borradas: %d (%d lotes)", borradas, lotes)
+
+
+# Borra las obras que cumplen los filtros con DELETE por lotes; las valoraciones caen por ON DELETE CASCADE.
+# Cada lote descuenta referencias de imágenes y se confirma por separado, así la memoria no depende del total.
+# Devuelve la cantidad de obras borradas.
+async def eliminar_obras(
+    db: AsyncSession,
+    *filtros,
+    lote: int = BORRADO_LOTE,
+    progreso: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    borradas = 0
+    lotes = 0
+    while True:
+        ids = select(Obra.id).where(*filtros).limit(lote).scalar_subquery()
+        result = await db.execute(
+            delete(Obra).where(Obra.id.in_(ids)).returning(Obra.archivoJPG),
+            execution_options={"synchronize_session": False}
+        )
+        urls = result.scalars().all()
+        if not urls:
+            break
+
+        huerfanos = await liberar_referencias(db, urls)
+        await db.commit()
+        cache_muro.invalidar()
+        await eliminar_blobs(huerfanos)
+
+        borradas += len(urls)
+        lotes += 1
+        if progreso is not None:
+            progreso(borradas, lotes)
+        if len(urls) < lote:
+            break
+    return borradas
@@ -0,0 +1,167 @@
+# Imports estándar
+import os
+import logging
+import re
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Protocol
+
+# Imports de terceros
+from sqlalchemy import delete
+
+# Imports internos
+from app.db.database import SessionLocal
+from app.models.cache_generacion import CacheGeneracion
+
+logger = logging.getLogger(__name__)
+
+# Configuración del cache de generaciones
+GENERACION_CACHE = os.getenv("GENERACION_CACHE", "memoria")  # memoria | db | ninguno
+GENERACION_CACHE_TTL = int(os.getenv("GENERACION_CACHE_TTL", 60 * 60 * 24))
+GENERACION_CACHE_MAX = int(os.getenv("GENERACION_CACHE_MAX", 1000))
+
+
+# Clave estable para una generación: el mismo prompt con otros espacios o mayúsculas comparte entrada
+def clave_generacion(prompt: str, model: str, nsfw: bool, steps: int, width: int, height: int) -> str:
+    prompt_normalizado = re.sub(r"\s+", " ", prompt).strip().lower()
+    partes = [prompt_normalizado, model.strip().lower(), str(bool(nsfw)), str(steps), str(width), str(height)]
+    return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+class BackendCache(Protocol):
+    async def obtener(self, clave: str) -> Optional[str]: ...
+    async def guardar(self, clave: str, url: str) -> None: ...
+    async def invalidar_url(self, url: str) -> None: ...
+
+
+# Backend en memoria: LRU acotado con expiración por TTL
+class CacheMemoria:
+    def __init__(self, max_entradas: int = GENERACION_CACHE_MAX, ttl: int = GENERACION_CACHE_TTL):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def obtener(self, clave: str) -> Optional[str]:
+        entrada = self._datos.get(clave)
+        if entrada is None:
+            return None
+        url, expira = entrada
+        if expira < time.monotonic():
+            del self._datos[clave]
+            return None
+        self._datos.move_to_end(clave)
+        return url
+
+    async def guardar(self, clave: str, url: str) -> None:
+        self._datos[clave] = (url, time.monotonic() + self.ttl)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_entradas:
+            self._datos.popitem(last=False)
+
+    async def invalidar_url(self, url: str) -> None:
+        for clave in [c for c, (u, _) in self._datos.items() if u == url]:
+            del self._datos[clave]
+
+
+# Backend en base de datos: sobrevive reinicios y se comparte entre workers
+class CacheDB:
+    def __init__(self, ttl: int = GENERACION_CACHE_TTL):
+        self.ttl = ttl
+
+    async def obtener(self, clave: str) -> Optional[str]:
+        async with SessionLocal() as db:
+            entrada = await db.get(CacheGeneracion, clave)
+            if entrada is None:
+                return None
+            if entrada.fecha < datetime.utcnow() - timedelta(seconds=self.ttl):
+                await db.delete(entrada)
+                await db.commit()
+                return None
+            return entrada.url
+
+    async def guardar(self, clave: str, url: str) -> None:
+        async with SessionLocal() as db:
+            await db.merge(CacheGeneracion(clave=clave, url=url, fecha=datetime.utcnow()))
+            await db.commit()
+
+    async def invalidar_url(self, url: str) -> None:
+        async with SessionLocal() as db:
+            await db.execute(delete(CacheGeneracion).where(CacheGeneracion.url == url))
+            await db.commit()
+
+
+# Cache de generaciones con coalescencia: pedidos idénticos concurrentes comparten un único trabajo
+class CacheGeneraciones:
+    def __init__(self, backend: Optional[BackendCache]):
+        self.backend = backend
+        self._en_vuelo: Dict[str, asyncio.Future] = {}
+        self.metricas = {"aciertos": 0, "fallos": 0, "coalescidas": 0}
+
+    async def obtener_o_generar(
+        self,
+        clave: str,
+        generar: Callable[[], Awaitable[str]],
+        usar_cache: bool = True,
+    ) -> str:
+        # Muestra nueva pedida explícitamente: no se lee ni se comparte, sólo se actualiza el cache
+        if not usar_cache:
+            url = await generar()
+            await self._guardar(clave, url)
+            return url
+
+        if self.backend is not None:
+            url = await self.backend.obtener(clave)
+            if url:
+                self.metricas["aciertos"] += 1
+                return url
+
+        en_vuelo = self._en_vuelo.get(clave)
+        if en_vuelo is not None:
+            self.metricas["coalescidas"] += 1
+            return await asyncio.shield(en_vuelo)
+
+        self.metricas["fallos"] += 1
+        futuro = asyncio.get_running_loop().create_future()
+        self._en_vuelo[clave] = futuro
+        try:
+            url = await generar()
+            await self._guardar(clave, url)
+            futuro.set_result(url)
+            return url
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as e:
+            futuro.set_exception(e)
+            futuro.exception()  # Marca la excepción como leída si nadie más esperaba
+            raise
+        finally:
+            self._en_vuelo.pop(clave, None)
+
+    # La imagen dejó de existir: ninguna clave puede seguir apuntando a ella
+    async def invalidar_url(self, url: str) -> None:
+        if self.backend is not None:
+            await self.backend.invalidar_url(url)
+
+    async def _guardar(self, clave: str, url: str) -> None:
+        if self.backend is None:
+            return
+        try:
+            await self.backend.guardar(clave, url)
+        except Exception as e:
+            logger.warning("⚠️ No se pudo guardar en el cache de generaciones: %s", e)
+
+
+def _crear_backend() -> Optional[BackendCache]:
+    if GENERACION_CACHE == "db":
+        return CacheDB()
+    if GENERACION_CACHE == "ninguno":
+        return None
+    return CacheMemoria()
+
+
+# Instancia compartida por todo el proceso
+cache_generaciones = CacheGeneraciones(_crear_backend())
@@ -0,0 +1,131 @@
+# Imports estándar
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Imports de terceros
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+# Configuración del cache del muro público
+MURO_CACHE_MAX = int(os.getenv("MURO_CACHE_MAX", 64))
+MURO_CACHE_MAX_BYTES = int(os.getenv("MURO_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+# Vigencia máxima: acota lo desactualizado que puede estar un worker ante cambios hechos en otro
+MURO_CACHE_TTL = float(os.getenv("MURO_CACHE_TTL", 30))
+# Tras un cambio, lo leído de la réplica puede no incluirlo todavía: no se cachea durante este lapso
+MURO_CACHE_ESPERA_REPLICA = float(os.getenv("MURO_CACHE_ESPERA_REPLICA", 5))
+
+
+def serializar(contenido: Any) -> bytes:
+    return orjson.dumps(contenido)
+
+
+def calcular_etag(cuerpo: bytes) -> str:
+    return f'"{hashlib.sha256(cuerpo).hexdigest()[:32]}"'
+
+
+@dataclass
+class EntradaMuro:
+    version: int
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+    sin_paginar: bool
+    cuerpo: bytes
+    etag: str
+    creada: float
+
+    # Cuerpo tal como lo devuelve el endpoint (lista completa o página con cursor)
+    def contenido(self, items: List[Dict[str, Any]]) -> Any:
+        if self.sin_paginar:
+            return items
+        return {"items": items, "next_cursor": self.next_cursor}
+
+
+# Cache de respuestas del muro público, invalidado por un contador de versión del feed
+class CacheMuro:
+    def __init__(
+        self,
+        max_entradas: int = MURO_CACHE_MAX,
+        max_bytes: int = MURO_CACHE_MAX_BYTES,
+        ttl: float = MURO_CACHE_TTL,
+    ):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = 0
+        self._invalidado_en = 0.0
+        self._entradas: "OrderedDict[Tuple, EntradaMuro]" = OrderedDict()
+        self._bytes = 0
+        self.metricas = {"aciertos": 0, "fallos": 0, "no_modificadas": 0, "invalidaciones": 0}
+
+    # Cualquier cambio visible en el muro sube la versión y descarta todas las respuestas
+    def invalidar(self) -> None:
+        self.version += 1
+        self._invalidado_en = time.monotonic()
+        self._entradas.clear()
+        self._bytes = 0
+        self.metricas["invalidaciones"] += 1
+
+    def obtener(self, clave: Tuple) -> Optional[EntradaMuro]:
+        entrada = self._entradas.get(clave)
+        if entrada is None or entrada.version != self.version or time.monotonic() - entrada.creada > self.ttl:
+            if entrada is not None:
+                self._quitar(clave)
+            self.metricas["fallos"] += 1
+            return None
+        self._entradas.move_to_end(clave)
+        self.metricas["aciertos"] += 1
+        return entrada
+
+    # Arma la entrada; sólo la guarda si nadie invalidó el muro mientras se consultaba la base
+    def guardar(
+        self,
+        clave: Tuple,
+        version: int,
+        items: List[Dict[str, Any]],
+        next_cursor: Optional[str],
+        sin_paginar: bool,
+        desde_replica: bool = False,
+    ) -> EntradaMuro:
+        entrada = EntradaMuro(version, items, next_cursor, sin_paginar, b"", "", time.monotonic())
+        entrada.cuerpo = serializar(entrada.contenido(items))
+        entrada.etag = calcular_etag(entrada.cuerpo)
+
+        if desde_replica and time.monotonic() - self._invalidado_en < MURO_CACHE_ESPERA_REPLICA:
+            return entrada
+        if version == self.version and len(entrada.cuerpo) <= self.max_bytes // 4:
+            if clave in self._entradas:
+                self._quitar(clave)
+            self._entradas[clave] = entrada
+            self._bytes += len(entrada.cuerpo)
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                self._quitar(next(iter(self._entradas)))
+        return entrada
+
+    # Respuesta JSON con ETag fuerte; devuelve 304 sin cuerpo si el cliente ya la tiene
+    def responder(self, request: Request, cuerpo: bytes, etag: str, privada: bool) -> Response:
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "private, no-cache" if privada else "public, no-cache",
+            "Vary": "Authorization",
+        }
+        si_no_coincide = request.headers.get("if-none-match")
+        if si_no_coincide and etag in [e.strip() for e in si_no_coincide.split(",")]:
+            self.metricas["no_modificadas"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=cuerpo, media_type="application/json", headers=headers)
+
+    def _quitar(self, clave: Tuple) -> None:
+        entrada = self._entradas.pop(clave)
+        self._bytes -= len(entrada.cuerpo)
+
+    def estado(self) -> Dict[str, Any]:
+        return {**self.metricas, "version": self.version, "entradas": len(self._entradas), "bytes": self._bytes}
+
+
+# Instancia compartida por todo el proceso
+cache_muro = CacheMuro()
@@ -0,0 +1,267 @@
+# Imports estándar
+import os
+import logging
+import asyncio
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set
+
+# Imports de terceros
+from sqlalchemy import update, or_, and_
+from sqlalchemy.future import select
+
+# Imports internos
+from app.db.database import SessionLocal
+from app.models.obra import Obra
+from app.models.trabajo import (
+    TrabajoGeneracion,
+    ESTADO_PENDIENTE,
+    ESTADO_PROCESANDO,
+    ESTADO_COMPLETADO,
+    ESTADO_FALLIDO,
+)
+from app.services.generador import generar_imagen
+from app.services.almacen import sumar_referencia
+from app.services.cache_muro import cache_muro
+from app.services.cache import cache_generaciones
+
+logger = logging.getLogger(__name__)
+
+# Cantidad de workers en proceso y tiempo tras el cual un trabajo "procesando" se considera huérfano
+GENERACION_WORKERS = int(os.getenv("GENERACION_WORKERS", 4))
+GENERACION_TRABAJO_HUERFANO_MIN = int(os.getenv("GENERACION_TRABAJO_HUERFANO_MIN", 15))
+# Cada cuánto se renueva "actualizado" de los trabajos en curso y se buscan huérfanos de otros procesos
+GENERACION_LATIDO_SEG = float(os.getenv("GENERACION_LATIDO_SEG", 60))
+
+
+# Cola de generación: pool acotado de workers asincrónicos respaldado por la tabla de trabajos
+class ColaGeneracion:
+    def __init__(self, workers: int = GENERACION_WORKERS):
+        self.workers = workers
+        self._cola: Optional[asyncio.Queue] = None
+        self._tareas: List[asyncio.Task] = []
+        self._latido: Optional[asyncio.Task] = None
+        self._en_curso: Set[str] = set()  # Trabajos reclamados por este proceso
+
+    # Arranca los workers y reencola los trabajos que quedaron sin terminar
+    async def iniciar(self) -> None:
+        if self._tareas:
+            return
+        self._cola = asyncio.Queue()
+        self._tareas = [
+            asyncio.create_task(self._worker(n), name=f"generacion-worker-{n}")
+            for n in range(self.workers)
+        ]
+        for trabajo_id in await self._pendientes():
+            self._cola.put_nowait(trabajo_id)
+        self._latido = asyncio.create_task(self._mantener(), name="generacion-latido")
+
+    # Detiene los workers y devuelve a "pendiente" lo que estaba en curso: se retoma en el próximo arranque
+    async def detener(self) -> None:
+        en_curso = set(self._en_curso)
+        tareas = self._tareas + ([self._latido] if self._latido is not None else [])
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        self._tareas = []
+        self._latido = None
+        self._cola = None
+        if en_curso:
+            await self._liberar(en_curso)
+
+    async def encolar(self, trabajo_id: str) -> None:
+        if self._cola is None:
+            raise RuntimeError("La cola de generación no está iniciada")
+        await self._cola.put(trabajo_id)
+
+    # Trabajos pendientes o abandonados por un proceso que murió a mitad de camino
+    async def _pendientes(self) -> List[str]:
+        limite = datetime.utcnow() - timedelta(minutes=GENERACION_TRABAJO_HUERFANO_MIN)
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(TrabajoGeneracion.id)
+                .where(or_(
+                    TrabajoGeneracion.estado == ESTADO_PENDIENTE,
+                    and_(
+                        TrabajoGeneracion.estado == ESTADO_PROCESANDO,
+                        TrabajoGeneracion.actualizado < limite,
+                    ),
+                ))
+                .order_by(TrabajoGeneracion.fecha)
+            )
+            ids = result.scalars().all()
+        if ids:
+            logger.info("🔁 Reanudando %d trabajos de generación", len(ids))
+        return list(ids)
+
+    async def _liberar(self, ids: Iterable[str]) -> None:
+        ids = list(ids)
+        async with SessionLocal() as db:
+            await db.execute(
+                update(TrabajoGeneracion)
+                .where(TrabajoGeneracion.id.in_(ids), TrabajoGeneracion.estado == ESTADO_PROCESANDO)
+                .values(estado=ESTADO_PENDIENTE, actualizado=datetime.utcnow())
+            )
+            await db.commit()
+        logger.info("⏸️ %d trabajos en curso vuelven a pendiente", len(ids))
+
+    # Trabajos "procesando" sin latido (su proceso murió): vuelven a pendiente de forma atómica,
+    # así el próximo barrido no los encuentra de nuevo mientras esperan en la cola
+    async def _rescatar_huerfanos(self) -> List[str]:
+        limite = datetime.utcnow() - timedelta(minutes=GENERACION_TRABAJO_HUERFANO_MIN)
+        async with SessionLocal() as db:
+            result = await db.execute(
+                update(TrabajoGeneracion)
+                .where(
+                    TrabajoGeneracion.estado == ESTADO_PROCESANDO,
+                    TrabajoGeneracion.actualizado < limite,
+                )
+                .values(estado=ESTADO_PENDIENTE, actualizado=datetime.utcnow())
+                .returning(TrabajoGeneracion.id)
+            )
+            ids = result.scalars().all()
+            await db.commit()
+        if ids:
+            logger.warning("🔁 Rescatando %d trabajos huérfanos", len(ids))
+        return list(ids)
+
+    # Latido de los trabajos en curso y barrido periódico de huérfanos
+    async def _mantener(self) -> None:
+        while True:
+            await asyncio.sleep(GENERACION_LATIDO_SEG)
+            try:
+                if self._en_curso:
+                    async with SessionLocal() as db:
+                        await db.execute(
+                            update(TrabajoGeneracion)
+                            .where(
+                                TrabajoGeneracion.id.in_(list(self._en_curso)),
+                                TrabajoGeneracion.estado == ESTADO_PROCESANDO,
+                            )
+                            .values(actualizado=datetime.utcnow())
+                        )
+                        await db.commit()
+                for trabajo_id in await self._rescatar_huerfanos():
+                    self._cola.put_nowait(trabajo_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("⚠️ Error en el latido de la cola de generación")
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            trabajo_id = await self._cola.get()
+            try:
+                await self._procesar(trabajo_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("⚠️ Worker %d: error inesperado en trabajo %s", n, trabajo_id)
+            finally:
+                self._cola.task_done()
+
+    # Reclama el trabajo de forma atómica (evita que dos procesos lo tomen a la vez)
+    async def _reclamar(self, trabajo_id: str) -> Optional[TrabajoGeneracion]:
+        limite = datetime.utcnow() - timedelta(minutes=GENERACION_TRABAJO_HUERFANO_MIN)
+        async with SessionLocal() as db:
+            result = await db.execute(
+                update(TrabajoGeneracion)
+                .where(
+                    TrabajoGeneracion.id == trabajo_id,
+                    or_(
+                        TrabajoGeneracion.estado == ESTADO_PENDIENTE,
+                        and_(
+                            TrabajoGeneracion.estado == ESTADO_PROCESANDO,
+                            TrabajoGeneracion.actualizado < limite,
+                        ),
+                    ),
+                )
+                .values(estado=ESTADO_PROCESANDO, actualizado=datetime.utcnow())
+            )
+            await db.commit()
+            if result.rowcount == 0:
+                return None
+            return await db.get(TrabajoGeneracion, trabajo_id)
+
+    async def _procesar(self, trabajo_id: str) -> None:
+        trabajo = await self._reclamar(trabajo_id)
+        if trabajo is None:
+            return
+        self._en_curso.add(trabajo_id)
+        try:
+            await self._generar(trabajo)
+        finally:
+            self._en_curso.discard(trabajo_id)
+
+    async def _generar(self, trabajo: TrabajoGeneracion) -> None:
+        trabajo_id = trabajo.id
+        usar_cache = trabajo.usar_cache is not False
+        # Dos intentos: si la imagen (del cache o deduplicada) se borró antes de tomar la referencia,
+        # se genera otra sin cache en lugar de crear una obra que apunte a un archivo inexistente
+        for _ in range(2):
+            # La llamada a Horde se hace sin sesión abierta: no retiene conexiones del pool
+            try:
+                imagen_url = await generar_imagen(
+                    prompt=trabajo.prompt,
+                    model=trabajo.tipoArte or "stable_diffusion",
+                    usar_cache=usar_cache
+                )
+            except Exception as e:
+                await self._fallar(trabajo_id, str(e))
+                return
+            if await self._completar(trabajo, imagen_url):
+                return
+            logger.warning("⚠️ Trabajo %s: la imagen %s se borró antes de usarla, se genera de nuevo",
+                           trabajo_id, imagen_url)
+            await cache_generaciones.invalidar_url(imagen_url)
+            usar_cache = False
+        await self._fallar(trabajo_id, "La imagen generada se borró antes de guardar la obra")
+
+    async def _fallar(self, trabajo_id: str, error: str) -> None:
+        logger.error("❌ Trabajo %s fallido: %s", trabajo_id, error)
+        async with SessionLocal() as db:
+            await db.execute(
+                update(TrabajoGeneracion)
+                .where(TrabajoGeneracion.id == trabajo_id)
+                .values(estado=ESTADO_FALLIDO, error=error[:1000], actualizado=datetime.utcnow())
+            )
+            await db.commit()
+
+    # Crea la obra (salvo solo_generar) y marca el trabajo completado; False si el blob ya no existe
+    async def _completar(self, trabajo: TrabajoGeneracion, imagen_url: str) -> bool:
+        async with SessionLocal() as db:
+            obra_id = None
+            if not trabajo.solo_generar:
+                if not await sumar_referencia(db, imagen_url):
+                    await db.rollback()
+                    return False
+                nueva = Obra(
+                    nombre=trabajo.nombre,
+                    descripcion=trabajo.descripcion,
+                    tipoArte=trabajo.tipoArte,
+                    archivoJPG=imagen_url,
+                    publicada=True,
+                    autor_id=trabajo.autor_id
+                )
+                db.add(nueva)
+                await db.flush()
+                obra_id = nueva.id
+
+            await db.execute(
+                update(TrabajoGeneracion)
+                .where(TrabajoGeneracion.id == trabajo.id)
+                .values(
+                    estado=ESTADO_COMPLETADO,
+                    archivoJPG=imagen_url,
+                    obra_id=obra_id,
+                    actualizado=datetime.utcnow(),
+                )
+            )
+            await db.commit()
+        if obra_id is not None:
+            cache_muro.invalidar()
+        logger.info("✅ Trabajo %s completado", trabajo.id)
+        return True
+
+
+# Instancia compartida por todo el proceso
+cola_generacion = ColaGeneracion()
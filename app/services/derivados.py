@@ -0,0 +1,96 @@
+# Imports estándar
+import os
+import glob
+import asyncio
+from pathlib import Path
+from typing import Dict, Optional
+
+# Imports de terceros
+from PIL import Image
+
+# Imports internos
+from app.services.almacen import OUTPUT_DIR
+
+# Tamaños disponibles (lado mayor en píxeles; None = tamaño original) y formatos de salida
+TAMANOS: Dict[str, Optional[int]] = {
+    "miniatura": int(os.getenv("DERIVADO_MINIATURA", 160)),
+    "mediana": int(os.getenv("DERIVADO_MEDIANA", 384)),
+    "completa": None,
+}
+FORMATOS = {"webp": "WEBP", "jpg": "JPEG"}
+CALIDAD = int(os.getenv("DERIVADO_CALIDAD", 82))
+DERIVADOS_DIR = OUTPUT_DIR / ".derivados"
+
+_locks: Dict[Path, asyncio.Lock] = {}
+_originales: Dict[str, Path] = {}
+
+
+# Archivo original en output/ a partir del nombre sin extensión
+def buscar_original(base: str) -> Optional[Path]:
+    ruta = _originales.get(base)
+    if ruta is not None and ruta.exists():
+        return ruta
+    for candidato in OUTPUT_DIR.glob(f"{glob.escape(base)}.*"):
+        if candidato.is_file():
+            _originales[base] = candidato
+            return candidato
+    return None
+
+
+def _generar(origen: Path, destino: Path, lado: Optional[int], formato: str) -> None:
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(f".{destino.name}.{os.getpid()}.tmp")
+    with Image.open(origen) as imagen:
+        imagen = imagen.convert("RGB")
+        if lado:
+            imagen.thumbnail((lado, lado), Image.LANCZOS)
+        imagen.save(temporal, FORMATOS[formato], quality=CALIDAD, optimize=True)
+    os.replace(temporal, destino)  # Atómico: nunca se sirve un derivado a medio escribir
+
+
+# Devuelve la ruta del derivado, generándolo la primera vez que se pide
+async def obtener_derivado(base: str, tamano: str, formato: str) -> Optional[Path]:
+    if tamano not in TAMANOS or formato not in FORMATOS:
+        return None
+    destino = DERIVADOS_DIR / tamano / f"{base}.{formato}"
+    if destino.exists():
+        return destino
+
+    origen = buscar_original(base)
+    if origen is None:
+        return None
+
+    lock = _locks.setdefault(destino, asyncio.Lock())
+    async with lock:
+        if not destino.exists():
+            await asyncio.to_thread(_generar, origen, destino, TAMANOS[tamano], formato)
+    _locks.pop(destino, None)
+    return destino
+
+
+# URLs de los derivados de una imagen: locales bajo /imagenes o transformaciones de Cloudinary
+def urls_derivados(url: Optional[str]) -> Optional[Dict[str, Dict[str, str]]]:
+    if not url:
+        return None
+
+    if "/imagenes/" in url:
+        prefijo, nombre = url.rsplit("/", 1)
+        base = nombre.rsplit(".", 1)[0]
+        return {
+            tamano: {formato: f"{prefijo}/{tamano}/{base}.{formato}" for formato in FORMATOS}
+            for tamano in TAMANOS
+        }
+
+    if "res.cloudinary.com" in url and "/upload/" in url:
+        inicio, resto = url.split("/upload/", 1)
+        sin_extension = resto.rsplit(".", 1)[0]
+        derivados = {}
+        for tamano, lado in TAMANOS.items():
+            limite = f"c_limit,w_{lado},h_{lado}," if lado else ""
+            derivados[tamano] = {
+                formato: f"{inicio}/upload/{limite}q_auto/{sin_extension}.{formato}"
+                for formato in FORMATOS
+            }
+        return derivados
+
+    return None
@@ -1,95 +1,592 @@
 # Imports estándar
 import os
+import logging
+import re
+import json
+import math
 import time
+import base64
+import random
 import asyncio
-from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Optional, Tuple
 
 # Imports de terceros
-import requests
+import httpx
 
-# 🔥 Generar imagen usando Stable Horde con opción NSFW
-async def generar_imagen(
-    prompt: str,
-    nsfw: bool = False,
-    model: str = "stable_diffusion"
-) -> str:
-    headers = {
-        "Content-Type": "application/json",
-        "apikey": os.getenv("STABLE_HORDE_API_KEY", "S-Dgg1Hs9fKjhuuxX2-qBw"),
-        "Client-Agent": "Art-ificial:1.0:debug",
-    }
-
-    payload = {
-        "prompt": prompt,
-        "params": {"steps": 22, "width": 512, "height": 512},
-        "models": [model],
-        "nsfw": nsfw,
-        "censor_nsfw": False,
-    }
-
-    print(f"🚀 Enviando a Stable Horde: {prompt[:50]}...")
-    
-    initRes = requests.post(
-        "https://stablehorde.net/api/v2/generate/async",
-        headers=headers,
-        json=payload,
-    )
+# Imports internos
+from app.services.almacen import archivo_temporal, guardar_imagen
+from app.services.cache import cache_generaciones, clave_generacion
+from app.utils.instrumentacion import medir_externo
+
+logger = logging.getLogger(__name__)
+
+# Configuración de Stable Horde (sobrescribible por entorno, p. ej. para un Horde falso local)
+HORDE_BASE_URL = os.getenv("STABLE_HORDE_URL", "https://stablehorde.net/api/v2")
+HORDE_API_KEY = os.getenv("STABLE_HORDE_API_KEY", "S-Dgg1Hs9fKjhuuxX2-qBw")
+HORDE_CLIENT_AGENT = os.getenv("STABLE_HORDE_CLIENT_AGENT", "Art-ificial:1.0:debug")
+HORDE_TIMEOUT = float(os.getenv("STABLE_HORDE_TIMEOUT", 30))
+HORDE_CONNECT_TIMEOUT = float(os.getenv("STABLE_HORDE_CONNECT_TIMEOUT", 10))
+HORDE_MAX_CONEXIONES = int(os.getenv("STABLE_HORDE_MAX_CONEXIONES", 20))
+HORDE_REINTENTOS = int(os.getenv("STABLE_HORDE_REINTENTOS", 4))
+HORDE_BACKOFF_BASE = float(os.getenv("STABLE_HORDE_BACKOFF_BASE", 1))
+HORDE_BACKOFF_MAX = float(os.getenv("STABLE_HORDE_BACKOFF_MAX", 30))
+HORDE_POLL_INTERVALO = float(os.getenv("STABLE_HORDE_POLL_INTERVALO", 5))
+HORDE_MAX_INTENTOS = int(os.getenv("STABLE_HORDE_MAX_INTENTOS", 120))
+HORDE_STEPS = int(os.getenv("STABLE_HORDE_STEPS", 22))
+HORDE_WIDTH = int(os.getenv("STABLE_HORDE_WIDTH", 512))
+HORDE_HEIGHT = int(os.getenv("STABLE_HORDE_HEIGHT", 512))
+HORDE_R2 = os.getenv("STABLE_HORDE_R2", "true").lower() == "true"  # False: imagen en base64 (webp)
+HORDE_POLL_MIN = float(os.getenv("STABLE_HORDE_POLL_MIN", 2))
+HORDE_POLL_MAX = float(os.getenv("STABLE_HORDE_POLL_MAX", 30))
+HORDE_TASA_POR_SEGUNDO = float(os.getenv("STABLE_HORDE_TASA_POR_SEGUNDO", 2))
+HORDE_RAFAGA = int(os.getenv("STABLE_HORDE_RAFAGA", 4))
+
+# Códigos que vale la pena reintentar (rate limit y errores del servidor)
+_CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+# Para peticiones no idempotentes (el POST que encola la generación) sólo se reintenta cuando es seguro
+# que Horde no aceptó el trabajo: no se pudo conectar, o respondió 429/503 sin procesarlo
+_CODIGOS_REINTENTABLES_ENVIO = {429, 503}
+_ERRORES_REINTENTABLES_ENVIO = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class StableHordeError(Exception):
+    pass
+
+
+# Error de red hablando con Horde: el trabajo sigue en curso allá, vale la pena volver a consultar
+class HordeNoResponde(StableHordeError):
+    pass
+
+
+# Separa el campo "img" de la respuesta de estado mientras llega: si es base64 lo decodifica por
+# bloques directo a un archivo temporal, sin armar el JSON completo ni copias de la imagen en memoria
+class _ExtractorImagen:
+    _MARCA = re.compile(rb'"img"\s*:\s*"')
+    _COLA_BUSQUEDA = 32
+
+    def __init__(self):
+        self.resto = bytearray()
+        self.archivo: Optional[BinaryIO] = None
+        self._buscando = bytearray()
+        self._estado = "buscando"  # buscando -> inicio -> base64 | url -> resto
+        self._pendiente = b""
+
+    def alimentar(self, chunk: bytes) -> None:
+        if self._estado == "buscando":
+            self._buscando += chunk
+            marca = self._MARCA.search(self._buscando)
+            if marca is None:
+                corte = max(0, len(self._buscando) - self._COLA_BUSQUEDA)
+                self.resto += self._buscando[:corte]
+                del self._buscando[:corte]
+                return
+            self.resto += self._buscando[:marca.end()]
+            chunk = bytes(self._buscando[marca.end():])
+            self._buscando = bytearray()
+            self._estado = "inicio"
+
+        if self._estado == "inicio":
+            # Se necesitan unos bytes para distinguir una URL de datos base64
+            self._pendiente += chunk
+            if len(self._pendiente) < 4 and b'"' not in self._pendiente:
+                return
+            chunk, self._pendiente = self._pendiente, b""
+            if chunk.startswith(b"http") or chunk.startswith(b'"'):
+                self._estado = "url"
+            else:
+                self._estado = "base64"
+                self.archivo = archivo_temporal()
+
+        if self._estado == "base64":
+            fin = chunk.find(b'"')
+            self._decodificar(chunk if fin < 0 else chunk[:fin])
+            if fin < 0:
+                return
+            self._cerrar_base64()
+            chunk = chunk[fin:]
+            self._estado = "resto"
+
+        self.resto += chunk
+        if self._estado == "url" and b'"' in chunk:
+            self._estado = "resto"
 
-    if not initRes.ok:
-        raise Exception(f"Stable Horde Error {initRes.status_code}: {initRes.text}")
-
-    request_id = initRes.json()["id"]
-    print(f"✅ ID solicitud: {request_id}")
-
-    # ⏳ Polling de estado
-    max_attempts = 120
-    attempt = 0
-    status = None
-    
-    while attempt < max_attempts:
-        attempt += 1
-        await asyncio.sleep(5)  # Aumentar a 5s para evitar rate limit
-        
-        pollRes = requests.get(
-            f"https://stablehorde.net/api/v2/generate/status/{request_id}",
-            headers=headers,
+    def _decodificar(self, datos: bytes) -> None:
+        datos = self._pendiente + datos.replace(b"\\", b"")
+        completo = len(datos) - len(datos) % 4
+        if completo:
+            self.archivo.write(base64.b64decode(datos[:completo]))
+        self._pendiente = datos[completo:]
+
+    def _cerrar_base64(self) -> None:
+        if self._pendiente:
+            self.archivo.write(base64.b64decode(self._pendiente + b"=" * (-len(self._pendiente) % 4)))
+            self._pendiente = b""
+        self.archivo.seek(0)
+
+    # JSON sin la imagen; si venía en base64, la generación queda con "archivo" en lugar de "img"
+    def resultado(self) -> Dict[str, Any]:
+        self.resto += self._buscando
+        status = json.loads(bytes(self.resto))
+        if self.archivo is not None and status.get("generations"):
+            status["generations"][0]["archivo"] = self.archivo
+        return status
+
+
+# Cliente asincrónico de Stable Horde con un único pool keep-alive compartido
+class StableHordeClient:
+    def __init__(
+        self,
+        base_url: str = HORDE_BASE_URL,
+        api_key: str = HORDE_API_KEY,
+        timeout: float = HORDE_TIMEOUT,
+        connect_timeout: float = HORDE_CONNECT_TIMEOUT,
+        max_conexiones: int = HORDE_MAX_CONEXIONES,
+        reintentos: int = HORDE_REINTENTOS,
+        backoff_base: float = HORDE_BACKOFF_BASE,
+        backoff_max: float = HORDE_BACKOFF_MAX,
+        poll_intervalo: float = HORDE_POLL_INTERVALO,
+        max_intentos: int = HORDE_MAX_INTENTOS,
+        tasa_por_segundo: float = HORDE_TASA_POR_SEGUNDO,
+        rafaga: int = HORDE_RAFAGA,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_conexiones,
+            max_keepalive_connections=max_conexiones,
         )
-        
-        # Si rate limit, esperar más
-        if pollRes.status_code == 429:
-            print(f"⚠️ Rate limit, esperando...")
-            await asyncio.sleep(10)
-            continue
-        
-        if not pollRes.ok:
-            print(f"⚠️ Error {pollRes.status_code}: {pollRes.text}")
-            continue
-            
-        status = pollRes.json()
-        print(f"📊 Estado completo: {status}")  # Ver qué devuelve realmente
-        
-        if status.get("queue_position"):
-            print(f"📋 Cola: {status['queue_position']}")
-        
-        if status.get("is_processing"):
-            print(f"🎨 Procesando... {attempt * 5}s")
-        
-        if status.get("done") and status.get("generations"):
-            print("✅ ¡Terminado!")
-            break
-        
+        self.reintentos = reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_intervalo = poll_intervalo
+        self.max_intentos = max_intentos
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        # Presupuesto global de peticiones: lo consumen envíos, chequeos, estados y reintentos
+        self.presupuesto = _Presupuesto(tasa_por_segundo, rafaga)
+        self.poller = HordePoller(self, max_espera=poll_intervalo * max_intentos)
+
+    # Crea el cliente HTTP de forma perezosa (dentro del event loop que lo usa)
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Content-Type": "application/json",
+                    "apikey": self.api_key,
+                    "Client-Agent": HORDE_CLIENT_AGENT,
+                },
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self._transport,
+            )
+        return self._client
+
+    # Espera con backoff exponencial y jitter completo (respeta Retry-After si viene)
+    def _espera(self, intento: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** intento)))
+
+    # Ejecuta una petición reintentando ante 429/5xx y errores de red. Si no es idempotente,
+    # un timeout de lectura o un 5xx pueden llegar con el trabajo ya aceptado: no se reintenta
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        reintentos: Optional[int] = None,
+        idempotente: bool = True,
+        reservado: bool = False,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        client = self._get_client()
+        reintentos = self.reintentos if reintentos is None else reintentos
+        errores = httpx.TransportError if idempotente else _ERRORES_REINTENTABLES_ENVIO
+        codigos = _CODIGOS_REINTENTABLES if idempotente else _CODIGOS_REINTENTABLES_ENVIO
+        for intento in range(reintentos + 1):
+            ultimo = intento == reintentos
+            if not (reservado and intento == 0):  # El poller ya tomó el token del primer intento
+                await self._reservar()
+            try:
+                with medir_externo("horde"):
+                    response = await client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                if ultimo or not isinstance(e, errores):
+                    raise HordeNoResponde(f"Stable Horde no responde: {e}") from e
+                espera = self._espera(intento)
+                logger.warning("⚠️ Error de red con Stable Horde (%s), reintento en %.1fs", e, espera)
+                await asyncio.sleep(espera)
+                continue
+
+            if response.status_code not in codigos or ultimo:
+                return response
+
+            espera = self._espera(intento, response)
+            if response.status_code == 429:
+                self.poller.metricas["rate_limit_recibidos"] += 1
+                self.presupuesto.bloqueado_hasta = time.monotonic() + espera  # Pausa para todos los que llaman
+            logger.warning("⚠️ Stable Horde respondió %d, reintento en %.1fs", response.status_code, espera)
+            await asyncio.sleep(espera)
+
+        raise StableHordeError("Reintentos agotados")  # Inalcanzable
+
+    # Espera un token del presupuesto; cuenta una sola vez cada petición que tuvo que postergarse
+    async def _reservar(self) -> None:
+        espera = self.presupuesto.espera()
+        if espera <= 0:
+            return
+        self.poller.metricas["rate_limit_evitados"] += 1
+        while espera > 0:
+            await asyncio.sleep(espera)
+            espera = self.presupuesto.espera()
+
+    # Envía el trabajo de generación y devuelve el ID de solicitud
+    async def enviar(self, payload: Dict[str, Any]) -> str:
+        response = await self._request("POST", "/generate/async", idempotente=False, json=payload)
+        if not response.is_success:
+            raise StableHordeError(f"Stable Horde Error {response.status_code}: {response.text}")
+        return response.json()["id"]
+
+    # Consulta liviana: sólo indica si terminó, posición en cola y tiempo estimado.
+    # Sin reintentos propios: si falla, el poller la reprograma
+    async def check(self, request_id: str) -> httpx.Response:
+        return await self._request("GET", f"/generate/check/{request_id}", reintentos=0, reservado=True)
+
+    # Consulta el estado completo de una solicitud (incluye las imágenes), procesándolo en streaming
+    async def estado(self, request_id: str) -> Tuple[httpx.Response, Optional[Dict[str, Any]]]:
+        await self._reservar()
+        extractor = _ExtractorImagen()
+        try:
+            with medir_externo("horde"):
+                async with self._get_client().stream("GET", f"/generate/status/{request_id}") as response:
+                    if not response.is_success:
+                        await response.aread()
+                        return response, None
+                    async for chunk in response.aiter_bytes():
+                        extractor.alimentar(chunk)
+                    return response, extractor.resultado()
+        except httpx.TransportError as e:
+            if extractor.archivo is not None:
+                extractor.archivo.close()  # Imagen a medias: se descarta y se vuelve a pedir
+            raise HordeNoResponde(f"Stable Horde no responde: {e}") from e
+
+    # Genera una imagen y devuelve su URL final
+    async def generar(
+        self,
+        prompt: str,
+        nsfw: bool = False,
+        model: str = "stable_diffusion",
+    ) -> str:
+        payload = {
+            "prompt": prompt,
+            "params": {"steps": HORDE_STEPS, "width": HORDE_WIDTH, "height": HORDE_HEIGHT},
+            "models": [model],
+            "nsfw": nsfw,
+            "censor_nsfw": False,
+            "r2": HORDE_R2,
+        }
+
+        logger.info("🚀 Enviando a Stable Horde: %s...", prompt[:50])
+        request_id = await self.enviar(payload)
+        logger.debug("✅ ID solicitud: %s", request_id)
+
+        # ⏳ El poller compartido avisa cuando la solicitud terminó
+        status = await self.poller.esperar(request_id)
+
+        if not status or not status.get("generations"):
+            raise StableHordeError(f"No se generó ninguna imagen. Estado final: {status}")
+
+        generacion = status["generations"][0]
+        img = generacion.get("img")
+        archivo = generacion.get("archivo")
+
+        if img and img.startswith("http"):
+            logger.info("✅ ¡URL final! %s", img)
+            return img
+
+        if archivo is None:
+            raise StableHordeError(f"No hay URL en generations: {status['generations']}")
+
+        # Imagen en base64 ya decodificada: se guarda en el almacén configurado
+        with archivo:
+            url = await guardar_imagen(archivo, "webp")
+        logger.info("✅ ¡Imagen guardada! %s", url)
+        return url
+
+    # Cierra el poller y el pool de conexiones
+    async def cerrar(self) -> None:
+        await self.poller.detener()
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+@dataclass
+class _Seguimiento:
+    request_id: str
+    futuro: asyncio.Future
+    inicio: float
+    proximo: float
+    checks: int = 0
+    terminado: bool = False  # Horde ya informó done: falta traer el estado completo
+    en_vuelo: bool = False
+    postergado: bool = False  # El chequeo actual ya se contó como postergado por el presupuesto
+
+
+@dataclass
+class _Presupuesto:
+    tasa: float
+    rafaga: int
+    tokens: float = field(init=False)
+    actualizado: float = field(default_factory=time.monotonic)
+    bloqueado_hasta: float = 0.0
+
+    def __post_init__(self) -> None:
+        self.tokens = float(self.rafaga)
+
+    # Segundos a esperar antes de poder gastar un token (0 si hay disponible)
+    def espera(self) -> float:
+        ahora = time.monotonic()
+        self.tokens = min(self.rafaga, self.tokens + (ahora - self.actualizado) * self.tasa)
+        self.actualizado = ahora
+        if ahora < self.bloqueado_hasta:
+            return self.bloqueado_hasta - ahora
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.tasa
+
+
+# Poller único que sigue todas las solicitudes en curso con un presupuesto global de peticiones
+class HordePoller:
+    def __init__(
+        self,
+        client: "StableHordeClient",
+        max_espera: float,
+        intervalo_min: float = HORDE_POLL_MIN,
+        intervalo_max: float = HORDE_POLL_MAX,
+    ):
+        self.client = client
+        self.max_espera = max_espera
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self._seguimientos: Dict[str, _Seguimiento] = {}
+        self._tarea: Optional[asyncio.Task] = None
+        self._consultas: set = set()
+        self._despertar: Optional[asyncio.Event] = None
+        self.metricas = {
+            "en_curso": 0,
+            "checks": 0,
+            "status": 0,
+            "polls_ahorrados": 0,
+            "rate_limit_evitados": 0,
+            "rate_limit_recibidos": 0,
+            "errores_consulta": 0,
+        }
+
+    # Registra una solicitud y espera su estado final (con las generaciones)
+    async def esperar(self, request_id: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        ahora = time.monotonic()
+        seguimiento = _Seguimiento(
+            request_id=request_id,
+            futuro=loop.create_future(),
+            inicio=ahora,
+            proximo=ahora + self.intervalo_min,
+        )
+        self._seguimientos[request_id] = seguimiento
+        self.metricas["en_curso"] = len(self._seguimientos)
+        self._asegurar_tarea()
+        try:
+            return await seguimiento.futuro
+        finally:
+            self._seguimientos.pop(request_id, None)
+            self.metricas["en_curso"] = len(self._seguimientos)
+
+    def _asegurar_tarea(self) -> None:
+        if self._despertar is None:
+            self._despertar = asyncio.Event()
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._bucle(), name="horde-poller")
+        self._despertar.set()
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            await asyncio.gather(self._tarea, return_exceptions=True)
+            self._tarea = None
+        for consulta in list(self._consultas):
+            consulta.cancel()
+        await asyncio.gather(*self._consultas, return_exceptions=True)
+        for seguimiento in self._seguimientos.values():
+            if not seguimiento.futuro.done():
+                seguimiento.futuro.set_exception(StableHordeError("Poller detenido"))
+
+    async def _bucle(self) -> None:
+        while self._seguimientos:
+            ahora = time.monotonic()
+            proximo = min(
+                (s.proximo for s in self._seguimientos.values() if not s.en_vuelo),
+                default=ahora + self.intervalo_max,
+            )
+            if proximo > ahora:
+                self._despertar.clear()
+                try:
+                    await asyncio.wait_for(self._despertar.wait(), timeout=proximo - ahora)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for seguimiento in list(self._seguimientos.values()):
+                if seguimiento.en_vuelo or seguimiento.proximo > ahora:
+                    continue
+                espera = self.client.presupuesto.espera()
+                if espera > 0:
+                    # Se posterga en lugar de gastar una petición que Horde rechazaría con 429
+                    if not seguimiento.postergado:
+                        self.metricas["rate_limit_evitados"] += 1
+                        seguimiento.postergado = True
+                    seguimiento.proximo = ahora + espera
+                    continue
+                seguimiento.postergado = False
+                seguimiento.en_vuelo = True
+                consulta = asyncio.create_task(self._consultar(seguimiento))
+                self._consultas.add(consulta)
+                consulta.add_done_callback(self._consultas.discard)
+
+    async def _consultar(self, seguimiento: _Seguimiento) -> None:
+        try:
+            await self._consultar_una_vez(seguimiento)
+        except Exception as e:
+            if not seguimiento.futuro.done():
+                seguimiento.futuro.set_exception(e)
+        finally:
+            seguimiento.en_vuelo = False
+            if self._despertar is not None:
+                self._despertar.set()
+
+    async def _consultar_una_vez(self, seguimiento: _Seguimiento) -> None:
+        ahora = time.monotonic()
+        if ahora - seguimiento.inicio > self.max_espera:
+            raise StableHordeError(f"Tiempo de espera agotado para {seguimiento.request_id}")
+
+        if not seguimiento.terminado:
+            try:
+                response = await self.client.check(seguimiento.request_id)
+            except HordeNoResponde as e:
+                self._reprogramar(seguimiento, e)
+                return
+            seguimiento.checks += 1
+            self.metricas["checks"] += 1
+            if self._limitado(response, seguimiento):
+                return
+            if not response.is_success:
+                self._reprogramar(seguimiento, f"{response.status_code} {response.text}")
+                return
+
+            check = response.json()
+            if check.get("faulted"):
+                raise StableHordeError("Generación falló")
+            if not check.get("done"):
+                seguimiento.proximo = time.monotonic() + self._intervalo(check)
+                return
+            seguimiento.terminado = True
+
+        # Terminado: una consulta al endpoint pesado de estado (se repite sólo si falló la red o Horde)
+        try:
+            response, status = await self.client.estado(seguimiento.request_id)
+        except HordeNoResponde as e:
+            self._reprogramar(seguimiento, e)
+            return
+        self.metricas["status"] += 1
+        if self._limitado(response, seguimiento):
+            return
+        if status is None and response.status_code >= 500:
+            self._reprogramar(seguimiento, f"{response.status_code} {response.text}")
+            return
+        if status is None:
+            raise StableHordeError(f"Stable Horde Error {response.status_code}: {response.text}")
+
         if status.get("faulted"):
-            raise Exception(f"Generación falló: {status.get('faulted_reason', 'Desconocido')}")
+            raise StableHordeError(f"Generación falló: {status.get('faulted_reason', 'Desconocido')}")
+
+        # Comparación con el esquema anterior: un /status cada HORDE_POLL_INTERVALO segundos
+        transcurrido = time.monotonic() - seguimiento.inicio
+        anteriores = math.ceil(transcurrido / HORDE_POLL_INTERVALO)
+        self.metricas["polls_ahorrados"] += max(0, anteriores - (seguimiento.checks + 1))
+        logger.debug("✅ ¡Terminado! %s", seguimiento.request_id)
+        if not seguimiento.futuro.done():
+            seguimiento.futuro.set_result(status)
+
+    # Falla transitoria (red o error de Horde): se vuelve a consultar más tarde; max_espera acota los intentos
+    def _reprogramar(self, seguimiento: _Seguimiento, error: Any) -> None:
+        self.metricas["errores_consulta"] += 1
+        logger.warning("⚠️ Error consultando %s, se reintenta: %s", seguimiento.request_id, error,
+                       extra={"muestreo": "horde.check_error"})
+        seguimiento.proximo = time.monotonic() + self.intervalo_max
+
+    # Ante un 429 se bloquea el presupuesto global y se reprograma la consulta
+    def _limitado(self, response: httpx.Response, seguimiento: _Seguimiento) -> bool:
+        if response.status_code != 429:
+            return False
+        self.metricas["rate_limit_recibidos"] += 1
+        pausa = self.client._espera(seguimiento.checks, response) or self.intervalo_min
+        self.client.presupuesto.bloqueado_hasta = time.monotonic() + pausa
+        seguimiento.proximo = time.monotonic() + pausa
+        return True
+
+    # Próximo chequeo según el tiempo estimado y la posición en cola que informa Horde
+    def _intervalo(self, check: Dict[str, Any]) -> float:
+        wait_time = check.get("wait_time") or 0
+        queue_position = check.get("queue_position") or 0
+        if queue_position:
+            logger.debug("📋 Cola: %s", queue_position, extra={"muestreo": "horde.cola"})  # Uno por poll: muestreado
+        if wait_time > 0:
+            intervalo = wait_time / 2
+        elif queue_position > 0:
+            intervalo = queue_position
+        else:
+            intervalo = self.intervalo_min
+        return max(self.intervalo_min, min(self.intervalo_max, intervalo))
 
-    if not status or not status.get("generations"):
-        raise Exception(f"No se generó ninguna imagen. Estado final: {status}")
 
-    img = status["generations"][0].get("img")
-    if not img:
-        raise Exception(f"No hay URL en generations: {status['generations']}")
+# Instancia compartida por todo el proceso
+_horde_client: Optional[StableHordeClient] = None
 
-    if img.startswith("http"):
-        print(f"✅ ¡URL final! {img}")
-        return img
 
-    raise Exception("Imagen en base64 no soportada") 
\ No newline at end of file
+def get_horde_client() -> StableHordeClient:
+    global _horde_client
+    if _horde_client is None:
+        _horde_client = StableHordeClient()
+    return _horde_client
+
+
+# Hook de apagado: libera las conexiones keep-alive
+async def cerrar_horde_client() -> None:
+    global _horde_client
+    if _horde_client is not None:
+        await _horde_client.cerrar()
+        _horde_client = None
+
+
+# 🔥 Generar imagen usando Stable Horde con opción NSFW (cacheada salvo que se pida una muestra nueva)
+async def generar_imagen(
+    prompt: str,
+    nsfw: bool = False,
+    model: str = "stable_diffusion",
+    usar_cache: bool = True
+) -> str:
+    clave = clave_generacion(prompt, model, nsfw, HORDE_STEPS, HORDE_WIDTH, HORDE_HEIGHT)
+    return await cache_generaciones.obtener_o_generar(
+        clave,
+        lambda: get_horde_client().generar(prompt=prompt, nsfw=nsfw, model=model),
+        usar_cache=usar_cache,
+    )
@@ -0,0 +1,143 @@
+# Imports estándar
+import os
+import re
+import json
+import time
+import base64
+import asyncio
+from typing import Dict, Optional
+
+# Imports de terceros
+import httpx
+from google.auth import jwt as google_jwt
+from dotenv import load_dotenv
+
+# Imports internos
+from app.utils.instrumentacion import medir_externo
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configuración de la verificación de ID tokens de Google
+GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_CERTS_TTL_DEFECTO = float(os.getenv("GOOGLE_CERTS_TTL_DEFECTO", 300))  # Si no viene max-age
+GOOGLE_CERTS_MARGEN = float(os.getenv("GOOGLE_CERTS_MARGEN", 60))  # Refresco en segundo plano antes de vencer
+GOOGLE_CERTS_REFRESCO_MIN = float(os.getenv("GOOGLE_CERTS_REFRESCO_MIN", 10))  # Entre refrescos por kid desconocido
+GOOGLE_CLOCK_SKEW = int(os.getenv("GOOGLE_CLOCK_SKEW", 10))
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+
+class GoogleTokenError(ValueError):
+    pass
+
+
+# kid de la cabecera del token, sin verificar nada todavía
+def _kid(token: str) -> Optional[str]:
+    try:
+        cabecera = token.split(".", 1)[0]
+        return json.loads(base64.urlsafe_b64decode(cabecera + "=" * (-len(cabecera) % 4))).get("kid")
+    except (ValueError, AttributeError):
+        raise GoogleTokenError("Token mal formado")
+
+
+def _max_age(cache_control: str) -> Optional[float]:
+    coincidencia = re.search(r"max-age=(\d+)", cache_control or "")
+    return float(coincidencia.group(1)) if coincidencia else None
+
+
+# Verifica ID tokens de Google localmente con los certificados cacheados según su Cache-Control
+class VerificadorGoogle:
+    def __init__(
+        self,
+        client_id: Optional[str] = GOOGLE_CLIENT_ID,
+        certs_url: str = GOOGLE_CERTS_URL,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.client_id = client_id
+        self.certs_url = certs_url
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._certs: Dict[str, str] = {}
+        self._vence = 0.0
+        self._ultimo_refresco_kid = 0.0
+        self._en_vuelo: Optional[asyncio.Task] = None
+        self.metricas = {"verificados": 0, "rechazados": 0, "descargas": 0, "refrescos_por_kid": 0}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=10, transport=self._transport)
+        return self._client
+
+    async def _descargar(self) -> None:
+        with medir_externo("google"):
+            response = await self._get_client().get(self.certs_url)
+        response.raise_for_status()
+        self._certs = response.json()
+        ttl = _max_age(response.headers.get("Cache-Control"))
+        self._vence = time.monotonic() + (ttl if ttl is not None else GOOGLE_CERTS_TTL_DEFECTO)
+        self.metricas["descargas"] += 1
+
+    # Una sola descarga a la vez: los pedidos concurrentes esperan la misma tarea
+    def _refrescar(self) -> asyncio.Task:
+        if self._en_vuelo is None or self._en_vuelo.done():
+            self._en_vuelo = asyncio.create_task(self._descargar())
+            self._en_vuelo.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return self._en_vuelo
+
+    async def _obtener_certs(self) -> Dict[str, str]:
+        ahora = time.monotonic()
+        if not self._certs or ahora >= self._vence:
+            await asyncio.shield(self._refrescar())
+        elif ahora >= self._vence - GOOGLE_CERTS_MARGEN:
+            self._refrescar()  # Se sigue usando el juego vigente mientras baja el nuevo
+        return self._certs
+
+    # Devuelve los datos del token (email, name, picture...) o lanza GoogleTokenError
+    async def verificar(self, token: str) -> dict:
+        kid = _kid(token)
+        certs = await self._obtener_certs()
+
+        # Google rotó las claves: un único refresco compartido, acotado en frecuencia
+        if kid not in certs:
+            en_curso = self._en_vuelo is not None and not self._en_vuelo.done()
+            if en_curso or time.monotonic() - self._ultimo_refresco_kid >= GOOGLE_CERTS_REFRESCO_MIN:
+                if not en_curso:
+                    self._ultimo_refresco_kid = time.monotonic()
+                    self.metricas["refrescos_por_kid"] += 1
+                await asyncio.shield(self._refrescar())
+                certs = self._certs
+        if kid not in certs:
+            self.metricas["rechazados"] += 1
+            raise GoogleTokenError("Clave de firma desconocida")
+
+        try:
+            # La verificación RSA es CPU: fuera del event loop
+            idinfo = await asyncio.to_thread(
+                google_jwt.decode,
+                token,
+                certs={kid: certs[kid]},
+                audience=self.client_id,
+                clock_skew_in_seconds=GOOGLE_CLOCK_SKEW,
+            )
+        except ValueError as e:
+            self.metricas["rechazados"] += 1
+            raise GoogleTokenError(str(e))
+
+        if idinfo.get("iss") not in GOOGLE_ISSUERS:
+            self.metricas["rechazados"] += 1
+            raise GoogleTokenError("Emisor inválido")
+        self.metricas["verificados"] += 1
+        return idinfo
+
+    async def cerrar(self) -> None:
+        if self._en_vuelo is not None and not self._en_vuelo.done():
+            self._en_vuelo.cancel()
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+# Instancia compartida por todo el proceso
+verificador_google = VerificadorGoogle()
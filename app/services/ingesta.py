@@ -0,0 +1,160 @@
+# Imports estándar
+import os
+import asyncio
+from typing import BinaryIO, Optional, Tuple
+from urllib.parse import urlparse
+
+# Imports de terceros
+import httpx
+
+# Imports internos
+from app.services.almacen import archivo_temporal, guardar_imagen
+from app.utils.instrumentacion import medir_externo
+
+# Límites de la ingesta de imágenes desde URLs externas
+INGESTA_MAX_BYTES = int(os.getenv("INGESTA_MAX_BYTES", 10 * 1024 * 1024))
+INGESTA_TIMEOUT_CONEXION = float(os.getenv("INGESTA_TIMEOUT_CONEXION", 5))
+INGESTA_TIMEOUT_LECTURA = float(os.getenv("INGESTA_TIMEOUT_LECTURA", 10))
+INGESTA_TIMEOUT_DESCARGA = float(os.getenv("INGESTA_TIMEOUT_DESCARGA", 30))
+INGESTA_TIMEOUT_SUBIDA = float(os.getenv("INGESTA_TIMEOUT_SUBIDA", 60))
+INGESTA_DESCARGAS_SIMULTANEAS = int(os.getenv("INGESTA_DESCARGAS_SIMULTANEAS", 8))
+INGESTA_SUBIDAS_SIMULTANEAS = int(os.getenv("INGESTA_SUBIDAS_SIMULTANEAS", 4))
+
+# Tipos aceptados y su extensión
+TIPOS_PERMITIDOS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+}
+
+
+class IngestaError(Exception):
+    def __init__(self, mensaje: str, status_code: int = 400):
+        super().__init__(mensaje)
+        self.status_code = status_code
+
+
+# Detecta el formato real por los primeros bytes del archivo
+def detectar_formato(cabecera: bytes) -> Optional[str]:
+    if cabecera.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if cabecera.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if cabecera[:4] == b"RIFF" and cabecera[8:12] == b"WEBP":
+        return "webp"
+    if cabecera[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    return None
+
+
+# Descarga en streaming con tope de tamaño y validación temprana, y sube fuera del event loop
+class IngestaImagenes:
+    def __init__(
+        self,
+        max_bytes: int = INGESTA_MAX_BYTES,
+        timeout_descarga: float = INGESTA_TIMEOUT_DESCARGA,
+        timeout_subida: float = INGESTA_TIMEOUT_SUBIDA,
+        descargas_simultaneas: int = INGESTA_DESCARGAS_SIMULTANEAS,
+        subidas_simultaneas: int = INGESTA_SUBIDAS_SIMULTANEAS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.timeout_descarga = timeout_descarga
+        self.timeout_subida = timeout_subida
+        self._descargas = asyncio.Semaphore(descargas_simultaneas)
+        self._subidas = asyncio.Semaphore(subidas_simultaneas)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(INGESTA_TIMEOUT_LECTURA, connect=INGESTA_TIMEOUT_CONEXION),
+                follow_redirects=True,
+                max_redirects=3,
+                transport=self._transport,
+            )
+        return self._client
+
+    # Descarga la imagen a un archivo temporal y devuelve (archivo, extensión)
+    async def descargar(self, url: str) -> Tuple[BinaryIO, str]:
+        if urlparse(url).scheme not in ("http", "https"):
+            raise IngestaError("URL de imagen inválida")
+        async with self._descargas:
+            try:
+                with medir_externo("descarga_imagen"):
+                    return await asyncio.wait_for(self._descargar(url), timeout=self.timeout_descarga)
+            except asyncio.TimeoutError:
+                raise IngestaError("La descarga de la imagen tardó demasiado", status_code=504)
+            except httpx.HTTPError:
+                raise IngestaError("No se pudo descargar la imagen")
+
+    async def _descargar(self, url: str) -> Tuple[BinaryIO, str]:
+        async with self._get_client().stream("GET", url) as response:
+            if response.status_code != 200:
+                raise IngestaError("No se pudo descargar la imagen")
+
+            tipo = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if tipo and tipo not in TIPOS_PERMITIDOS:
+                raise IngestaError(f"Tipo de archivo no permitido: {tipo}", status_code=415)
+
+            largo = response.headers.get("Content-Length")
+            if largo and largo.isdigit() and int(largo) > self.max_bytes:
+                raise IngestaError("La imagen supera el tamaño máximo", status_code=413)
+
+            archivo = archivo_temporal()
+            try:
+                total = 0
+                extension = None
+                cabecera = b""
+                async for chunk in response.aiter_bytes():
+                    total += len(chunk)
+                    if total > self.max_bytes:
+                        raise IngestaError("La imagen supera el tamaño máximo", status_code=413)
+                    if extension is None:
+                        cabecera += chunk[:12]
+                        if len(cabecera) >= 12:
+                            extension = self._validar_cabecera(cabecera)
+                    archivo.write(chunk)
+
+                if extension is None:
+                    extension = self._validar_cabecera(cabecera)
+            except BaseException:
+                archivo.close()
+                raise
+
+            archivo.seek(0)
+            return archivo, extension
+
+    def _validar_cabecera(self, cabecera: bytes) -> str:
+        extension = detectar_formato(cabecera)
+        if extension is None:
+            raise IngestaError("El archivo no es una imagen válida", status_code=415)
+        return extension
+
+    # Descarga y guarda en el almacén configurado; devuelve la URL final
+    async def ingerir(self, url: str) -> str:
+        archivo, extension = await self.descargar(url)
+        with archivo:
+            async with self._subidas:
+                try:
+                    return await asyncio.wait_for(
+                        guardar_imagen(archivo, extension),
+                        timeout=self.timeout_subida,
+                    )
+                except asyncio.TimeoutError:
+                    raise IngestaError("La subida de la imagen tardó demasiado", status_code=504)
+                except IngestaError:
+                    raise
+                except Exception as e:
+                    raise IngestaError(f"Error al subir la imagen: {e}", status_code=500)
+
+    async def cerrar(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+# Instancia compartida por todo el proceso
+ingesta_imagenes = IngestaImagenes()
@@ -0,0 +1,122 @@
+# Imports estándar
+import uuid
+from typing import Iterable, List, Optional, Tuple
+
+# Imports de terceros
+from sqlalchemy import update, func, and_, or_, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+# Imports internos
+from app.models.obra import Obra
+from app.models.valoracion import Valoracion
+
+
+# Promedio con dos decimales truncados, como lo mostraba el GROUP BY original (avg exacto de Postgres).
+# En enteros: con floats 23/5*100 da 459.99... y se truncaría a 4.59
+def promedio_truncado(suma: int, cantidad: int) -> Optional[float]:
+    if not cantidad:
+        return None
+    return (suma * 100 // cantidad) / 100
+
+
+# Suma una valoración a los agregados de la obra (en la misma transacción que la inserta).
+# Devuelve False si la obra no existe.
+async def sumar_valoracion(db: AsyncSession, obra_id: str, puntuacion: int) -> bool:
+    result = await db.execute(
+        update(Obra)
+        .where(Obra.id == obra_id)
+        .values(
+            suma_puntuacion=Obra.suma_puntuacion + puntuacion,
+            cantidad_valoraciones=Obra.cantidad_valoraciones + 1
+        ),
+        execution_options={"synchronize_session": False}
+    )
+    return result.rowcount > 0
+
+
+# Suma varias valoraciones (obra_id, puntuacion) en una sola sentencia ejecutada en lote
+async def sumar_valoraciones(db: AsyncSession, filas: Iterable[Tuple[str, int]]) -> None:
+    parametros = [{"b_obra_id": obra_id, "b_puntuacion": puntuacion} for obra_id, puntuacion in filas]
+    if not parametros:
+        return
+    obras = Obra.__table__
+    await db.execute(
+        update(obras)
+        .where(obras.c.id == bindparam("b_obra_id"))
+        .values(
+            suma_puntuacion=obras.c.suma_puntuacion + bindparam("b_puntuacion"),
+            cantidad_valoraciones=obras.c.cantidad_valoraciones + 1
+        ),
+        parametros
+    )
+
+
+# INSERT ... ON CONFLICT DO NOTHING según el motor de la sesión
+def _insert(db: AsyncSession):
+    if db.bind.dialect.name == "sqlite":
+        return sqlite.insert(Valoracion)
+    return postgresql.insert(Valoracion)
+
+
+# Inserta valoraciones (obra_id, puntuacion) de un usuario en una única sentencia; las que ya existían
+# se ignoran. Devuelve las efectivamente insertadas.
+async def insertar_valoraciones(db: AsyncSession, usuario_id: str, filas: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    if not filas:
+        return []
+    stmt = (
+        _insert(db)
+        .values([
+            {"id": str(uuid.uuid4()), "obra_id": obra_id, "usuario_id": usuario_id, "puntuacion": puntuacion}
+            for obra_id, puntuacion in filas
+        ])
+        .on_conflict_do_nothing(index_elements=["obra_id", "usuario_id"])
+        .returning(Valoracion.obra_id, Valoracion.puntuacion)
+    )
+    result = await db.execute(stmt)
+    return [(obra_id, puntuacion) for obra_id, puntuacion in result.all()]
+
+
+# Descuenta de los agregados las valoraciones de un usuario; llamar antes de borrarlas (o al usuario)
+async def descontar_valoraciones_de_usuario(db: AsyncSession, usuario_id: str) -> None:
+    propias = and_(Valoracion.obra_id == Obra.id, Valoracion.usuario_id == usuario_id)
+    await db.execute(
+        update(Obra)
+        .where(Obra.id.in_(select(Valoracion.obra_id).where(Valoracion.usuario_id == usuario_id)))
+        .values(
+            suma_puntuacion=Obra.suma_puntuacion - select(func.coalesce(func.sum(Valoracion.puntuacion), 0)).where(propias).scalar_subquery(),
+            cantidad_valoraciones=Obra.cantidad_valoraciones - select(func.count(Valoracion.id)).where(propias).scalar_subquery()
+        ),
+        execution_options={"synchronize_session": False}
+    )
+
+
+# Subconsultas con los agregados reales calculados desde la tabla de valoraciones
+def _suma_real():
+    return select(func.coalesce(func.sum(Valoracion.puntuacion), 0)).where(Valoracion.obra_id == Obra.id).scalar_subquery()
+
+
+def _cantidad_real():
+    return select(func.count(Valoracion.id)).where(Valoracion.obra_id == Obra.id).scalar_subquery()
+
+
+# Cantidad de obras cuyos agregados no coinciden con sus valoraciones
+async def contar_inconsistencias(db: AsyncSession) -> int:
+    result = await db.execute(
+        select(func.count(Obra.id)).where(or_(
+            Obra.suma_puntuacion != _suma_real(),
+            Obra.cantidad_valoraciones != _cantidad_real()
+        ))
+    )
+    return result.scalar_one()
+
+
+# Recalcula los agregados de todas las obras en una sola sentencia
+async def reconstruir_agregados(db: AsyncSession) -> int:
+    result = await db.execute(
+        update(Obra)
+        .values(suma_puntuacion=_suma_real(), cantidad_valoraciones=_cantidad_real()),
+        execution_options={"synchronize_session": False}
+    )
+    return result.rowcount
@@ -1,10 +1,14 @@
 # Imports estándar
 import os
-from typing import Optional
+import time
+import secrets
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
 from uuid import UUID
 
 # Imports de terceros
-from fastapi import Depends, HTTPException
+from fastapi import Depends, Header, HTTPException
 from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,7 +16,7 @@ from sqlalchemy import select
 from dotenv import load_dotenv
 
 # Imports internos
-from app.db.database import SessionLocal
+from app.db.dependency import get_db
 from app.models.usuario import Usuario
 
 # Cargar variables de entorno
@@ -25,11 +29,83 @@ SECRET_KEY = os.getenv("SECRET_KEY", "clave-super-secreta")  # Desde .env o valo
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Secreto compartido para /interno/* y /metrics; sin definir, esos endpoints no existen
+INTERNO_TOKEN = os.getenv("INTERNO_TOKEN")
 
-# Dependencia para obtener la sesión de base de datos
-async def get_db():
-    async with SessionLocal() as session:
-        yield session
+# Cache de usuarios autenticados
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 300))
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", 10000))
+
+
+# Datos del usuario autenticado que usan los handlers (inmutable: se comparte entre requests)
+@dataclass(frozen=True)
+class UsuarioActual:
+    id: str
+    email: str
+    userName: str
+
+
+# Email (sub del token) -> UsuarioActual, con vencimiento y tamaño acotado
+class CacheUsuarios:
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_entradas: int = AUTH_CACHE_MAX):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, Tuple[UsuarioActual, float]]" = OrderedDict()
+        self.metricas = {"aciertos": 0, "fallos": 0, "invalidaciones": 0}
+
+    def obtener(self, email: str) -> Optional[UsuarioActual]:
+        entrada = self._entradas.get(email)
+        if entrada is None or entrada[1] < time.monotonic():
+            self._entradas.pop(email, None)
+            self.metricas["fallos"] += 1
+            return None
+        self._entradas.move_to_end(email)
+        self.metricas["aciertos"] += 1
+        return entrada[0]
+
+    def guardar(self, usuario: UsuarioActual) -> None:
+        self._entradas[usuario.email] = (usuario, time.monotonic() + self.ttl)
+        self._entradas.move_to_end(usuario.email)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def invalidar(self, email: str) -> None:
+        if self._entradas.pop(email, None) is not None:
+            self.metricas["invalidaciones"] += 1
+
+    def estado(self) -> dict:
+        consultas = self.metricas["aciertos"] + self.metricas["fallos"]
+        return {
+            **self.metricas,
+            "entradas": len(self._entradas),
+            "tasa_aciertos": round(self.metricas["aciertos"] / consultas, 4) if consultas else None,
+        }
+
+
+# Instancia compartida por todo el proceso
+cache_usuarios = CacheUsuarios()
+
+
+# Llamar al modificar o borrar un usuario para que el próximo request lo vuelva a leer
+def invalidar_usuario(email: str) -> None:
+    cache_usuarios.invalidar(email)
+
+
+# Usuario por email: del cache si está vigente, si no una consulta de tres columnas
+async def _usuario_por_email(db: AsyncSession, email: str) -> Optional[UsuarioActual]:
+    usuario = cache_usuarios.obtener(email)
+    if usuario is not None:
+        return usuario
+
+    result = await db.execute(
+        select(Usuario.id, Usuario.email, Usuario.userName).where(Usuario.email == email)
+    )
+    fila = result.first()
+    if fila is None:
+        return None
+    usuario = UsuarioActual(*fila)
+    cache_usuarios.guardar(usuario)
+    return usuario
 
 
 # Verifica y decodifica el token JWT
@@ -44,7 +120,7 @@ def verificar_token(token: str):
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
-) -> Usuario:
+) -> UsuarioActual:
     token = credentials.credentials
 
     # Validar token vacío o inválido explícitamente
@@ -59,8 +135,7 @@ async def get_current_user(
     except JWTError:
         raise HTTPException(status_code=401, detail="Token inválido")
 
-    result = await db.execute(select(Usuario).where(Usuario.email == user_email))
-    usuario = result.scalar_one_or_none()
+    usuario = await _usuario_por_email(db, user_email)
 
     if usuario is None:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -72,7 +147,7 @@ async def get_current_user(
 async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_optional),
     db: AsyncSession = Depends(get_db)
-) -> Optional[Usuario]:
+) -> Optional[UsuarioActual]:
     # Si no hay credenciales o el token es "null"/"undefined", devolver None sin error
     if not credentials or not credentials.credentials or credentials.credentials.lower() in ["null", "undefined"]:
         return None
@@ -86,5 +161,29 @@ async def get_current_user_optional(
     except JWTError:
         return None
 
-    result = await db.execute(select(Usuario).where(Usuario.email == user_email))
-    return result.scalar_one_or_none()
+    return await _usuario_por_email(db, user_email)
+
+
+# Para los handlers que necesitan el objeto ORM (modificarlo o navegar relaciones)
+async def get_current_user_db(
+    usuario: UsuarioActual = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> Usuario:
+    usuario_db = await db.get(Usuario, usuario.id)
+    if usuario_db is None:
+        invalidar_usuario(usuario.email)
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return usuario_db
+
+
+# Acceso a los endpoints operativos: header X-Interno-Token o "Authorization: Bearer <token>"
+# (lo que admite el scrape de Prometheus). Sin INTERNO_TOKEN responden 404 como si no existieran
+async def verificar_acceso_interno(
+    x_interno_token: Optional[str] = Header(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_optional),
+) -> None:
+    if not INTERNO_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = x_interno_token or (credentials.credentials if credentials else "")
+    if not secrets.compare_digest(token.encode(), INTERNO_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token interno inválido")
@@ -0,0 +1,208 @@
+# Imports estándar
+import os
+import time
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Imports de terceros
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Umbral del log de requests lentos y sentencias que se guardan por request para mostrarlas
+REQUEST_LENTO_MS = float(os.getenv("REQUEST_LENTO_MS", 1000))
+SENTENCIAS_GUARDADAS = int(os.getenv("SENTENCIAS_GUARDADAS", 50))
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+# Lo que pasó dentro de un request: base de datos, pool y servicios externos
+@dataclass
+class EstadisticasRequest:
+    inicio: float = field(default_factory=time.perf_counter)
+    db_ms: float = 0.0
+    sentencias: int = 0
+    pool_ms: float = 0.0
+    externos_ms: Dict[str, float] = field(default_factory=dict)
+    sql: List[Tuple[float, str]] = field(default_factory=list)
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.inicio) * 1000
+
+
+_estadisticas: ContextVar[Optional[EstadisticasRequest]] = ContextVar("estadisticas_request", default=None)
+
+
+# Histograma acumulativo con etiquetas, en el formato de texto de Prometheus
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...], buckets=_BUCKETS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observar(self, valor: float, *etiquetas: str) -> None:
+        serie = self._series.get(etiquetas)
+        if serie is None:
+            serie = self._series[etiquetas] = [[0] * len(self.buckets), 0.0, 0]
+        indice = bisect_left(self.buckets, valor)
+        if indice < len(self.buckets):
+            serie[0][indice] += 1
+        serie[1] += valor
+        serie[2] += 1
+
+    def exponer(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for etiquetas, (conteos, suma, cantidad) in self._series.items():
+            pares = [f'{k}="{v}"' for k, v in zip(self.etiquetas, etiquetas)]
+            base = "{" + ",".join(pares) + "}" if pares else ""
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                le = ",".join(pares + [f'le="{limite}"'])
+                lineas.append(f"{self.nombre}_bucket{{{le}}} {acumulado}")
+            le = ",".join(pares + ['le="+Inf"'])
+            lineas.append(f"{self.nombre}_bucket{{{le}}} {cantidad}")
+            lineas.append(f"{self.nombre}_sum{base} {suma}")
+            lineas.append(f"{self.nombre}_count{base} {cantidad}")
+        return lineas
+
+
+latencia_requests = Histograma(
+    "http_request_duration_seconds", "Duración de los requests por ruta", ("method", "route", "status")
+)
+tiempo_db_requests = Histograma("http_request_db_seconds", "Tiempo en la base de datos por request", ("route",))
+sentencias_requests = Histograma(
+    "http_request_sql_statements", "Sentencias SQL por request", ("route",), buckets=(1, 2, 3, 5, 10, 20, 50, 100)
+)
+espera_pool = Histograma("db_pool_wait_seconds", "Espera por una conexión del pool", ())
+llamadas_externas = Histograma("external_call_duration_seconds", "Llamadas a servicios externos", ("service",))
+
+
+def metricas_prometheus() -> str:
+    lineas = []
+    for histograma in (latencia_requests, tiempo_db_requests, sentencias_requests, espera_pool, llamadas_externas):
+        lineas.extend(histograma.exponer())
+    return "\n".join(lineas) + "\n"
+
+
+# ---------------------------------------------------------------------
+# Hooks: base de datos, pool y servicios externos
+# ---------------------------------------------------------------------
+def _antes_de_ejecutar(conn, cursor, sentencia, parametros, contexto, executemany):
+    conn.info.setdefault("inicios_consulta", []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conn, cursor, sentencia, parametros, contexto, executemany):
+    inicio = conn.info["inicios_consulta"].pop()
+    estadisticas = _estadisticas.get()
+    if estadisticas is None:
+        return
+    duracion = (time.perf_counter() - inicio) * 1000
+    estadisticas.db_ms += duracion
+    estadisticas.sentencias += 1
+    if len(estadisticas.sql) < SENTENCIAS_GUARDADAS:
+        estadisticas.sql.append((duracion, sentencia))
+
+
+def _error_al_ejecutar(contexto_error):
+    inicios = contexto_error.connection.info.get("inicios_consulta") if contexto_error.connection else None
+    if inicios:
+        inicios.pop()
+
+
+# Registra los tiempos de cada sentencia de un motor (se llama una vez por motor)
+def instrumentar_motor(motor) -> None:
+    event.listen(motor.sync_engine, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(motor.sync_engine, "after_cursor_execute", _despues_de_ejecutar)
+    event.listen(motor.sync_engine, "handle_error", _error_al_ejecutar)
+
+
+# Lo llama el pool con lo que esperó cada checkout
+def registrar_espera_pool(espera_ms: float) -> None:
+    espera_pool.observar(espera_ms / 1000)
+    estadisticas = _estadisticas.get()
+    if estadisticas is not None:
+        estadisticas.pool_ms += espera_ms
+
+
+# Mide una llamada a un servicio externo (horde, cloudinary, google, descarga...)
+@contextmanager
+def medir_externo(servicio: str):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        llamadas_externas.observar(duracion, servicio)
+        estadisticas = _estadisticas.get()
+        if estadisticas is not None:
+            estadisticas.externos_ms[servicio] = estadisticas.externos_ms.get(servicio, 0.0) + duracion * 1000
+
+
+# ---------------------------------------------------------------------
+# Middleware ASGI
+# ---------------------------------------------------------------------
+def _server_timing(estadisticas: EstadisticasRequest) -> str:
+    partes = [
+        f"db;dur={estadisticas.db_ms:.1f};desc=\"{estadisticas.sentencias} sql\"",
+        f"pool;dur={estadisticas.pool_ms:.1f}",
+    ]
+    partes.extend(f"{servicio};dur={ms:.1f}" for servicio, ms in estadisticas.externos_ms.items())
+    partes.append(f"total;dur={estadisticas.total_ms():.1f}")
+    return ", ".join(partes)
+
+
+# Mide cada request, agrega Server-Timing a la respuesta y alimenta los histogramas de /metrics
+class InstrumentacionMiddleware:
+    def __init__(self, app, umbral_lento_ms: float = REQUEST_LENTO_MS):
+        self.app = app
+        self.umbral_lento_ms = umbral_lento_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estadisticas = EstadisticasRequest()
+        token = _estadisticas.set(estadisticas)
+        estado = {"status": 500}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["status"] = mensaje["status"]
+                mensaje.setdefault("headers", [])
+                mensaje["headers"] = list(mensaje["headers"]) + [
+                    (b"server-timing", _server_timing(estadisticas).encode("latin-1"))
+                ]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _estadisticas.reset(token)
+            self._registrar(scope, estadisticas, estado["status"])
+
+    def _registrar(self, scope, estadisticas: EstadisticasRequest, status: int) -> None:
+        ruta = getattr(scope.get("route"), "path", None) or "sin_ruta"  # Plantilla, no la URL: cardinalidad acotada
+        total_ms = estadisticas.total_ms()
+        latencia_requests.observar(total_ms / 1000, scope["method"], ruta, str(status))
+        tiempo_db_requests.observar(estadisticas.db_ms / 1000, ruta)
+        sentencias_requests.observar(estadisticas.sentencias, ruta)
+
+        if total_ms >= self.umbral_lento_ms:
+            externos = ", ".join(f"{s}={ms:.0f}ms" for s, ms in estadisticas.externos_ms.items()) or "-"
+            sentencias = "".join(
+                f"\n   {duracion:7.1f}ms  {' '.join(sentencia.split())[:500]}" for duracion, sentencia in estadisticas.sql
+            )
+            # Un solo registro con todas las sentencias: no se intercala con otros requests
+            logger.warning(
+                "🐢 Request lento: %s %s %d en %.0fms (db %.0fms en %d sentencias, pool %.0fms, externos %s)%s",
+                scope["method"], scope["path"], status, total_ms, estadisticas.db_ms,
+                estadisticas.sentencias, estadisticas.pool_ms, externos, sentencias,
+            )
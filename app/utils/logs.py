@@ -0,0 +1,147 @@
+# Imports estándar
+import os
+import sys
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Imports de terceros
+import orjson
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Nivel general y niveles por módulo, p. ej. "app.services.generador=DEBUG,sqlalchemy.engine=INFO"
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO").upper()
+LOG_NIVELES = os.getenv("LOG_NIVELES", "httpx=WARNING,httpcore=WARNING,aiosqlite=INFO")
+LOG_FORMATO = os.getenv("LOG_FORMATO", "texto")  # texto o json
+# "cola": el request sólo encola el registro y un hilo aparte escribe; "directo": se escribe en el momento
+LOG_MODO = os.getenv("LOG_MODO", "cola")
+# Eventos frecuentes (p. ej. cada poll a Horde): pasa uno de cada LOG_MUESTREO por clave
+LOG_MUESTREO = int(os.getenv("LOG_MUESTREO", 20))
+
+# Loggers de uvicorn: traen sus propios handlers sincrónicos; se redirigen al de la app
+_LOGGERS_UVICORN = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+
+# Deja pasar uno de cada `cada` registros con extra={"muestreo": clave}; el resto sólo se cuenta
+class FiltroMuestreo(logging.Filter):
+    def __init__(self, cada: int):
+        super().__init__()
+        self.cada = max(1, cada)
+        self._vistos: Dict[str, int] = {}
+        self.metricas = {"muestreados": 0, "omitidos": 0}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        clave = getattr(record, "muestreo", None)
+        if clave is None:
+            return True
+        vistos = self._vistos.get(clave, 0)
+        self._vistos[clave] = vistos + 1
+        if vistos % self.cada:
+            self.metricas["omitidos"] += 1
+            return False
+        self.metricas["muestreados"] += 1
+        record.omitidos = min(vistos, self.cada - 1)  # Similares descartados desde el último que pasó
+        return True
+
+
+class FormatoTexto(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        texto = super().format(record)
+        omitidos = getattr(record, "omitidos", 0)
+        return f"{texto} (+{omitidos} similares omitidos)" if omitidos else texto
+
+
+# Una línea JSON por registro (para agregadores de logs)
+class FormatoJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": self.formatTime(record),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        if record.exc_info:
+            datos["error"] = self.formatException(record.exc_info)
+        omitidos = getattr(record, "omitidos", 0)
+        if omitidos:
+            datos["omitidos"] = omitidos
+        return orjson.dumps(datos).decode()
+
+
+# QueueHandler para una cola en el mismo proceso: no hace falta copiar ni formatear el registro
+# (la versión estándar lo prepara para pickle); sólo se fija el mensaje, el resto lo hace el hilo escritor
+class _HandlerCola(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _niveles_por_modulo(texto: str) -> Dict[str, str]:
+    niveles = {}
+    for parte in texto.split(","):
+        if "=" in parte:
+            nombre, nivel = parte.split("=", 1)
+            niveles[nombre.strip()] = nivel.strip().upper()
+    return niveles
+
+
+_configurado = False
+_listener: Optional[QueueListener] = None
+_cola: Optional[queue.SimpleQueue] = None
+filtro_muestreo = FiltroMuestreo(LOG_MUESTREO)
+
+
+# Configura el logging del proceso una sola vez (app y scripts)
+def configurar_logging(modo: str = LOG_MODO) -> None:
+    global _configurado, _listener, _cola
+    if _configurado:
+        return
+    _configurado = True
+
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(FormatoJSON() if LOG_FORMATO == "json" else FormatoTexto())
+
+    if modo == "cola":
+        _cola = queue.SimpleQueue()
+        handler = _HandlerCola(_cola)
+        _listener = QueueListener(_cola, salida)
+        _listener.start()
+        atexit.register(detener_logging)
+    else:
+        handler = salida
+    handler.addFilter(filtro_muestreo)  # Antes de encolar: lo omitido no cuesta ni el formateo
+
+    raiz = logging.getLogger()
+    raiz.handlers[:] = [handler]
+    raiz.setLevel(LOG_NIVEL)
+    for nombre in _LOGGERS_UVICORN:
+        logger = logging.getLogger(nombre)
+        logger.handlers.clear()
+        logger.propagate = True
+    for nombre, nivel in _niveles_por_modulo(LOG_NIVELES).items():
+        logging.getLogger(nombre).setLevel(nivel)
+
+
+# Vacía la cola y detiene el hilo escritor (al apagar el proceso)
+def detener_logging() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def estado_logging() -> dict:
+    return {
+        "modo": "cola" if _cola is not None else "directo",
+        "nivel": LOG_NIVEL,
+        "pendientes": _cola.qsize() if _cola is not None else 0,
+        **filtro_muestreo.metricas,
+    }
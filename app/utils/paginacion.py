@@ -0,0 +1,54 @@
+# Imports estándar
+import json
+import base64
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+# Imports de terceros
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+# Imports internos
+from app.models.obra import Obra
+
+# Límites de página para los listados
+LIMITE_POR_DEFECTO = 30
+LIMITE_MAXIMO = 100
+
+
+# Cursor opaco con la clave (fecha, id) de la última obra de la página
+def codificar_cursor(fecha: datetime, obra_id: str) -> str:
+    crudo = json.dumps([fecha.isoformat(), obra_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        fecha, obra_id = json.loads(crudo)
+        return datetime.fromisoformat(fecha), str(obra_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+# Ordena por (fecha, id) descendente y, si hay cursor, continúa justo después de él
+def paginar_por_fecha(stmt, cursor: Optional[str], limit: Optional[int]):
+    stmt = stmt.order_by(Obra.fecha.desc(), Obra.id.desc())
+    if cursor:
+        fecha, obra_id = decodificar_cursor(cursor)
+        stmt = stmt.where(tuple_(Obra.fecha, Obra.id) < tuple_(fecha, obra_id))
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)  # Una fila extra indica si hay página siguiente
+    return stmt
+
+
+# Recorta la fila extra y arma el cursor de la página siguiente; obra_de_fila da el objeto con fecha e id
+def cortar_pagina(
+    filas: Sequence[Any], limit: int, obra_de_fila: Callable[[Any], Any]
+) -> Tuple[List[Any], Optional[str]]:
+    filas = list(filas)
+    if len(filas) <= limit:
+        return filas, None
+    filas = filas[:limit]
+    ultima = obra_de_fila(filas[-1])
+    return filas, codificar_cursor(ultima.fecha, ultima.id)
@@ -1,6 +1,55 @@
+# Imports estándar
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+# Imports de terceros
+from fastapi import HTTPException
 from passlib.context import CryptContext # type: ignore
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Costo de bcrypt y límites del pool de hashing
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", 2))
+HASH_COLA_MAX = int(os.getenv("HASH_COLA_MAX", 16))  # Pedidos esperando además de los que ya se procesan
+
+# Los hashes con menos rondas que BCRYPT_ROUNDS se consideran viejos y se rehacen al iniciar sesión
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt libera el GIL: unos pocos hilos dedicados alcanzan y no compiten con el pool por defecto
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash")
+_pendientes = 0
+
 
 def hashear_password(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+
+# Ejecuta una función de hashing en el pool; si la cola está llena responde 503 en vez de acumular
+async def _en_pool(funcion, *args):
+    global _pendientes
+    if _pendientes >= HASH_WORKERS + HASH_COLA_MAX:
+        raise HTTPException(
+            status_code=503,
+            detail="Servicio ocupado, reintentar en unos segundos",
+            headers={"Retry-After": "1"},
+        )
+    _pendientes += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, funcion, *args)
+    finally:
+        _pendientes -= 1
+
+
+async def hashear_password_async(password: str) -> str:
+    return await _en_pool(pwd_context.hash, password)
+
+
+# Devuelve (válida, hash_nuevo); hash_nuevo viene cuando el guardado usa un costo viejo
+async def verificar_password(password: str, hash_guardado: str) -> Tuple[bool, Optional[str]]:
+    return await _en_pool(pwd_context.verify_and_update, password, hash_guardado)
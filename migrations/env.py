@@ -0,0 +1,48 @@
+# Imports estándar
+import asyncio
+from logging.config import fileConfig
+
+# Imports de terceros
+from alembic import context
+
+# Imports internos
+from app.db.database import Base, DATABASE_URL, motor_para_migraciones
+from app.models import usuario, obra, valoracion, trabajo, cache_generacion, blob_imagen  # Registran las tablas
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configurar_logging", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+# SQLite no tiene ALTER de restricciones: se recrean las tablas en modo batch
+render_as_batch = DATABASE_URL.startswith("sqlite")
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=render_as_batch,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=render_as_batch)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    motor = motor_para_migraciones()
+    async with motor.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await motor.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,61 @@
+"""Esquema inicial: usuarios, obras y valoraciones (lo que creaba create_all)
+
+Las bases existentes ya tienen estas tablas: marcarlas con `alembic stamp 0001` y luego `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "usuarios",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("password", sa.String(), nullable=True),
+        sa.Column("userName", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name="usuarios_pkey"),
+    )
+    op.create_index("ix_usuarios_email", "usuarios", ["email"], unique=True)
+
+    op.create_table(
+        "obras",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("nombre", sa.String(), nullable=True),
+        sa.Column("descripcion", sa.String(), nullable=True),
+        sa.Column("tipoArte", sa.String(), nullable=True),
+        sa.Column("archivoJPG", sa.String(), nullable=True),
+        sa.Column("publicada", sa.Boolean(), nullable=True),
+        sa.Column("fecha", sa.DateTime(), nullable=True),
+        sa.Column("autor_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["autor_id"], ["usuarios.id"], name="obras_autor_id_fkey"),
+        sa.PrimaryKeyConstraint("id", name="obras_pkey"),
+    )
+
+    op.create_table(
+        "valoraciones",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("puntuacion", sa.Integer(), nullable=False),
+        sa.Column("obra_id", sa.String(), nullable=True),
+        sa.Column("usuario_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["obra_id"], ["obras.id"], name="valoraciones_obra_id_fkey"),
+        sa.ForeignKeyConstraint(["usuario_id"], ["usuarios.id"], name="valoraciones_usuario_id_fkey"),
+        sa.PrimaryKeyConstraint("id", name="valoraciones_pkey"),
+        sa.UniqueConstraint("obra_id", "usuario_id", name="una_valoracion_por_usuario"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("valoraciones")
+    op.drop_table("obras")
+    op.drop_index("ix_usuarios_email", table_name="usuarios")
+    op.drop_table("usuarios")
@@ -0,0 +1,99 @@
+"""Índices de feeds y valoraciones, agregados en obras, cascada de valoraciones y tablas nuevas
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Agregados de valoraciones en obras, completados con lo que ya hay
+    with op.batch_alter_table("obras") as batch:
+        batch.add_column(sa.Column("suma_puntuacion", sa.Integer(), server_default="0", nullable=False))
+        batch.add_column(sa.Column("cantidad_valoraciones", sa.Integer(), server_default="0", nullable=False))
+    op.execute(
+        "UPDATE obras SET "
+        "suma_puntuacion = COALESCE((SELECT SUM(v.puntuacion) FROM valoraciones v WHERE v.obra_id = obras.id), 0), "
+        "cantidad_valoraciones = (SELECT COUNT(*) FROM valoraciones v WHERE v.obra_id = obras.id)"
+    )
+
+    # Paginación por (fecha, id) del muro, mis obras y el listado completo
+    op.create_index("ix_obras_publicada_fecha_id", "obras", ["publicada", sa.text("fecha DESC"), sa.text("id DESC")])
+    op.create_index("ix_obras_autor_fecha_id", "obras", ["autor_id", sa.text("fecha DESC"), sa.text("id DESC")])
+    op.create_index("ix_obras_fecha_id", "obras", [sa.text("fecha DESC"), sa.text("id DESC")])
+
+    # Valoraciones: se borran con su obra y se buscan por usuario (obra_id ya lo cubre la restricción única)
+    with op.batch_alter_table("valoraciones") as batch:
+        batch.drop_constraint("valoraciones_obra_id_fkey", type_="foreignkey")
+        batch.create_foreign_key("valoraciones_obra_id_fkey", "obras", ["obra_id"], ["id"], ondelete="CASCADE")
+    op.create_index("ix_valoraciones_usuario_id", "valoraciones", ["usuario_id"])
+
+    op.create_table(
+        "trabajos_generacion",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("estado", sa.String(), nullable=False),
+        sa.Column("nombre", sa.String(), nullable=True),
+        sa.Column("descripcion", sa.String(), nullable=True),
+        sa.Column("tipoArte", sa.String(), nullable=True),
+        sa.Column("prompt", sa.String(), nullable=False),
+        sa.Column("solo_generar", sa.Boolean(), nullable=True),
+        sa.Column("usar_cache", sa.Boolean(), nullable=True),
+        sa.Column("archivoJPG", sa.String(), nullable=True),
+        sa.Column("obra_id", sa.String(), nullable=True),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("autor_id", sa.String(), nullable=True),
+        sa.Column("fecha", sa.DateTime(), nullable=True),
+        sa.Column("actualizado", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["autor_id"], ["usuarios.id"], name="trabajos_generacion_autor_id_fkey"),
+        sa.PrimaryKeyConstraint("id", name="trabajos_generacion_pkey"),
+    )
+    op.create_index("ix_trabajos_generacion_estado", "trabajos_generacion", ["estado"])
+
+    op.create_table(
+        "cache_generaciones",
+        sa.Column("clave", sa.String(), nullable=False),
+        sa.Column("url", sa.String(), nullable=False),
+        sa.Column("fecha", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("clave", name="cache_generaciones_pkey"),
+    )
+
+    op.create_table(
+        "blobs_imagen",
+        sa.Column("hash", sa.String(length=64), nullable=False),
+        sa.Column("url", sa.String(), nullable=False),
+        sa.Column("almacen", sa.String(), nullable=False),
+        sa.Column("ubicacion", sa.String(), nullable=False),
+        sa.Column("tamano", sa.BigInteger(), nullable=False),
+        sa.Column("referencias", sa.Integer(), nullable=False),
+        sa.Column("fecha", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("hash", name="blobs_imagen_pkey"),
+    )
+    op.create_index("ix_blobs_imagen_url", "blobs_imagen", ["url"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_blobs_imagen_url", table_name="blobs_imagen")
+    op.drop_table("blobs_imagen")
+    op.drop_table("cache_generaciones")
+    op.drop_index("ix_trabajos_generacion_estado", table_name="trabajos_generacion")
+    op.drop_table("trabajos_generacion")
+
+    op.drop_index("ix_valoraciones_usuario_id", table_name="valoraciones")
+    with op.batch_alter_table("valoraciones") as batch:
+        batch.drop_constraint("valoraciones_obra_id_fkey", type_="foreignkey")
+        batch.create_foreign_key("valoraciones_obra_id_fkey", "obras", ["obra_id"], ["id"])
+
+    op.drop_index("ix_obras_fecha_id", table_name="obras")
+    op.drop_index("ix_obras_autor_fecha_id", table_name="obras")
+    op.drop_index("ix_obras_publicada_fecha_id", table_name="obras")
+    with op.batch_alter_table("obras") as batch:
+        batch.drop_column("cantidad_valoraciones")
+        batch.drop_column("suma_puntuacion")
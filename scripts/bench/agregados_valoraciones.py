@@ -0,0 +1,115 @@
+# Primera página del muro con 10M valoraciones: promedio calculado con JOIN + GROUP BY en cada request
+# (como antes) contra las columnas suma_puntuacion / cantidad_valoraciones que se mantienen al valorar.
+#
+#   python -m scripts.bench.agregados_valoraciones [--obras 100000] [--valoraciones 10000000]
+
+# Imports estándar
+import time
+import asyncio
+import argparse
+
+# Imports internos
+from scripts.bench.comun import preparar_entorno
+
+preparar_entorno()
+
+from sqlalchemy import func, text
+from sqlalchemy.future import select
+
+from scripts.bench.comun import (
+    id_obra, id_usuario, informar, insertar_en_lotes, percentiles, preparar_base, sembrar_obras, sembrar_usuarios,
+)
+from app.db.database import SessionLocal
+from app.models.obra import Obra
+from app.models.usuario import Usuario
+from app.models.valoracion import Valoracion
+from app.routers.obras import _consultar_muro
+from app.services.valoraciones import reconstruir_agregados
+
+
+# La consulta del muro antes de los agregados, ya paginada para comparar lo mismo
+def _consulta_group_by(limit: int):
+    return (
+        select(Obra.id, Usuario.userName, func.avg(Valoracion.puntuacion), func.count(Valoracion.id))
+        .join(Usuario, Usuario.id == Obra.autor_id)
+        .outerjoin(Valoracion, Valoracion.obra_id == Obra.id)
+        .where(Obra.publicada == True)
+        .group_by(Obra.id, Usuario.userName)
+        .order_by(Obra.fecha.desc(), Obra.id.desc())
+        .limit(limit)
+    )
+
+
+async def _group_by(db, limit: int):
+    filas = (await db.execute(_consulta_group_by(limit))).all()
+    return {obra_id: (cantidad, promedio) for obra_id, _, promedio, cantidad in filas}
+
+
+async def _columnas(db, limit: int):
+    items, _ = await _consultar_muro(db, limit, None, sin_paginar=False)
+    return {item["id"]: (item["cantidad_valoraciones"], item["promedio_valoracion"]) for item in items}
+
+
+async def _medir(consulta, limit: int, repeticiones: int):
+    muestras = []
+    async with SessionLocal() as db:
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = await consulta(db, limit)
+            muestras.append((time.perf_counter() - inicio) * 1000)
+    return muestras, resultado
+
+
+# Cada obra recibe valoraciones de usuarios distintos (respeta una_valoracion_por_usuario)
+def _valoraciones(cantidad: int, obras: int):
+    for n in range(cantidad):
+        yield {
+            "id": f"valoracion-{n:010d}",
+            "puntuacion": 1 + (n * 7 + n // obras) % 5,
+            "obra_id": id_obra(n % obras),
+            "usuario_id": id_usuario(n // obras),
+        }
+
+
+async def main(args) -> None:
+    usuarios = -(-args.valoraciones // args.obras)
+    await preparar_base()
+    await sembrar_usuarios(usuarios)
+    await sembrar_obras(args.obras, autores=usuarios)
+    await insertar_en_lotes(Valoracion.__table__, _valoraciones(args.valoraciones, args.obras), lote=50_000)
+
+    async with SessionLocal() as db:
+        inicio = time.perf_counter()
+        await reconstruir_agregados(db)
+        await db.commit()
+        print(f"   reconstruir_agregados: {time.perf_counter() - inicio:.1f}s")
+        await db.execute(text("ANALYZE"))
+        if db.bind.dialect.name == "sqlite":
+            plan = await db.execute(text("EXPLAIN QUERY PLAN " + str(
+                _consulta_group_by(args.limit).compile(db.bind, compile_kwargs={"literal_binds": True})
+            )))
+            print("   Plan del GROUP BY:", "; ".join(fila[-1] for fila in plan))
+
+    group_by, esperado = await _medir(_group_by, args.limit, args.repeticiones)
+    columnas, obtenido = await _medir(_columnas, args.limit, args.repeticiones)
+    for obra_id, (cantidad, promedio) in esperado.items():
+        assert obtenido[obra_id][0] == cantidad, obra_id
+        if cantidad:
+            assert abs(obtenido[obra_id][1] - promedio) < 0.01, obra_id  # El muro trunca a dos decimales
+
+    informar(
+        f"Primera página ({args.limit}) del muro con {args.valoraciones:,} valoraciones en {args.obras:,} obras (ms)",
+        [
+            {"consulta": "JOIN + GROUP BY", **percentiles(group_by)},
+            {"consulta": "columnas agregadas", **percentiles(columnas)},
+        ],
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Promedio por GROUP BY contra columnas agregadas")
+    parser.add_argument("--obras", type=int, default=100_000)
+    parser.add_argument("--valoraciones", type=int, default=10_000_000)
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--repeticiones", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
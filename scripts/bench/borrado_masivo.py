@@ -0,0 +1,85 @@
+# Borrado de todas las obras con eliminar_obras: 1M obras con 10M valoraciones que caen por ON DELETE CASCADE.
+# Informa el tiempo total, el ritmo por lote y el pico de memoria de Python (no depende del total de filas).
+#
+#   python -m scripts.bench.borrado_masivo [--obras 1000000] [--valoraciones 10000000] [--lote 5000]
+
+# Imports estándar
+import time
+import asyncio
+import argparse
+import tracemalloc
+
+# Imports internos
+from scripts.bench.comun import preparar_entorno
+
+preparar_entorno()
+
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from scripts.bench.comun import (
+    id_obra, id_usuario, informar, insertar_en_lotes, preparar_base, sembrar_obras, sembrar_usuarios,
+)
+from app.db.database import SessionLocal
+from app.models.obra import Obra
+from app.models.valoracion import Valoracion
+from app.services.borrado import eliminar_obras
+
+
+def _valoraciones(cantidad: int, obras: int):
+    for n in range(cantidad):
+        yield {
+            "id": f"valoracion-{n:010d}",
+            "puntuacion": 1 + n % 5,
+            "obra_id": id_obra(n % obras),
+            "usuario_id": id_usuario(n // obras),
+        }
+
+
+async def _contar(db, modelo) -> int:
+    return (await db.execute(select(func.count()).select_from(modelo))).scalar_one()
+
+
+async def main(args) -> None:
+    usuarios = max(1, -(-args.valoraciones // args.obras))
+    await preparar_base()
+    await sembrar_usuarios(usuarios)
+    await sembrar_obras(args.obras, autores=usuarios)
+    await insertar_en_lotes(Valoracion.__table__, _valoraciones(args.valoraciones, args.obras), lote=50_000)
+
+    lotes = []
+
+    def progreso(borradas: int, cantidad_lotes: int) -> None:
+        lotes.append(time.perf_counter())
+        if cantidad_lotes % 20 == 0:
+            print(f"\r   borradas: {borradas:,}", end="", flush=True)
+
+    async with SessionLocal() as db:
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        borradas = await eliminar_obras(db, lote=args.lote, progreso=progreso)
+        total = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print()
+        quedan_obras = await _contar(db, Obra)
+        quedan_valoraciones = await _contar(db, Valoracion)
+
+    assert borradas == args.obras and quedan_obras == 0 and quedan_valoraciones == 0
+    duraciones = [(b - a) * 1000 for a, b in zip([inicio] + lotes, lotes)]
+    informar(f"eliminar_obras sobre {args.obras:,} obras y {args.valoraciones:,} valoraciones", [{
+        "lote": args.lote,
+        "lotes": len(lotes),
+        "segundos": total,
+        "ms_por_lote_max": max(duraciones),
+        "obras_por_s": borradas / total,
+        "pico_MiB": pico / 2**20,
+    }])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Borrado masivo por lotes con cascada en la base")
+    parser.add_argument("--obras", type=int, default=1_000_000)
+    parser.add_argument("--valoraciones", type=int, default=10_000_000)
+    parser.add_argument("--lote", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
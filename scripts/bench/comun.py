@@ -0,0 +1,140 @@
+# Imports estándar
+import os
+import time
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Sequence
+
+
+# Base propia del benchmark (SQLite en un directorio temporal salvo BENCH_DATABASE_URL) y almacén local.
+# Se llama antes de importar la app: el motor se crea al importar app.db.database.
+def preparar_entorno(**variables: str) -> str:
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        directorio = tempfile.mkdtemp(prefix="artificial-bench-")
+        url = f"sqlite+aiosqlite:///{directorio}/bench.db"
+    os.environ["DATABASE_URL"] = url
+    if url.startswith("sqlite"):
+        os.environ["DB_MODO"] = "sqlite"
+    os.environ.setdefault("IMAGENES_STORE", "local")
+    os.environ.setdefault("LOG_MODO", "directo")
+    os.environ.setdefault("LOG_NIVEL", "ERROR")  # Sin los avisos de requests lentos en medio del informe
+    os.environ.update(variables)
+    return url
+
+
+async def preparar_base() -> None:
+    from app.db.esquema import verificar_esquema
+    await verificar_esquema()
+
+
+def cliente():
+    import httpx
+    from app.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+# Inserta filas en lotes con executemany (sin objetos ORM) y muestra el avance
+async def insertar_en_lotes(tabla, filas: Iterable[dict], lote: int = 20_000, etiqueta: str = "") -> int:
+    from sqlalchemy import insert
+    from app.db.database import engine
+
+    total, bloque = 0, []
+    inicio = time.perf_counter()
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) == lote:
+            async with engine.begin() as conn:
+                await conn.execute(insert(tabla), bloque)
+            total += len(bloque)
+            bloque = []
+            print(f"\r   {etiqueta or tabla.name}: {total:,} filas ({time.perf_counter() - inicio:.0f}s)", end="", flush=True)
+    if bloque:
+        async with engine.begin() as conn:
+            await conn.execute(insert(tabla), bloque)
+        total += len(bloque)
+    print(f"\r   {etiqueta or tabla.name}: {total:,} filas en {time.perf_counter() - inicio:.1f}s")
+    return total
+
+
+# Ids deterministas: los benchmarks pueden armar cursores y valoraciones sin leer las obras de vuelta
+def id_obra(n: int) -> str:
+    return f"obra-{n:09d}"
+
+
+def fecha_obra(n: int) -> datetime:
+    return datetime(2024, 1, 1) - timedelta(seconds=n)
+
+
+def id_usuario(n: int) -> str:
+    return f"usuario-{n:09d}"
+
+
+async def sembrar_usuarios(cantidad: int) -> int:
+    from app.models.usuario import Usuario
+    filas = (
+        {"id": id_usuario(n), "email": f"bench{n}@bench.test", "userName": f"bench{n}", "password": None}
+        for n in range(cantidad)
+    )
+    return await insertar_en_lotes(Usuario.__table__, filas, etiqueta="usuarios")
+
+
+# Obras publicadas con fechas distintas (la 0 es la más reciente), repartidas entre los autores
+async def sembrar_obras(cantidad: int, autores: int = 1) -> int:
+    from app.models.obra import Obra
+    filas = (
+        {
+            "id": id_obra(n),
+            "nombre": f"Obra {n}",
+            "descripcion": "Obra generada para el benchmark",
+            "tipoArte": "stable_diffusion",
+            "archivoJPG": f"https://img.bench/{n}.webp",
+            "publicada": True,
+            "fecha": fecha_obra(n),
+            "autor_id": id_usuario(n % autores),
+            "suma_puntuacion": 0,
+            "cantidad_valoraciones": 0,
+        }
+        for n in range(cantidad)
+    )
+    return await insertar_en_lotes(Obra.__table__, filas, etiqueta="obras")
+
+
+def percentiles(muestras_ms: Sequence[float]) -> Dict[str, float]:
+    ordenadas = sorted(muestras_ms)
+    if not ordenadas:
+        return {"n": 0}
+
+    def p(q: float) -> float:
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))]
+
+    return {
+        "n": len(ordenadas),
+        "media": statistics.fmean(ordenadas),
+        "p50": p(0.50),
+        "p95": p(0.95),
+        "p99": p(0.99),
+        "max": ordenadas[-1],
+    }
+
+
+# Tabla de texto simple: una fila por escenario
+def informar(titulo: str, filas: List[Dict[str, object]]) -> None:
+    print(f"\n{titulo}")
+    if not filas:
+        return
+    columnas = list(filas[0])
+    textos = [[_formatear(fila.get(c, "")) for c in columnas] for fila in filas]
+    anchos = [max(len(c), *(len(t[i]) for t in textos)) for i, c in enumerate(columnas)]
+    print("  ".join(c.rjust(a) for c, a in zip(columnas, anchos)))
+    for texto in textos:
+        print("  ".join(t.rjust(a) for t, a in zip(texto, anchos)))
+
+
+def _formatear(valor: object) -> str:
+    if isinstance(valor, float):
+        return f"{valor:,.2f}"
+    if isinstance(valor, int):
+        return f"{valor:,}"
+    return str(valor)
@@ -0,0 +1,125 @@
+# Costo del logging por request en cada modo: "cola" (QueueHandler + hilo escritor), "directo" (escribe
+# en el request) y "sin logs" (sólo errores) como referencia. Cada modo corre en su propio proceso, con
+# DB_ECHO para que cada sentencia SQL también se loguee y stdout redirigido a un archivo.
+# --latencia-escritura-ms simula un destino lento (terminal, pipe de un colector de logs lleno).
+#
+#   python -m scripts.bench.logging_por_modo [--requests 3000] [--concurrencia 20] [--latencia-escritura-ms 0]
+
+# Imports estándar
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+MODOS = {
+    "sin logs": {"LOG_MODO": "directo", "LOG_NIVEL": "ERROR", "DB_ECHO": "false"},
+    "directo": {"LOG_MODO": "directo", "LOG_NIVEL": "INFO", "DB_ECHO": "true"},
+    "cola": {"LOG_MODO": "cola", "LOG_NIVEL": "INFO", "DB_ECHO": "true"},
+}
+
+
+# stdout que tarda en aceptar cada escritura, como un pipe cuyo lector no da abasto
+class _SalidaLenta:
+    def __init__(self, salida, latencia: float):
+        self._salida = salida
+        self._latencia = latencia
+
+    def write(self, texto: str) -> int:
+        time.sleep(self._latencia)
+        return self._salida.write(texto)
+
+    def flush(self) -> None:
+        self._salida.flush()
+
+
+# Proceso hijo: pide el muro sin cache (dos sentencias logueadas por request) y guarda las latencias
+async def _medir(args) -> dict:
+    from scripts.bench.comun import cliente, percentiles, preparar_base, sembrar_obras, sembrar_usuarios
+    from app.services.cache_muro import cache_muro
+
+    await preparar_base()
+    await sembrar_usuarios(10)
+    await sembrar_obras(1000, autores=10)
+
+    muestras = []
+    pendientes = iter(range(args.requests))
+
+    async def cliente_bench(http) -> None:
+        for _ in pendientes:
+            cache_muro.invalidar()
+            inicio = time.perf_counter()
+            response = await http.get("/obras/muro", params={"limit": 20})
+            muestras.append((time.perf_counter() - inicio) * 1000)
+            response.raise_for_status()
+
+    async with cliente() as http:
+        for _ in range(50):
+            await http.get("/obras/muro", params={"limit": 20})  # Calentamiento
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente_bench(http) for _ in range(args.concurrencia)))
+        total = time.perf_counter() - inicio
+    return {"ms_por_request": total * 1000 / args.requests, **percentiles(muestras)}
+
+
+def _hijo(args) -> None:
+    from scripts.bench.comun import preparar_entorno
+
+    if args.latencia_escritura_ms:
+        sys.stdout = _SalidaLenta(sys.stdout, args.latencia_escritura_ms / 1000)
+    preparar_entorno(**MODOS[args.hijo])
+    resultado = asyncio.run(_medir(args))
+
+    from app.utils.logs import detener_logging
+    detener_logging()  # El hilo escritor termina de vaciar la cola antes de contar las líneas
+    with open(args.resultado, "w") as archivo:
+        json.dump(resultado, archivo)
+
+
+def _padre(args) -> None:
+    from scripts.bench.comun import informar
+
+    filas = []
+    directorio = tempfile.mkdtemp(prefix="artificial-bench-logs-")
+    for modo in MODOS:
+        logs = os.path.join(directorio, f"{modo.replace(' ', '_')}.log")
+        resultado = os.path.join(directorio, f"{modo.replace(' ', '_')}.json")
+        with open(logs, "w") as salida:
+            subprocess.run(
+                [sys.executable, "-m", "scripts.bench.logging_por_modo", "--hijo", modo, "--resultado", resultado,
+                 "--requests", str(args.requests), "--concurrencia", str(args.concurrencia),
+                 "--latencia-escritura-ms", str(args.latencia_escritura_ms)],
+                stdout=salida, check=True,
+            )
+        with open(resultado) as archivo:
+            datos = json.load(archivo)
+        with open(logs, "rb") as archivo:
+            lineas = sum(1 for _ in archivo)
+        filas.append({"modo": modo, "lineas_por_request": lineas / args.requests, **datos})
+
+    base = filas[0]["ms_por_request"]
+    for fila in filas:
+        fila["sobrecosto_ms"] = fila["ms_por_request"] - base
+    informar(
+        f"GET /obras/muro sin cache, {args.requests:,} requests con {args.concurrencia} clientes, "
+        f"{args.latencia_escritura_ms} ms por escritura (ms)",
+        filas,
+    )
+    print(f"\nLogs en {directorio}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sobrecosto del logging por modo")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrencia", type=int, default=20)
+    parser.add_argument("--latencia-escritura-ms", type=float, default=0)
+    parser.add_argument("--hijo", choices=list(MODOS), help=argparse.SUPPRESS)
+    parser.add_argument("--resultado", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.hijo:
+        _hijo(args)
+    else:
+        _padre(args)
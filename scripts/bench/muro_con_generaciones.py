@@ -0,0 +1,106 @@
+# Latencia de GET /obras/muro mientras hay generaciones en curso contra un Stable Horde falso.
+# El muro debería mantenerse plano: el cliente de Horde no bloquea el event loop.
+#
+#   python -m scripts.bench.muro_con_generaciones [--generaciones 50] [--duracion 10]
+#
+# El escenario "bloqueante" duerme dentro del handler del transporte (como hacía requests.post
+# antes del cliente asincrónico) para mostrar la diferencia.
+
+# Imports estándar
+import time
+import asyncio
+import argparse
+
+# Imports internos
+from scripts.bench.comun import preparar_entorno
+
+preparar_entorno(STABLE_HORDE_POLL_MIN="0.2", STABLE_HORDE_TASA_POR_SEGUNDO="1000", STABLE_HORDE_RAFAGA="100")
+
+import httpx
+
+from scripts.bench.comun import cliente, informar, percentiles, preparar_base, sembrar_obras, sembrar_usuarios
+from app.services import generador
+from app.services.cache_muro import cache_muro
+
+
+# Horde falso: cada generación termina tras `demora` segundos; cada respuesta tarda `latencia`
+def _horde_falso(demora: float, latencia: float, bloqueante: bool):
+    inicios = {}
+
+    async def manejador(request: httpx.Request) -> httpx.Response:
+        if bloqueante:
+            time.sleep(latencia)
+        else:
+            await asyncio.sleep(latencia)
+        ruta = request.url.path
+        if ruta.endswith("/generate/async"):
+            request_id = f"bench-{len(inicios)}"
+            inicios[request_id] = time.monotonic()
+            return httpx.Response(202, json={"id": request_id})
+        request_id = ruta.rsplit("/", 1)[1]
+        terminado = time.monotonic() - inicios[request_id] >= demora
+        if "/generate/check/" in ruta:
+            return httpx.Response(200, json={"done": terminado, "wait_time": 0})
+        return httpx.Response(200, json={"generations": [{"img": f"https://img.bench/{request_id}.webp"}]})
+
+    return manejador
+
+
+# Pide el muro sin pausa durante `duracion` segundos; cada pedido va a la base (cache invalidado)
+async def _medir_muro(http: httpx.AsyncClient, duracion: float) -> list:
+    muestras = []
+    fin = time.perf_counter() + duracion
+    while time.perf_counter() < fin:
+        cache_muro.invalidar()
+        inicio = time.perf_counter()
+        response = await http.get("/obras/muro", params={"limit": 20})
+        muestras.append((time.perf_counter() - inicio) * 1000)
+        response.raise_for_status()
+    return muestras
+
+
+async def _escenario(nombre: str, http, generaciones: int, duracion: float, horde=None) -> dict:
+    tareas = []
+    if horde is not None:
+        generador._horde_client = generador.StableHordeClient(transport=httpx.MockTransport(horde))
+        tareas = [
+            asyncio.create_task(generador.generar_imagen(f"prompt {nombre} {n}", usar_cache=False))
+            for n in range(generaciones)
+        ]
+        await asyncio.sleep(0.5)  # Todas enviadas y en seguimiento antes de medir
+    muestras = await _medir_muro(http, duracion)
+    sin_terminar = sum(not t.done() for t in tareas)
+    if tareas:
+        await asyncio.gather(*tareas, return_exceptions=True)
+        await generador.cerrar_horde_client()
+    return {"escenario": nombre, "sin_terminar": sin_terminar, **percentiles(muestras)}
+
+
+async def main(args) -> None:
+    await preparar_base()
+    await sembrar_usuarios(10)
+    await sembrar_obras(args.obras, autores=10)
+
+    demora = args.duracion + 2  # Ninguna generación termina mientras se mide
+    filas = []
+    async with cliente() as http:
+        await _medir_muro(http, 0.5)  # Calentamiento
+        filas.append(await _escenario("sin generaciones", http, 0, args.duracion))
+        filas.append(await _escenario(
+            "async", http, args.generaciones, args.duracion,
+            _horde_falso(demora, args.latencia_horde, bloqueante=False),
+        ))
+        filas.append(await _escenario(
+            "bloqueante", http, args.generaciones, args.duracion,
+            _horde_falso(demora, args.latencia_horde, bloqueante=True),
+        ))
+    informar(f"GET /obras/muro (ms) con {args.generaciones} generaciones en curso", filas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia del muro con generaciones en curso")
+    parser.add_argument("--generaciones", type=int, default=50)
+    parser.add_argument("--duracion", type=float, default=10, help="segundos midiendo cada escenario")
+    parser.add_argument("--obras", type=int, default=1000)
+    parser.add_argument("--latencia-horde", type=float, default=0.05, help="segundos por respuesta de Horde")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+# Costo de una página del muro según su profundidad: cursor (fecha, id) contra el OFFSET de antes.
+# Con el cursor la página 1 y la página 30.000 cuestan lo mismo; con OFFSET crece con la profundidad.
+#
+#   python -m scripts.bench.paginacion [--obras 1000000] [--repeticiones 20]
+
+# Imports estándar
+import time
+import asyncio
+import argparse
+
+# Imports internos
+from scripts.bench.comun import preparar_entorno
+
+preparar_entorno()
+
+from sqlalchemy import text
+from sqlalchemy.future import select
+
+from scripts.bench.comun import (
+    fecha_obra, id_obra, informar, percentiles, preparar_base, sembrar_obras, sembrar_usuarios,
+)
+from app.db.database import SessionLocal
+from app.models.obra import Obra
+from app.models.usuario import Usuario
+from app.routers.obras import COLUMNAS_FEED, _consultar_muro
+from app.utils.paginacion import codificar_cursor
+
+
+# La consulta paginada con OFFSET, como antes del cursor
+async def _pagina_offset(db, limit: int, profundidad: int):
+    stmt = (
+        select(*COLUMNAS_FEED)
+        .join(Usuario, Usuario.id == Obra.autor_id)
+        .where(Obra.publicada == True)
+        .order_by(Obra.fecha.desc(), Obra.id.desc())
+        .offset(profundidad)
+        .limit(limit)
+    )
+    return (await db.execute(stmt)).all()
+
+
+# Cursor de la página que empieza en la obra `profundidad` (la anterior es la última de la página previa)
+async def _pagina_cursor(db, limit: int, profundidad: int):
+    cursor = codificar_cursor(fecha_obra(profundidad - 1), id_obra(profundidad - 1)) if profundidad else None
+    items, _ = await _consultar_muro(db, limit, cursor, sin_paginar=False)
+    return items
+
+
+async def _medir(consulta, limit: int, profundidad: int, repeticiones: int) -> list:
+    muestras = []
+    async with SessionLocal() as db:
+        primera = None
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            filas = await consulta(db, limit, profundidad)
+            muestras.append((time.perf_counter() - inicio) * 1000)
+            primera = filas[0]
+    return muestras, primera
+
+
+async def main(args) -> None:
+    await preparar_base()
+    await sembrar_usuarios(100)
+    await sembrar_obras(args.obras, autores=100)
+    async with SessionLocal() as db:
+        await db.execute(text("ANALYZE"))  # Estadísticas al día para el planificador (SQLite y Postgres)
+
+    profundidades = sorted({0, 1000, 10_000, 100_000, args.obras // 2, args.obras - args.limit})
+    filas = []
+    for profundidad in (p for p in profundidades if p < args.obras):
+        cursor, item = await _medir(_pagina_cursor, args.limit, profundidad, args.repeticiones)
+        offset, fila = await _medir(_pagina_offset, args.limit, profundidad, args.repeticiones)
+        assert item["id"] == fila[0] == id_obra(profundidad), "las dos consultas deben devolver la misma página"
+        p_cursor, p_offset = percentiles(cursor), percentiles(offset)
+        filas.append({
+            "profundidad": profundidad,
+            "cursor_p50": p_cursor["p50"],
+            "cursor_p99": p_cursor["p99"],
+            "offset_p50": p_offset["p50"],
+            "offset_p99": p_offset["p99"],
+        })
+    informar(f"Página de {args.limit} obras sobre {args.obras:,} (ms)", filas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paginación por cursor contra OFFSET")
+    parser.add_argument("--obras", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
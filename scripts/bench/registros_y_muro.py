@@ -0,0 +1,116 @@
+# p99 del muro mientras llegan 50 registros a la vez: hash de contraseñas en el pool acotado (como ahora)
+# contra hash en el event loop (como antes). Los registros que exceden HASH_WORKERS + HASH_COLA_MAX
+# reciben 503 en lugar de encolarse.
+#
+#   python -m scripts.bench.registros_y_muro [--registros 50] [--lectores 8]
+#
+# --esquema pbkdf2_sha256 cambia bcrypt por PBKDF2 de costo parecido (para entornos donde passlib no
+# puede usar la versión instalada de bcrypt); el cálculo también libera el GIL.
+
+# Imports estándar
+import time
+import asyncio
+import argparse
+from itertools import count
+
+# Imports internos
+from scripts.bench.comun import preparar_entorno
+
+preparar_entorno()
+
+from passlib.context import CryptContext
+
+from scripts.bench.comun import cliente, informar, percentiles, preparar_base, sembrar_obras, sembrar_usuarios
+from app.routers import usuarios
+from app.utils import security
+
+_emails = count()
+
+
+async def _hash_en_el_loop(password: str) -> str:
+    return security.pwd_context.hash(password)
+
+
+# Lectores anónimos pidiendo el muro sin pausa hasta que se activa `fin`
+async def _leer_muro(http, fin: asyncio.Event, muestras: list) -> None:
+    while not fin.is_set():
+        inicio = time.perf_counter()
+        response = await http.get("/obras/muro", params={"limit": 20})
+        muestras.append((time.perf_counter() - inicio) * 1000)
+        response.raise_for_status()
+
+
+# Código de respuesta, o 500 si la app lanzó (SQLite corta con "database is locked" las transacciones
+# que quedan esperando mientras el loop está bloqueado)
+async def _registrar(http) -> int:
+    n = next(_emails)
+    try:
+        response = await http.post(
+            "/usuarios/registrar",
+            json={"email": f"registro{n}@example.com", "userName": f"registro{n}", "password": "una-clave-de-prueba"},
+        )
+    except Exception:
+        return 500
+    return response.status_code
+
+
+async def _escenario(nombre: str, http, args) -> dict:
+    fin, muestras = asyncio.Event(), []
+    lectores = [asyncio.create_task(_leer_muro(http, fin, muestras)) for _ in range(args.lectores)]
+    await asyncio.sleep(0.2)
+    inicio = time.perf_counter()
+    codigos = []
+    if args.registros and nombre != "sin registros":
+        codigos = await asyncio.gather(*(_registrar(http) for _ in range(args.registros)))
+    else:
+        await asyncio.sleep(args.duracion_base)
+    duracion = time.perf_counter() - inicio
+    fin.set()
+    await asyncio.gather(*lectores)
+    return {
+        "escenario": nombre,
+        "registrados": codigos.count(200),
+        "rechazados_503": codigos.count(503),
+        "errores": sum(codigo not in (200, 503) for codigo in codigos),
+        "segundos": duracion,
+        **percentiles(muestras),
+    }
+
+
+async def main(args) -> None:
+    if args.esquema == "pbkdf2_sha256":
+        security.pwd_context = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__rounds=args.rondas_pbkdf2)
+    inicio = time.perf_counter()
+    security.pwd_context.hash("calibracion")
+    print(f"   Un hash ({args.esquema}): {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    await preparar_base()
+    await sembrar_usuarios(10)
+    await sembrar_obras(1000, autores=10)
+
+    filas = []
+    async with cliente() as http:
+        await http.get("/obras/muro", params={"limit": 20})  # Calentamiento (y cache del muro)
+        filas.append(await _escenario("sin registros", http, args))
+        filas.append(await _escenario("pool acotado", http, args))
+        original = usuarios.hashear_password_async
+        usuarios.hashear_password_async = _hash_en_el_loop
+        try:
+            filas.append(await _escenario("en el event loop", http, args))
+        finally:
+            usuarios.hashear_password_async = original
+    informar(
+        f"GET /obras/muro (ms) con {args.registros} registros simultáneos "
+        f"(HASH_WORKERS={security.HASH_WORKERS}, HASH_COLA_MAX={security.HASH_COLA_MAX})",
+        filas,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia del muro durante una ráfaga de registros")
+    parser.add_argument("--registros", type=int, default=50)
+    parser.add_argument("--lectores", type=int, default=8, help="clientes pidiendo el muro en paralelo")
+    parser.add_argument("--duracion-base", type=float, default=3, help="segundos del escenario sin registros")
+    parser.add_argument("--esquema", choices=["bcrypt", "pbkdf2_sha256"], default="bcrypt")
+    parser.add_argument("--rondas-pbkdf2", type=int, default=600_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+# Costo por cada 1.000 filas del feed: ORM + copia de __dict__ + validación de response_model + json
+# (como antes) contra columnas proyectadas + _item_feed + orjson (como ahora), separado por etapa.
+#
+#   python -m scripts.bench.serializacion_feed [--filas 1000] [--repeticiones 50]
+
+# Imports estándar
+import json
+import time
+import asyncio
+import argparse
+from typing import List
+
+# Imports internos
+from scripts.bench.comun import preparar_entorno
+
+preparar_entorno()
+
+from pydantic import TypeAdapter
+from sqlalchemy.future import select
+
+from scripts.bench.comun import informar, percentiles, preparar_base, sembrar_obras, sembrar_usuarios
+from app.db.database import SessionLocal
+from app.models.obra import Obra
+from app.models.usuario import Usuario
+from app.routers.obras import COLUMNAS_FEED, _item_feed
+from app.schemas.obra import ObraOut
+from app.services.cache_muro import serializar
+from app.services.derivados import urls_derivados
+from app.services.valoraciones import promedio_truncado
+
+# Lo que hacía FastAPI con response_model=List[ObraOut] antes de responder con JSONResponse
+_RESPUESTA = TypeAdapter(List[ObraOut])
+
+
+async def _antes(db) -> dict:
+    etapas = {}
+    inicio = time.perf_counter()
+    filas = (await db.execute(select(Obra, Usuario.userName).join(Usuario, Usuario.id == Obra.autor_id))).all()
+    etapas["consulta"] = time.perf_counter()
+    obras = [
+        {
+            **obra.__dict__,
+            "archivoJPG": obra.archivoJPG,
+            "autor_nombre": autor_nombre,
+            "promedio_valoracion": promedio_truncado(obra.suma_puntuacion, obra.cantidad_valoraciones),
+            "cantidad_valoraciones": obra.cantidad_valoraciones,
+            "derivados": urls_derivados(obra.archivoJPG),
+        }
+        for obra, autor_nombre in filas
+    ]
+    etapas["armado"] = time.perf_counter()
+    validadas = _RESPUESTA.dump_python(_RESPUESTA.validate_python(obras), mode="json")
+    cuerpo = json.dumps(validadas, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etapas["serializacion"] = time.perf_counter()
+    db.expunge_all()  # Sin esto las obras quedan en el identity map y la siguiente vuelta no hidrata
+    return _duraciones(inicio, etapas, cuerpo)
+
+
+async def _ahora(db) -> dict:
+    etapas = {}
+    inicio = time.perf_counter()
+    filas = (await db.execute(select(*COLUMNAS_FEED).join(Usuario, Usuario.id == Obra.autor_id))).all()
+    etapas["consulta"] = time.perf_counter()
+    obras = [_item_feed(fila) for fila in filas]
+    etapas["armado"] = time.perf_counter()
+    cuerpo = serializar(obras)
+    etapas["serializacion"] = time.perf_counter()
+    return _duraciones(inicio, etapas, cuerpo)
+
+
+def _duraciones(inicio: float, etapas: dict, cuerpo: bytes) -> dict:
+    duraciones, anterior = {}, inicio
+    for etapa, momento in etapas.items():
+        duraciones[etapa] = (momento - anterior) * 1000
+        anterior = momento
+    duraciones["total"] = (anterior - inicio) * 1000
+    duraciones["cuerpo"] = cuerpo
+    return duraciones
+
+
+async def _medir(version, repeticiones: int, por_mil: float) -> tuple:
+    muestras = {"consulta": [], "armado": [], "serializacion": [], "total": []}
+    async with SessionLocal() as db:
+        await version(db)  # Calentamiento
+        for _ in range(repeticiones):
+            duraciones = await version(db)
+            for etapa in muestras:
+                muestras[etapa].append(duraciones[etapa] * por_mil)
+    return {etapa: percentiles(valores)["p50"] for etapa, valores in muestras.items()}, duraciones["cuerpo"]
+
+
+async def main(args) -> None:
+    await preparar_base()
+    await sembrar_usuarios(10)
+    await sembrar_obras(args.filas, autores=10)
+
+    por_mil = 1000 / args.filas
+    antes, cuerpo_antes = await _medir(_antes, args.repeticiones, por_mil)
+    ahora, cuerpo_ahora = await _medir(_ahora, args.repeticiones, por_mil)
+    assert json.loads(cuerpo_antes) == json.loads(cuerpo_ahora), "las dos versiones deben responder lo mismo"
+
+    informar(
+        f"Feed de {args.filas:,} filas: ms por cada 1.000 filas (p50 de {args.repeticiones})",
+        [
+            {"version": "ORM + response_model + json", **antes, "bytes": len(cuerpo_antes)},
+            {"version": "columnas + _item_feed + orjson", **ahora, "bytes": len(cuerpo_ahora)},
+        ],
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serialización del feed antes y después")
+    parser.add_argument("--filas", type=int, default=1000)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
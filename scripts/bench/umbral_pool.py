@@ -0,0 +1,142 @@
+# Umbral de agotamiento del pool con requests autenticados concurrentes a /obras/mis-obras.
+# "compartida": la dependencia de autenticación y el handler usan la misma sesión (una conexión por request).
+# "antes": get_current_user con su propia sesión, como cuando cada módulo tenía su get_db (dos conexiones).
+# Con DB_POOL_SIZE=5 y DB_MAX_OVERFLOW=5 la sesión compartida debería empezar a esperar con el doble de
+# requests simultáneos.
+#
+#   python -m scripts.bench.umbral_pool [--max-concurrencia 16] [--rondas 20]
+
+# Imports estándar
+import time
+import asyncio
+import argparse
+
+# Imports internos
+from scripts.bench.comun import preparar_entorno
+
+preparar_entorno(DB_POOL_SIZE="5", DB_MAX_OVERFLOW="5", DB_POOL_TIMEOUT="2")
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event
+from sqlalchemy.future import select
+
+from scripts.bench.comun import cliente, id_usuario, informar, percentiles, preparar_base, sembrar_obras, sembrar_usuarios
+from app.db.config import config_db
+from app.db.database import SessionLocal, engine
+from app.main import app
+from app.models.usuario import Usuario
+from app.utils.auth import UsuarioActual, get_current_user, security, verificar_token
+from app.utils.jwt import crear_token
+
+
+async def _sesion_propia():
+    async with SessionLocal() as db:
+        yield db
+
+
+# get_current_user de antes: su propia sesión (otra conexión que queda tomada hasta el final del request)
+async def _usuario_con_sesion_propia(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db=Depends(_sesion_propia),
+) -> UsuarioActual:
+    payload = verificar_token(credentials.credentials)
+    if not payload:
+        raise HTTPException(status_code=401, detail="Token inválido")
+    result = await db.execute(
+        select(Usuario.id, Usuario.email, Usuario.userName).where(Usuario.email == payload["sub"])
+    )
+    return UsuarioActual(*result.one())
+
+
+# Conexiones tomadas del pool en cada momento y el máximo alcanzado
+class ContadorPool:
+    def __init__(self):
+        self.en_uso = 0
+        self.pico = 0
+        event.listen(engine.sync_engine, "checkout", self._checkout)
+        event.listen(engine.sync_engine, "checkin", self._checkin)
+
+    def _checkout(self, *_):
+        self.en_uso += 1
+        self.pico = max(self.pico, self.en_uso)
+
+    def _checkin(self, *_):
+        self.en_uso -= 1
+
+
+async def _ronda(http, headers, concurrencia: int, muestras: list) -> int:
+    async def uno(n: int) -> int:
+        inicio = time.perf_counter()
+        response = await http.get("/obras/mis-obras", headers=headers[n % len(headers)], params={"limit": 20})
+        muestras.append((time.perf_counter() - inicio) * 1000)
+        return response.status_code
+
+    codigos = await asyncio.gather(*(uno(n) for n in range(concurrencia)), return_exceptions=True)
+    return sum(codigo != 200 for codigo in codigos)
+
+
+async def _barrido(modo: str, http, headers, args) -> list:
+    if modo == "antes":
+        app.dependency_overrides[get_current_user] = _usuario_con_sesion_propia
+    filas = []
+    try:
+        for concurrencia in range(1, args.max_concurrencia + 1):
+            contador, metricas = ContadorPool(), engine.pool.metricas
+            metricas.update(checkouts=0, espera_total_ms=0.0, espera_max_ms=0.0, timeouts=0)
+            muestras, errores = [], 0
+            for _ in range(args.rondas):
+                errores += await _ronda(http, headers, concurrencia, muestras)
+            filas.append({
+                "modo": modo,
+                "concurrencia": concurrencia,
+                "pico_conexiones": contador.pico,
+                "espera_max_ms": metricas["espera_max_ms"],
+                "timeouts": metricas["timeouts"],
+                "errores": errores,
+                "p99_ms": percentiles(muestras)["p99"],
+            })
+            event.remove(engine.sync_engine, "checkout", contador._checkout)
+            event.remove(engine.sync_engine, "checkin", contador._checkin)
+            if errores and not args.seguir_tras_errores:
+                break  # Pool agotado: con más concurrencia sólo se acumulan timeouts
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+    return filas
+
+
+# Menor concurrencia que ocupa todo el pool: desde ahí los requests hacen cola por una conexión.
+# (espera_max_ms incluye abrir conexiones nuevas del overflow, por eso no sirve como umbral)
+def _umbral(filas: list, capacidad: int) -> int:
+    return min((f["concurrencia"] for f in filas if f["pico_conexiones"] >= capacidad), default=0)
+
+
+async def main(args) -> None:
+    await preparar_base()
+    await sembrar_usuarios(args.usuarios)
+    await sembrar_obras(args.usuarios * 20, autores=args.usuarios)
+    headers = [
+        {"Authorization": f"Bearer {crear_token(Usuario(email=f'bench{n}@bench.test', userName=f'bench{n}'))}"}
+        for n in range(args.usuarios)
+    ]
+
+    async with cliente() as http:
+        await _ronda(http, headers, 1, [])  # Calentamiento
+        antes = await _barrido("antes", http, headers, args)
+        compartida = await _barrido("compartida", http, headers, args)
+
+    informar("GET /obras/mis-obras autenticado, pool de 5 + 5", antes + compartida)
+    capacidad = engine.pool.size() + config_db.db_max_overflow
+    print(
+        f"\nPool completo ({capacidad} conexiones) con: antes {_umbral(antes, capacidad)}, "
+        f"sesión compartida {_umbral(compartida, capacidad)} requests simultáneos"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Umbral de agotamiento del pool por modo de sesión")
+    parser.add_argument("--max-concurrencia", type=int, default=16)
+    parser.add_argument("--rondas", type=int, default=20)
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--seguir-tras-errores", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,77 @@
+# Imports estándar
+import os
+import tempfile
+from typing import List
+
+# Base SQLite propia antes de importar la app: el motor se crea al importar app.db.database
+_DIRECTORIO = tempfile.mkdtemp(prefix="artificial-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DIRECTORIO}/tests.db"
+os.environ["DB_MODO"] = "sqlite"
+os.environ["IMAGENES_STORE"] = "local"
+os.environ["LOG_MODO"] = "directo"
+
+# Imports de terceros
+import httpx
+import pytest
+from sqlalchemy import event, delete
+
+# Imports internos
+from app.main import app
+from app.db.database import Base, engine
+from app.db.esquema import verificar_esquema
+from app.services import almacen
+from app.services.almacen import AlmacenLocal
+from app.services.cache_muro import cache_muro
+from app.utils.auth import cache_usuarios
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+# Migraciones una vez por sesión (las mismas que corren al arrancar en SQLite)
+@pytest.fixture(scope="session")
+async def esquema(anyio_backend):
+    await verificar_esquema()
+    yield
+    await engine.dispose()
+
+
+# Cada test arranca con las tablas vacías y los caches en memoria limpios
+@pytest.fixture(autouse=True)
+async def base_limpia(esquema):
+    async with engine.begin() as conn:
+        for tabla in reversed(Base.metadata.sorted_tables):
+            await conn.execute(delete(tabla))
+    cache_muro.invalidar()
+    cache_usuarios._entradas.clear()
+    yield
+    await engine.dispose()  # Las conexiones del pool no pasan de un event loop a otro
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+
+
+# Almacén local en un directorio temporal del test (no escribe en output/)
+@pytest.fixture
+def almacen_local(monkeypatch, tmp_path) -> AlmacenLocal:
+    local = AlmacenLocal(directorio=tmp_path)
+    monkeypatch.setitem(almacen._almacenes, "local", local)
+    return local
+
+
+# Sentencias SQL que llegan al cursor mientras dura el test (se puede vaciar con .clear())
+@pytest.fixture
+def sentencias() -> List[str]:
+    ejecutadas: List[str] = []
+
+    def registrar(conn, cursor, sentencia, parametros, contexto, executemany):
+        ejecutadas.append(sentencia)
+
+    event.listen(engine.sync_engine, "after_cursor_execute", registrar)
+    yield ejecutadas
+    event.remove(engine.sync_engine, "after_cursor_execute", registrar)
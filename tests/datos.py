@@ -0,0 +1,32 @@
+# Imports estándar
+from typing import List
+
+# Imports internos
+from app.db.database import SessionLocal
+from app.models.usuario import Usuario
+from app.models.obra import Obra
+from app.utils.jwt import crear_token
+
+
+async def crear_usuario(email: str = "autora@test.com", userName: str = "autora") -> Usuario:
+    async with SessionLocal() as db:
+        usuario = Usuario(email=email, userName=userName, password=None)
+        db.add(usuario)
+        await db.commit()
+        return usuario
+
+
+async def crear_obras(autor: Usuario, cantidad: int, publicada: bool = True) -> List[Obra]:
+    async with SessionLocal() as db:
+        obras = [
+            Obra(nombre=f"obra {i}", descripcion="", tipoArte="digital",
+                 archivoJPG=f"http://test/imagenes/{autor.id}-{i}.webp", publicada=publicada, autor_id=autor.id)
+            for i in range(cantidad)
+        ]
+        db.add_all(obras)
+        await db.commit()
+        return obras
+
+
+def autorizacion(usuario: Usuario) -> dict:
+    return {"Authorization": f"Bearer {crear_token(usuario)}"}
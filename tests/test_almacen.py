@@ -0,0 +1,121 @@
+# Imports estándar
+import io
+from pathlib import Path
+
+# Imports de terceros
+import pytest
+from sqlalchemy.future import select
+
+# Imports internos
+from app.db.database import SessionLocal
+from app.models.obra import Obra
+from app.models.blob_imagen import BlobImagen
+from app.models.trabajo import TrabajoGeneracion, ESTADO_COMPLETADO
+from app.services import cola
+from app.services.almacen import AlmacenLocal, guardar_imagen, sumar_referencia
+from app.services.borrado import eliminar_obras
+from app.services.cola import ColaGeneracion
+from app.services.ingesta import ingesta_imagenes
+from tests.datos import crear_usuario, autorizacion
+
+pytestmark = pytest.mark.anyio
+
+CONTENIDO = b"RIFF....WEBPVP8 imagen de prueba"
+
+
+# Obra ya publicada con esa imagen (el blob queda con una referencia)
+async def _obra_con_imagen(autor, url: str) -> Obra:
+    async with SessionLocal() as db:
+        obra = Obra(nombre="original", archivoJPG=url, publicada=True, autor_id=autor.id)
+        db.add(obra)
+        assert await sumar_referencia(db, url)
+        await db.commit()
+        return obra
+
+
+async def _blob(url: str):
+    async with SessionLocal() as db:
+        return (await db.execute(select(BlobImagen).where(BlobImagen.url == url))).scalar_one_or_none()
+
+
+def _archivo(local: AlmacenLocal, blob: BlobImagen) -> Path:
+    return local.directorio / blob.ubicacion
+
+
+async def test_sumar_referencia_detecta_blob_propio_borrado(almacen_local):
+    url = await guardar_imagen(io.BytesIO(CONTENIDO), "webp")
+    async with SessionLocal() as db:
+        assert await sumar_referencia(db, url)
+        assert await sumar_referencia(db, "https://r2.stablehorde.net/ajena.webp")  # Fuera del índice
+        await db.rollback()
+
+    blob = await _blob(url)
+    async with SessionLocal() as db:
+        await db.delete(await db.get(BlobImagen, blob.hash))
+        await db.commit()
+    async with SessionLocal() as db:
+        assert not await sumar_referencia(db, url)
+
+
+# Deduplicación contra una imagen cuya última obra se borra antes de tomar la referencia
+async def test_generar_con_imagen_deduplicada_borrada_en_el_medio(client, almacen_local, monkeypatch):
+    autora = await crear_usuario()
+    url_original = await guardar_imagen(io.BytesIO(CONTENIDO), "webp")
+    original = await _obra_con_imagen(autora, url_original)
+    ingestas = []
+
+    async def ingerir(url):
+        imagen_url = await guardar_imagen(io.BytesIO(CONTENIDO), "webp")
+        ingestas.append(imagen_url)
+        if len(ingestas) == 1:
+            async with SessionLocal() as db:  # Borrado concurrente de la única obra que la usaba
+                await eliminar_obras(db, Obra.id == original.id)
+        return imagen_url
+
+    monkeypatch.setattr(ingesta_imagenes, "ingerir", ingerir)
+    response = await client.post(
+        "/obras/generar",
+        json={"nombre": "copia", "descripcion": "", "tipoArte": "digital", "prompt": "", "imagen": "https://img.test/a.webp"},
+        headers=autorizacion(autora),
+    )
+
+    assert response.status_code == 200
+    assert ingestas[0] == url_original and ingestas[1] != url_original
+    async with SessionLocal() as db:
+        obra = (await db.execute(select(Obra))).scalar_one()
+    blob = await _blob(obra.archivoJPG)
+    assert blob is not None and blob.referencias == 1
+    assert _archivo(almacen_local, blob).exists()
+
+
+async def test_worker_regenera_si_la_imagen_del_cache_se_borro(almacen_local, monkeypatch):
+    autora = await crear_usuario()
+    url_original = await guardar_imagen(io.BytesIO(CONTENIDO), "webp")
+    original = await _obra_con_imagen(autora, url_original)
+    pedidos = []
+
+    async def generar(usar_cache, **kwargs):
+        pedidos.append(usar_cache)
+        if len(pedidos) == 1:
+            async with SessionLocal() as db:
+                await eliminar_obras(db, Obra.id == original.id)
+            return url_original
+        return await guardar_imagen(io.BytesIO(CONTENIDO + b" nueva"), "webp")
+
+    monkeypatch.setattr(cola, "generar_imagen", generar)
+    async with SessionLocal() as db:
+        trabajo = TrabajoGeneracion(nombre="gato", prompt="un gato", autor_id=autora.id)
+        db.add(trabajo)
+        await db.commit()
+
+    cola_generacion = ColaGeneracion(workers=1)
+    trabajo = await cola_generacion._reclamar(trabajo.id)
+    await cola_generacion._generar(trabajo)
+
+    assert pedidos == [True, False]
+    async with SessionLocal() as db:
+        trabajo = await db.get(TrabajoGeneracion, trabajo.id)
+        obra = await db.get(Obra, trabajo.obra_id)
+    assert trabajo.estado == ESTADO_COMPLETADO and obra.archivoJPG != url_original
+    blob = await _blob(obra.archivoJPG)
+    assert blob.referencias == 1 and _archivo(almacen_local, blob).exists()
@@ -0,0 +1,165 @@
+# Imports estándar
+import asyncio
+
+# Imports de terceros
+import httpx
+import pytest
+from sqlalchemy.future import select
+
+# Imports internos
+from app.db.database import SessionLocal
+from app.models.cache_generacion import CacheGeneracion
+from app.models.trabajo import TrabajoGeneracion
+from app.services import generador
+from app.services.cola import cola_generacion
+from app.services.cache import CacheGeneraciones, CacheMemoria, CacheDB
+from app.services.generador import StableHordeClient
+from tests.datos import crear_usuario, autorizacion
+
+pytestmark = pytest.mark.anyio
+
+
+# Horde falso que termina al primer chequeo; cuenta los envíos (cada uno gasta kudos)
+@pytest.fixture
+async def horde(monkeypatch):
+    envios = []
+
+    async def manejador(request):
+        ruta = request.url.path
+        if ruta.endswith("/generate/async"):
+            envios.append(request)
+            request_id = f"id-{len(envios)}"
+            await asyncio.sleep(0.05)  # Da tiempo a que lleguen los pedidos concurrentes
+            return httpx.Response(202, json={"id": request_id})
+        request_id = ruta.rsplit("/", 1)[1]
+        if "/generate/check/" in ruta:
+            return httpx.Response(200, json={"done": True})
+        return httpx.Response(200, json={"generations": [{"img": f"https://img.test/{request_id}.webp"}]})
+
+    cliente = StableHordeClient(transport=httpx.MockTransport(manejador), tasa_por_segundo=1000, rafaga=100)
+    cliente.poller.intervalo_min = 0.01
+    monkeypatch.setattr(generador, "_horde_client", cliente)
+    monkeypatch.setattr(generador, "cache_generaciones", CacheGeneraciones(CacheMemoria()))
+    yield envios
+    await cliente.cerrar()
+
+
+async def test_pedidos_identicos_concurrentes_comparten_una_llamada(horde):
+    prompts = ["un gato", "Un  gato ", "un gato", "UN GATO"] * 3  # Misma clave normalizada
+    urls = await asyncio.gather(*(generador.generar_imagen(prompt) for prompt in prompts))
+    assert len(horde) == 1 and len(set(urls)) == 1
+    assert generador.cache_generaciones.metricas == {"aciertos": 0, "fallos": 1, "coalescidas": len(prompts) - 1}
+
+    # Después sale del cache, sin volver a Horde
+    assert await generador.generar_imagen("un gato") == urls[0]
+    assert len(horde) == 1 and generador.cache_generaciones.metricas["aciertos"] == 1
+
+
+async def test_distintos_parametros_no_comparten(horde):
+    await asyncio.gather(generador.generar_imagen("un gato"), generador.generar_imagen("un gato", nsfw=True),
+                         generador.generar_imagen("un perro"))
+    assert len(horde) == 3
+
+
+# usar_cache=False (sin_cache en el endpoint): muestra nueva aunque haya una cacheada, y la reemplaza
+async def test_usar_cache_false_genera_de_nuevo(horde):
+    primera = await generador.generar_imagen("un gato")
+    nueva = await generador.generar_imagen("un gato", usar_cache=False)
+    assert len(horde) == 2 and nueva != primera
+    assert await generador.generar_imagen("un gato") == nueva
+
+
+async def test_sin_cache_llega_al_trabajo(client, monkeypatch):
+    encolados = []
+
+    async def encolar(trabajo_id):
+        encolados.append(trabajo_id)
+
+    monkeypatch.setattr(cola_generacion, "encolar", encolar)  # Sin workers: sólo interesa el trabajo guardado
+    autora = await crear_usuario()
+    for sin_cache, esperado in (("true", False), ("false", True)):
+        response = await client.post(
+            "/obras/generar", params={"sin_cache": sin_cache},
+            json={"nombre": "gato", "descripcion": "", "tipoArte": "digital", "prompt": ""},
+            headers=autorizacion(autora),
+        )
+        assert response.status_code == 202
+        async with SessionLocal() as db:
+            trabajo = await db.get(TrabajoGeneracion, response.json()["trabajo_id"])
+        assert trabajo.usar_cache is esperado
+    assert len(encolados) == 2
+
+
+# Si la generación falla, todos los que esperaban reciben el error y no queda nada cacheado
+async def test_error_se_comparte_y_no_se_cachea():
+    cache = CacheGeneraciones(CacheMemoria())
+    llamadas = []
+
+    async def fallar():
+        llamadas.append(1)
+        await asyncio.sleep(0.02)
+        raise RuntimeError("Horde caído")
+
+    resultados = await asyncio.gather(*(cache.obtener_o_generar("k", fallar) for _ in range(5)), return_exceptions=True)
+    assert len(llamadas) == 1 and all(isinstance(r, RuntimeError) for r in resultados)
+    assert await cache.backend.obtener("k") is None
+
+
+async def test_memoria_expira_por_ttl():
+    cache = CacheMemoria(ttl=0.05)
+    await cache.guardar("k", "https://img.test/a.webp")
+    assert await cache.obtener("k") == "https://img.test/a.webp"
+    await asyncio.sleep(0.06)
+    assert await cache.obtener("k") is None
+
+
+async def test_memoria_descarta_la_menos_usada():
+    cache = CacheMemoria(max_entradas=2)
+    await cache.guardar("a", "url-a")
+    await cache.guardar("b", "url-b")
+    assert await cache.obtener("a") == "url-a"  # "a" pasa a ser la más reciente
+    await cache.guardar("c", "url-c")
+    assert await cache.obtener("b") is None
+    assert await cache.obtener("a") == "url-a" and await cache.obtener("c") == "url-c"
+
+
+@pytest.mark.parametrize("backend", [CacheMemoria, CacheDB])
+async def test_invalidar_url(backend):
+    cache = backend()
+    await cache.guardar("a", "url-compartida")
+    await cache.guardar("b", "url-compartida")
+    await cache.guardar("c", "otra")
+    await cache.invalidar_url("url-compartida")
+    assert [await cache.obtener(c) for c in "abc"] == [None, None, "otra"]
+
+
+async def test_db_guarda_reemplaza_y_expira():
+    cache = CacheDB()
+    assert await cache.obtener("k") is None
+    await cache.guardar("k", "url-1")
+    await cache.guardar("k", "url-2")
+    assert await cache.obtener("k") == "url-2"
+
+    # Otra instancia (otro worker o tras un reinicio) ve la misma entrada
+    assert await CacheDB().obtener("k") == "url-2"
+
+    vencido = CacheDB(ttl=-1)
+    assert await vencido.obtener("k") is None
+    async with SessionLocal() as db:
+        assert (await db.execute(select(CacheGeneracion))).scalars().all() == []  # La entrada vencida se borra
+
+
+# Coalescencia sobre el backend en base: el segundo pedido sale de la tabla
+async def test_coalescencia_con_backend_db():
+    cache = CacheGeneraciones(CacheDB())
+    llamadas = []
+
+    async def generar():
+        llamadas.append(1)
+        await asyncio.sleep(0.02)
+        return "https://img.test/db.webp"
+
+    urls = await asyncio.gather(*(cache.obtener_o_generar("k", generar) for _ in range(5)))
+    assert set(urls) == {"https://img.test/db.webp"} and len(llamadas) == 1
+    assert await cache.obtener_o_generar("k", generar) == "https://img.test/db.webp"
+    assert len(llamadas) == 1 and cache.metricas["aciertos"] == 1
@@ -0,0 +1,103 @@
+# Imports de terceros
+import pytest
+
+# Imports internos
+from app.db.database import SessionLocal
+from app.models.trabajo import TrabajoGeneracion
+from app.services import cola
+from app.services.cola import ColaGeneracion
+from app.services.cache_muro import cache_muro
+from app.services.ingesta import ingesta_imagenes
+from tests.datos import crear_usuario, crear_obras, autorizacion
+
+pytestmark = pytest.mark.anyio
+
+IMAGEN_EXTERNA = "https://r2.stablehorde.net/generada.webp"  # Fuera del índice de blobs: no se deduplica
+
+
+async def _generar(client, autora, obras, visitante, monkeypatch):
+    async def ingerir(url):
+        return IMAGEN_EXTERNA
+
+    monkeypatch.setattr(ingesta_imagenes, "ingerir", ingerir)
+    response = await client.post(
+        "/obras/generar",
+        json={"nombre": "nueva", "descripcion": "", "tipoArte": "digital", "prompt": "", "imagen": "https://img.test/a.webp"},
+        headers=autorizacion(autora),
+    )
+    assert response.status_code == 200
+
+
+async def _worker(client, autora, obras, visitante, monkeypatch):
+    async def generar_imagen(**kwargs):
+        return IMAGEN_EXTERNA
+
+    monkeypatch.setattr(cola, "generar_imagen", generar_imagen)
+    async with SessionLocal() as db:
+        trabajo = TrabajoGeneracion(nombre="de la cola", prompt="un gato", autor_id=autora.id)
+        db.add(trabajo)
+        await db.commit()
+    cola_generacion = ColaGeneracion(workers=1)
+    await cola_generacion._generar(await cola_generacion._reclamar(trabajo.id))
+
+
+async def _publicar(client, autora, obras, visitante, monkeypatch):
+    response = await client.patch(f"/obras/{obras[0].id}/publicar", json={"publicada": False}, headers=autorizacion(autora))
+    assert response.status_code == 200
+
+
+async def _eliminar(client, autora, obras, visitante, monkeypatch):
+    response = await client.delete(f"/obras/{obras[0].id}", headers=autorizacion(autora))
+    assert response.status_code == 200
+
+
+async def _eliminar_todas(client, autora, obras, visitante, monkeypatch):
+    assert (await client.delete("/obras/obras/eliminar-todas")).status_code == 200
+
+
+async def _valorar(client, autora, obras, visitante, monkeypatch):
+    response = await client.post(f"/obras/{obras[0].id}/valorar", json={"puntuacion": 4}, headers=autorizacion(visitante))
+    assert response.status_code == 200
+
+
+async def _valorar_lote(client, autora, obras, visitante, monkeypatch):
+    response = await client.post(
+        "/obras/valorar-lote",
+        json={"valoraciones": [{"obra_id": obra.id, "puntuacion": 3} for obra in obras]},
+        headers=autorizacion(visitante),
+    )
+    assert response.json()["registradas"] == len(obras)
+
+
+# Cada cambio que se ve en el muro tiene que descartar la respuesta cacheada (cuerpo y ETag)
+@pytest.mark.parametrize("cambio", [
+    _generar, _worker, _publicar, _eliminar, _eliminar_todas, _valorar, _valorar_lote,
+], ids=lambda cambio: cambio.__name__.strip("_"))
+async def test_cambios_invalidan_el_muro(client, monkeypatch, cambio):
+    autora = await crear_usuario()
+    visitante = await crear_usuario("visitante@test.com", "visitante")
+    obras = await crear_obras(autora, 2)
+
+    cacheada = await client.get("/obras/muro")
+    assert (await client.get("/obras/muro", headers={"If-None-Match": cacheada.headers["etag"]})).status_code == 304
+    version = cache_muro.version
+
+    await cambio(client, autora, obras, visitante, monkeypatch)
+
+    assert cache_muro.version > version
+    nueva = await client.get("/obras/muro", headers={"If-None-Match": cacheada.headers["etag"]})
+    assert nueva.status_code == 200
+    assert nueva.headers["etag"] != cacheada.headers["etag"]
+    assert nueva.content != cacheada.content
+
+
+async def test_etag_coincidente_responde_304_sin_consultas(client, sentencias):
+    await crear_obras(await crear_usuario(), 3)
+    primera = await client.get("/obras/muro")
+    assert primera.status_code == 200
+
+    sentencias.clear()
+    response = await client.get("/obras/muro", headers={"If-None-Match": primera.headers["etag"]})
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["etag"] == primera.headers["etag"]
+    assert sentencias == []
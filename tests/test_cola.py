@@ -0,0 +1,116 @@
+# Imports estándar
+import asyncio
+from datetime import datetime, timedelta
+
+# Imports de terceros
+import pytest
+from sqlalchemy.future import select
+
+# Imports internos
+from app.db.database import SessionLocal
+from app.models.obra import Obra
+from app.models.trabajo import TrabajoGeneracion, ESTADO_PENDIENTE, ESTADO_PROCESANDO, ESTADO_COMPLETADO
+from app.services import cola
+from app.services.cola import ColaGeneracion
+from tests.datos import crear_usuario
+
+pytestmark = pytest.mark.anyio
+
+
+async def _crear_trabajo(autor, **valores) -> str:
+    async with SessionLocal() as db:
+        trabajo = TrabajoGeneracion(**{"nombre": "obra", "prompt": "un gato", "autor_id": autor.id, **valores})
+        db.add(trabajo)
+        await db.commit()
+        return trabajo.id
+
+
+async def _trabajo(trabajo_id: str) -> TrabajoGeneracion:
+    async with SessionLocal() as db:
+        return await db.get(TrabajoGeneracion, trabajo_id)
+
+
+async def _esperar_estado(trabajo_id: str, estado: str) -> TrabajoGeneracion:
+    for _ in range(200):
+        trabajo = await _trabajo(trabajo_id)
+        if trabajo.estado == estado:
+            return trabajo
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"El trabajo quedó en {trabajo.estado}, se esperaba {estado}")
+
+
+# Un reinicio normal con un trabajo a mitad de camino: vuelve a pendiente y el próximo arranque lo termina
+async def test_trabajo_en_curso_se_retoma_tras_reiniciar(monkeypatch):
+    autor = await crear_usuario()
+    bloqueo = asyncio.Event()
+
+    async def generar_colgado(**kwargs):
+        await bloqueo.wait()
+
+    monkeypatch.setattr(cola, "generar_imagen", generar_colgado)
+    primera = ColaGeneracion(workers=1)
+    await primera.iniciar()
+    trabajo_id = await _crear_trabajo(autor)
+    await primera.encolar(trabajo_id)
+    await _esperar_estado(trabajo_id, ESTADO_PROCESANDO)
+    await primera.detener()
+
+    assert (await _trabajo(trabajo_id)).estado == ESTADO_PENDIENTE
+
+    async def generar(**kwargs):
+        return "http://test/imagenes/gato.webp"
+
+    monkeypatch.setattr(cola, "generar_imagen", generar)
+    segunda = ColaGeneracion(workers=1)
+    await segunda.iniciar()
+    try:
+        trabajo = await _esperar_estado(trabajo_id, ESTADO_COMPLETADO)
+    finally:
+        await segunda.detener()
+    async with SessionLocal() as db:
+        assert (await db.execute(select(Obra.id).where(Obra.id == trabajo.obra_id))).scalar_one()
+
+
+# El latido mantiene vivos los trabajos propios y el barrido rescata los de un proceso que murió
+async def test_latido_y_barrido_de_huerfanos(monkeypatch):
+    autor = await crear_usuario()
+    bloqueo = asyncio.Event()
+    generados = []
+
+    async def generar(prompt, **kwargs):
+        generados.append(prompt)
+        if prompt == "propio":
+            await bloqueo.wait()
+        return "http://test/imagenes/gato.webp"
+
+    monkeypatch.setattr(cola, "generar_imagen", generar)
+    monkeypatch.setattr(cola, "GENERACION_LATIDO_SEG", 0.05)
+    monkeypatch.setattr(cola, "GENERACION_TRABAJO_HUERFANO_MIN", 1)
+
+    cola_generacion = ColaGeneracion(workers=2)
+    await cola_generacion.iniciar()
+    try:
+        propio = await _crear_trabajo(autor, prompt="propio")
+        await cola_generacion.encolar(propio)
+        await _esperar_estado(propio, ESTADO_PROCESANDO)
+
+        # Trabajo reclamado por otro proceso hace rato y nunca terminado
+        hace_rato = datetime.utcnow() - timedelta(minutes=5)
+        huerfano = await _crear_trabajo(autor, prompt="huerfano", estado=ESTADO_PROCESANDO)
+        async with SessionLocal() as db:
+            trabajo = await db.get(TrabajoGeneracion, huerfano)
+            trabajo.actualizado = hace_rato
+            await db.commit()
+        async with SessionLocal() as db:
+            trabajo = await db.get(TrabajoGeneracion, propio)
+            trabajo.actualizado = hace_rato  # El latido lo renueva antes de que el barrido lo tome
+            await db.commit()
+
+        await _esperar_estado(huerfano, ESTADO_COMPLETADO)
+        trabajo = await _trabajo(propio)
+        assert trabajo.estado == ESTADO_PROCESANDO
+        assert trabajo.actualizado > hace_rato
+        assert generados.count("propio") == 1
+    finally:
+        bloqueo.set()
+        await cola_generacion.detener()
@@ -0,0 +1,43 @@
+# Imports de terceros
+import pytest
+from pydantic import ValidationError
+
+# Imports internos
+from app.db.config import ConfiguracionDB, SQLITE_POR_DEFECTO
+
+URL_POSTGRES = "postgresql+asyncpg://usuario:clave@db/artificial"
+
+
+@pytest.fixture
+def entorno(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("DB_MODO", raising=False)
+
+    def configurar(**variables) -> ConfiguracionDB:
+        for nombre, valor in variables.items():
+            monkeypatch.setenv(nombre, valor)
+        return ConfiguracionDB(_env_file=None)
+
+    return configurar
+
+
+# Sin DATABASE_URL el proceso no arranca (antes caía en silencio a SQLite y se migraba solo)
+def test_sin_url_falla_al_arrancar(entorno):
+    with pytest.raises(ValidationError, match="DATABASE_URL no está definida"):
+        entorno()
+
+
+def test_sqlite_requiere_db_modo(entorno):
+    with pytest.raises(ValidationError, match="requiere DB_MODO=sqlite"):
+        entorno(DATABASE_URL="sqlite+aiosqlite:///./otra.db")
+
+
+def test_db_modo_sqlite_usa_la_base_local(entorno):
+    config = entorno(DB_MODO="sqlite")
+    assert config.database_url == SQLITE_POR_DEFECTO and config.es_sqlite
+    assert entorno(DB_MODO="sqlite", DATABASE_URL="sqlite+aiosqlite:///./otra.db").database_url.endswith("otra.db")
+
+
+def test_url_externa_sin_db_modo(entorno):
+    config = entorno(DATABASE_URL=URL_POSTGRES)
+    assert config.database_url == URL_POSTGRES and not config.es_sqlite
@@ -0,0 +1,73 @@
+# Imports estándar
+import uuid
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Imports de terceros
+import orjson
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.future import select
+
+# Imports internos
+from app.db.database import engine
+from app.models.obra import Obra
+from app.routers.obras import _exportar_obras
+from app.schemas.obra import ObraSimple
+from app.utils.paginacion import paginar_por_fecha
+from tests.datos import crear_usuario
+
+pytestmark = pytest.mark.anyio
+
+
+async def _insertar_obras(autor, cantidad: int) -> None:
+    inicio = datetime(2024, 1, 1)
+    filas = [
+        {"id": str(uuid.uuid4()), "nombre": f"obra {i}", "descripcion": "x" * 200, "tipoArte": "digital",
+         "archivoJPG": f"http://test/imagenes/{i}.webp", "publicada": True, "autor_id": autor.id,
+         "fecha": inicio + timedelta(seconds=i)}
+        for i in range(cantidad)
+    ]
+    async with engine.begin() as conn:
+        await conn.execute(insert(Obra), filas)
+
+
+# Consume la exportación como lo haría el servidor al enviarla: cada bloque se descarta al salir
+async def _exportar_midiendo(formato: str):
+    columnas = [getattr(Obra, campo) for campo in ObraSimple.model_fields]
+    stmt = paginar_por_fecha(select(*columnas), None, None)
+    filas, bytes_totales = 0, 0
+    tracemalloc.start()
+    try:
+        async for bloque in _exportar_obras(stmt, formato):
+            bytes_totales += len(bloque)
+            filas += formato == "ndjson"
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return filas, bytes_totales, pico
+
+
+# El pico de memoria no crece con la cantidad de filas: 10 veces más obras, mismo orden de memoria
+async def test_exportacion_con_memoria_constante():
+    autora = await crear_usuario()
+    await _insertar_obras(autora, 1_000)
+    _, bytes_chico, pico_chico = await _exportar_midiendo("ndjson")
+
+    await _insertar_obras(autora, 9_000)
+    filas, bytes_grande, pico_grande = await _exportar_midiendo("ndjson")
+
+    assert filas == 10_000
+    assert bytes_grande > 9 * bytes_chico
+    assert pico_grande < 2 * pico_chico, f"{pico_chico / 2**20:.1f} MiB -> {pico_grande / 2**20:.1f} MiB"
+    assert pico_grande < 4 * 1024 * 1024
+
+
+async def test_exportacion_json_es_un_arreglo_valido():
+    autora = await crear_usuario()
+    await _insertar_obras(autora, 1_500)
+    columnas = [getattr(Obra, campo) for campo in ObraSimple.model_fields]
+    stmt = paginar_por_fecha(select(*columnas), None, None)
+    cuerpo = b"".join([bloque async for bloque in _exportar_obras(stmt, "json")])
+    obras = orjson.loads(cuerpo)
+    assert len(obras) == 1_500 and obras[0]["nombre"] == "obra 1499"
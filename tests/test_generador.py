@@ -0,0 +1,198 @@
+# Imports estándar
+import os
+import time
+import base64
+import asyncio
+import hashlib
+import tracemalloc
+
+# Imports de terceros
+import httpx
+import pytest
+
+# Imports internos
+from app.services.almacen import guardar_imagen
+from app.services.generador import StableHordeClient, StableHordeError
+
+pytestmark = pytest.mark.anyio
+
+
+def _cliente(manejador) -> StableHordeClient:
+    return StableHordeClient(
+        transport=httpx.MockTransport(manejador), reintentos=3, backoff_base=0, tasa_por_segundo=1000, rafaga=100
+    )
+
+
+# Un timeout de lectura puede llegar con el trabajo ya aceptado: reenviarlo duplicaría la generación
+async def test_envio_no_se_reintenta_tras_timeout_de_lectura():
+    envios = []
+
+    def manejador(request):
+        envios.append(request)
+        raise httpx.ReadTimeout("sin respuesta", request=request)
+
+    with pytest.raises(StableHordeError):
+        await _cliente(manejador).enviar({"prompt": "x"})
+    assert len(envios) == 1
+
+
+@pytest.mark.parametrize("codigo", [500, 502, 504])
+async def test_envio_no_se_reintenta_ante_5xx_ambiguo(codigo):
+    envios = []
+
+    def manejador(request):
+        envios.append(request)
+        return httpx.Response(codigo)
+
+    with pytest.raises(StableHordeError):
+        await _cliente(manejador).enviar({"prompt": "x"})
+    assert len(envios) == 1
+
+
+# Sin conexión, 429 o 503: Horde no aceptó el trabajo y se puede reenviar
+async def test_envio_se_reintenta_si_horde_no_lo_acepto():
+    respuestas = iter(["conexion", 429, 503, 202])
+
+    def manejador(request):
+        respuesta = next(respuestas)
+        if respuesta == "conexion":
+            raise httpx.ConnectError("rechazada", request=request)
+        return httpx.Response(respuesta, json={"id": "abc"})
+
+    assert await _cliente(manejador).enviar({"prompt": "x"}) == "abc"
+
+
+# Las consultas (GET) mantienen la política completa de reintentos
+async def test_get_se_reintenta_ante_errores_de_red():
+    intentos = []
+
+    def manejador(request):
+        intentos.append(request)
+        if len(intentos) < 3:
+            raise httpx.ReadTimeout("sin respuesta", request=request)
+        return httpx.Response(200, json={"done": True})
+
+    response = await _cliente(manejador)._request("GET", "/generate/check/abc")
+    assert response.status_code == 200 and len(intentos) == 3
+
+
+# Horde falso: cada solicitud termina al segundo chequeo; registra cuándo llega cada petición
+def _horde_falso(momentos):
+    chequeos = {}
+
+    def manejador(request):
+        momentos.append(time.monotonic())
+        ruta = request.url.path
+        if ruta.endswith("/generate/async"):
+            return httpx.Response(202, json={"id": f"id-{len(chequeos)}-{len(momentos)}"})
+        request_id = ruta.rsplit("/", 1)[1]
+        if "/generate/check/" in ruta:
+            chequeos[request_id] = chequeos.get(request_id, 0) + 1
+            return httpx.Response(200, json={"done": chequeos[request_id] >= 2, "wait_time": 0})
+        return httpx.Response(200, json={"generations": [{"img": f"https://img.test/{request_id}.webp"}]})
+
+    return manejador
+
+
+# Envíos, chequeos y estados comparten el presupuesto; cada petición postergada se cuenta una vez
+async def test_todas_las_llamadas_respetan_el_presupuesto_global():
+    momentos = []
+    tasa, rafaga = 40, 2
+    cliente = StableHordeClient(
+        transport=httpx.MockTransport(_horde_falso(momentos)), tasa_por_segundo=tasa, rafaga=rafaga
+    )
+    cliente.poller.intervalo_min = 0.01
+    try:
+        urls = await asyncio.gather(*(cliente.generar(f"prompt {i}") for i in range(8)))
+    finally:
+        await cliente.cerrar()
+
+    assert len(set(urls)) == 8
+    assert len(momentos) == 8 * 4  # Envío, dos chequeos y el estado de cada una
+    # Nunca más que la ráfaga más lo que repone la tasa en cualquier ventana
+    ventana = 0.1
+    for inicio in momentos:
+        en_ventana = sum(1 for m in momentos if inicio <= m < inicio + ventana)
+        assert en_ventana <= rafaga + tasa * ventana + 1
+    assert 0 < cliente.poller.metricas["rate_limit_evitados"] <= len(momentos) - rafaga
+
+
+# Un corte de red durante el seguimiento (en el chequeo o al traer el estado final) no pierde la generación
+@pytest.mark.parametrize("falla_en", ["/generate/check/", "/generate/status/"])
+async def test_error_de_red_al_consultar_se_reprograma(falla_en):
+    fallas = {"pendientes": 2}
+    consultas = []
+
+    def manejador(request):
+        ruta = request.url.path
+        if ruta.endswith("/generate/async"):
+            return httpx.Response(202, json={"id": "abc"})
+        consultas.append(ruta)
+        if falla_en in ruta and fallas["pendientes"]:
+            fallas["pendientes"] -= 1
+            raise httpx.ReadError("conexión cortada", request=request)
+        if "/generate/check/" in ruta:
+            return httpx.Response(200, json={"done": True})
+        return httpx.Response(200, json={"generations": [{"img": "https://img.test/abc.webp"}]})
+
+    cliente = _cliente(manejador)
+    cliente.poller.intervalo_min = cliente.poller.intervalo_max = 0.01
+    try:
+        assert await cliente.generar("un gato") == "https://img.test/abc.webp"
+    finally:
+        await cliente.cerrar()
+    assert cliente.poller.metricas["errores_consulta"] == 2
+    # Tras el "done" no se vuelve a chequear: sólo se repite el estado
+    assert sum("/generate/check/" in ruta for ruta in consultas) == (3 if falla_en == "/generate/check/" else 1)
+
+
+# Recién se falla cuando se agota max_espera
+async def test_errores_de_red_persistentes_fallan_al_agotar_la_espera():
+    def manejador(request):
+        if request.url.path.endswith("/generate/async"):
+            return httpx.Response(202, json={"id": "abc"})
+        raise httpx.ConnectError("sin red", request=request)
+
+    cliente = _cliente(manejador)
+    cliente.poller.intervalo_min = cliente.poller.intervalo_max = 0.01
+    cliente.poller.max_espera = 0.1
+    try:
+        with pytest.raises(StableHordeError, match="Tiempo de espera agotado"):
+            await cliente.generar("un gato")
+    finally:
+        await cliente.cerrar()
+    assert cliente.poller.metricas["errores_consulta"] >= 2
+
+
+# Imagen base64 grande: el estado llega por bloques, se decodifica a un archivo temporal y se guarda
+# sin que el pico de memoria dependa del tamaño de la imagen
+async def test_imagen_base64_grande_con_memoria_acotada(almacen_local):
+    bloque = os.urandom(48 * 1024)  # Múltiplo de 3: cada bloque codificado es base64 válido por sí solo
+    bloque_base64 = base64.b64encode(bloque)
+    repeticiones = 512  # 24 MiB decodificados, 32 MiB en el JSON
+    esperado = hashlib.sha256(bloque * repeticiones).hexdigest()  # Sólo para comparar; se libera antes de medir
+
+    async def cuerpo():
+        yield b'{"done": true, "generations": [{"img": "'
+        for _ in range(repeticiones):
+            yield bloque_base64
+        yield b'", "seed": "1", "worker_id": "w"}]}'
+
+    def manejador(request):
+        return httpx.Response(200, content=cuerpo())
+
+    cliente = _cliente(manejador)
+    tracemalloc.start()
+    try:
+        response, status = await cliente.estado("abc")
+        with status["generations"][0]["archivo"] as archivo:
+            url = await guardar_imagen(archivo, "webp")
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        await cliente.cerrar()
+
+    assert status["generations"][0]["seed"] == "1"
+    assert pico < 4 * 1024 * 1024, f"pico de {pico / 2**20:.1f} MiB"
+    guardado = almacen_local.directorio / url.rsplit("/", 1)[1]
+    assert hashlib.sha256(guardado.read_bytes()).hexdigest() == esperado
@@ -0,0 +1,139 @@
+# Imports estándar
+import time
+import asyncio
+import datetime
+
+# Imports de terceros
+import httpx
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt as google_jwt
+
+# Imports internos
+from app.services.google_auth import VerificadorGoogle, GoogleTokenError
+
+pytestmark = pytest.mark.anyio
+
+CLIENT_ID = "cliente.apps.googleusercontent.com"
+
+
+# Clave RSA propia y su certificado PEM, con el formato de https://www.googleapis.com/oauth2/v1/certs
+class _Clave:
+    def __init__(self, kid: str):
+        self.kid = kid
+        privada = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        nombre = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, kid)])
+        ahora = datetime.datetime.now(datetime.timezone.utc)
+        certificado = (
+            x509.CertificateBuilder()
+            .subject_name(nombre).issuer_name(nombre)
+            .public_key(privada.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(ahora - datetime.timedelta(days=1))
+            .not_valid_after(ahora + datetime.timedelta(days=1))
+            .sign(privada, hashes.SHA256())
+        )
+        self.pem = certificado.public_bytes(serialization.Encoding.PEM).decode()
+        privada_pem = privada.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        self.firmante = crypt.RSASigner.from_string(privada_pem, key_id=kid)
+
+    def token(self, **cambios) -> str:
+        ahora = int(time.time())
+        datos = {
+            "iss": "https://accounts.google.com",
+            "aud": CLIENT_ID,
+            "sub": "123",
+            "email": "autora@gmail.com",
+            "iat": ahora,
+            "exp": ahora + 3600,
+            **cambios,
+        }
+        return google_jwt.encode(self.firmante, datos).decode()
+
+
+@pytest.fixture(scope="module")
+def claves():
+    return _Clave("kid-1"), _Clave("kid-2")
+
+
+# Endpoint de certificados falso: sirve los juegos de `publicados` en orden (el último se repite)
+def _verificador(publicados, pedidos, demora: float = 0) -> VerificadorGoogle:
+    async def manejador(request):
+        pedidos.append(request)
+        await asyncio.sleep(demora)
+        juego = publicados[min(len(pedidos), len(publicados)) - 1]
+        return httpx.Response(200, json={c.kid: c.pem for c in juego}, headers={"Cache-Control": "public, max-age=3600"})
+
+    return VerificadorGoogle(client_id=CLIENT_ID, certs_url="https://certs.test/", transport=httpx.MockTransport(manejador))
+
+
+async def test_token_valido(claves):
+    pedidos = []
+    verificador = _verificador([[claves[0]]], pedidos)
+    try:
+        datos = await verificador.verificar(claves[0].token())
+        await verificador.verificar(claves[0].token())
+    finally:
+        await verificador.cerrar()
+    assert datos["email"] == "autora@gmail.com"
+    assert len(pedidos) == 1  # Certificados cacheados según max-age
+    assert verificador.metricas["verificados"] == 2
+
+
+# Google rotó la clave: los pedidos simultáneos con el kid nuevo comparten un único refresco
+async def test_kid_desconocido_refresca_una_sola_vez(claves):
+    vieja, nueva = claves
+    pedidos = []
+    verificador = _verificador([[vieja], [vieja, nueva]], pedidos, demora=0.05)
+    try:
+        await verificador.verificar(vieja.token())
+        resultados = await asyncio.gather(*(verificador.verificar(nueva.token()) for _ in range(10)))
+    finally:
+        await verificador.cerrar()
+    assert all(r["email"] == "autora@gmail.com" for r in resultados)
+    assert len(pedidos) == 2
+    assert verificador.metricas["refrescos_por_kid"] == 1
+
+
+# Un kid que tampoco aparece tras refrescar se rechaza, y no dispara otra descarga enseguida
+async def test_kid_inexistente_se_rechaza_sin_repetir_descargas(claves):
+    pedidos = []
+    verificador = _verificador([[claves[0]]], pedidos)
+    try:
+        for _ in range(3):
+            with pytest.raises(GoogleTokenError, match="Clave de firma desconocida"):
+                await verificador.verificar(claves[1].token())
+    finally:
+        await verificador.cerrar()
+    assert len(pedidos) == 2  # La descarga inicial y un único refresco por kid
+    assert verificador.metricas["rechazados"] == 3
+
+
+@pytest.mark.parametrize("cambios", [
+    {"iss": "https://otro.example.com"},
+    {"aud": "otro-cliente.apps.googleusercontent.com"},
+    {"exp": int(time.time()) - 3600, "iat": int(time.time()) - 7200},
+], ids=["iss", "aud", "exp"])
+async def test_token_invalido(claves, cambios):
+    verificador = _verificador([[claves[0]]], [])
+    try:
+        with pytest.raises(GoogleTokenError):
+            await verificador.verificar(claves[0].token(**cambios))
+    finally:
+        await verificador.cerrar()
+    assert verificador.metricas == {**verificador.metricas, "verificados": 0, "rechazados": 1}
+
+
+async def test_firma_de_otra_clave_con_kid_conocido(claves):
+    falsificado = _Clave("kid-1")  # Mismo kid, otra clave privada
+    verificador = _verificador([[claves[0]]], [])
+    try:
+        with pytest.raises(GoogleTokenError):
+            await verificador.verificar(falsificado.token())
+    finally:
+        await verificador.cerrar()
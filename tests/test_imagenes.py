@@ -0,0 +1,138 @@
+# Imports estándar
+import io
+import os
+import asyncio
+from email.utils import formatdate
+
+# Imports de terceros
+import pytest
+from PIL import Image
+
+# Imports internos
+from app.routers import imagenes
+from app.services import derivados
+
+pytestmark = pytest.mark.anyio
+
+
+# output/ del test: original PNG de 800x600 en un directorio temporal
+@pytest.fixture
+def original(monkeypatch, tmp_path):
+    monkeypatch.setattr(imagenes, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(derivados, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(derivados, "DERIVADOS_DIR", tmp_path / ".derivados")
+    monkeypatch.setattr(derivados, "_originales", {})
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), (200, 40, 40)).save(buffer, "PNG")
+    ruta = tmp_path / "obra.png"
+    ruta.write_bytes(buffer.getvalue())
+    return ruta
+
+
+async def test_original_completo(client, original):
+    response = await client.get("/imagenes/obra.png")
+    assert response.status_code == 200
+    assert response.content == original.read_bytes()
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["cache-control"] == imagenes.CACHE_CONTROL
+    assert response.headers["etag"] and response.headers["last-modified"]
+
+
+@pytest.mark.parametrize("rango,inicio,fin", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=100-", 100, None),
+    ("bytes=-50", -50, None),
+    ("bytes=10-999999", 10, None),  # Fin más allá del archivo: se recorta
+])
+async def test_rangos(client, original, rango, inicio, fin):
+    contenido = original.read_bytes()
+    esperado = contenido[inicio:] if fin is None else contenido[inicio:fin + 1]
+    response = await client.get("/imagenes/obra.png", headers={"Range": rango})
+    assert response.status_code == 206
+    assert response.content == esperado
+    assert response.headers["content-length"] == str(len(esperado))
+    primero = inicio if inicio >= 0 else len(contenido) + inicio
+    assert response.headers["content-range"] == f"bytes {primero}-{primero + len(esperado) - 1}/{len(contenido)}"
+
+
+@pytest.mark.parametrize("rango", ["bytes=999999-", "bytes=50-10", "bytes=a-b"])
+async def test_rango_no_satisfacible(client, original, rango):
+    response = await client.get("/imagenes/obra.png", headers={"Range": rango})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{original.stat().st_size}"
+
+
+# If-Range con otro ETag: el archivo cambió, se devuelve completo
+async def test_if_range_desactualizado_devuelve_todo(client, original):
+    response = await client.get("/imagenes/obra.png", headers={"Range": "bytes=0-9", "If-Range": '"otro"'})
+    assert response.status_code == 200 and len(response.content) == original.stat().st_size
+
+
+async def test_304_por_etag(client, original):
+    etag = (await client.get("/imagenes/obra.png")).headers["etag"]
+    for cabecera in (etag, f'"otro", {etag}', "*"):
+        response = await client.get("/imagenes/obra.png", headers={"If-None-Match": cabecera})
+        assert response.status_code == 304 and response.content == b""
+        assert response.headers["etag"] == etag
+    assert (await client.get("/imagenes/obra.png", headers={"If-None-Match": '"otro"'})).status_code == 200
+
+
+async def test_304_por_fecha(client, original):
+    mtime = original.stat().st_mtime
+    response = await client.get("/imagenes/obra.png", headers={"If-Modified-Since": formatdate(mtime + 60, usegmt=True)})
+    assert response.status_code == 304
+    response = await client.get("/imagenes/obra.png", headers={"If-Modified-Since": formatdate(mtime - 60, usegmt=True)})
+    assert response.status_code == 200
+    # Con ETag distinto manda el ETag aunque la fecha diga que no cambió
+    response = await client.get("/imagenes/obra.png", headers={
+        "If-None-Match": '"otro"', "If-Modified-Since": formatdate(mtime + 60, usegmt=True),
+    })
+    assert response.status_code == 200
+    assert (await client.get("/imagenes/obra.png", headers={"If-Modified-Since": "no es una fecha"})).status_code == 200
+
+
+async def test_head_sin_cuerpo(client, original):
+    response = await client.head("/imagenes/obra.png")
+    assert response.status_code == 200 and response.content == b""
+    assert response.headers["content-length"] == str(original.stat().st_size)
+    response = await client.head("/imagenes/obra.png", headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206 and response.headers["content-length"] == "10"
+
+
+@pytest.mark.parametrize("ruta", ["/imagenes/no-existe.png", "/imagenes/.derivados", "/imagenes/gigante/obra.webp",
+                                  "/imagenes/miniatura/obra.bmp", "/imagenes/miniatura/no-existe.webp"])
+async def test_no_encontrada(client, original, ruta):
+    assert (await client.get(ruta)).status_code == 404
+
+
+@pytest.mark.parametrize("tamano,lado", [("miniatura", 160), ("mediana", 384), ("completa", 800)])
+@pytest.mark.parametrize("formato,marca", [("webp", "WEBP"), ("jpg", "JPEG")])
+async def test_derivado_generado_la_primera_vez(client, original, tamano, lado, formato, marca):
+    destino = derivados.DERIVADOS_DIR / tamano / f"obra.{formato}"
+    assert not destino.exists()
+    response = await client.get(f"/imagenes/{tamano}/obra.{formato}")
+    assert response.status_code == 200 and destino.exists()
+    with Image.open(io.BytesIO(response.content)) as imagen:
+        assert imagen.format == marca and max(imagen.size) == lado
+
+
+# Se genera una sola vez (también con pedidos simultáneos); después se sirve del disco
+async def test_derivado_cacheado(client, original, monkeypatch):
+    generados = []
+    generar = derivados._generar
+
+    def contar(*args):
+        generados.append(args)
+        generar(*args)
+
+    monkeypatch.setattr(derivados, "_generar", contar)
+    respuestas = await asyncio.gather(*(client.get("/imagenes/mediana/obra.webp") for _ in range(5)))
+    assert all(r.status_code == 200 for r in respuestas)
+    assert len({r.headers["etag"] for r in respuestas}) == 1
+
+    destino = derivados.DERIVADOS_DIR / "mediana" / "obra.webp"
+    modificado = os.stat(destino).st_mtime_ns
+    etag = respuestas[0].headers["etag"]
+    assert (await client.get("/imagenes/mediana/obra.webp", headers={"If-None-Match": etag})).status_code == 304
+    assert len(generados) == 1 and os.stat(destino).st_mtime_ns == modificado
@@ -0,0 +1,110 @@
+# Imports estándar
+import asyncio
+
+# Imports de terceros
+import httpx
+import pytest
+
+# Imports internos
+from app.services.ingesta import IngestaImagenes, IngestaError
+
+pytestmark = pytest.mark.anyio
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200
+
+
+def _ingesta(manejador, **opciones) -> IngestaImagenes:
+    return IngestaImagenes(transport=httpx.MockTransport(manejador), **opciones)
+
+
+async def _bloques(cantidad: int, tamano: int, enviados: list, pausa: float = 0, primero: bytes = b""):
+    for i in range(cantidad):
+        if pausa:
+            await asyncio.sleep(pausa)
+        enviados.append(i)
+        yield primero if i == 0 and primero else b"\x00" * tamano
+
+
+async def test_imagen_valida_se_guarda(almacen_local):
+    ingesta = _ingesta(lambda request: httpx.Response(200, content=PNG, headers={"Content-Type": "image/png"}))
+    try:
+        url = await ingesta.ingerir("https://img.test/a.png")
+    finally:
+        await ingesta.cerrar()
+    assert url.endswith(".png")
+    assert (almacen_local.directorio / url.rsplit("/", 1)[1]).read_bytes() == PNG
+
+
+async def test_servidor_lento_corta_por_timeout():
+    enviados = []
+
+    def manejador(request):
+        return httpx.Response(200, headers={"Content-Type": "image/png"},
+                              content=_bloques(100, 1024, enviados, pausa=0.05, primero=PNG))
+
+    ingesta = _ingesta(manejador, timeout_descarga=0.2)
+    with pytest.raises(IngestaError) as error:
+        await ingesta.descargar("https://img.test/lenta.png")
+    await ingesta.cerrar()
+    assert error.value.status_code == 504
+    assert len(enviados) < 10
+
+
+async def test_content_length_excedido_no_se_descarga():
+    enviados = []
+
+    def manejador(request):
+        return httpx.Response(200, headers={"Content-Type": "image/png", "Content-Length": str(2048)},
+                              content=_bloques(2, 1024, enviados, primero=PNG))
+
+    with pytest.raises(IngestaError) as error:
+        await _ingesta(manejador, max_bytes=1024).descargar("https://img.test/grande.png")
+    assert error.value.status_code == 413
+    assert enviados == []
+
+
+# Sin Content-Length (o mintiendo) se corta apenas el cuerpo pasa el tope, sin leer el resto
+async def test_cuerpo_que_pasa_el_tope_se_corta_en_el_medio():
+    enviados = []
+
+    def manejador(request):
+        return httpx.Response(200, headers={"Content-Type": "image/png"},
+                              content=_bloques(1000, 1024, enviados, primero=PNG))
+
+    with pytest.raises(IngestaError) as error:
+        await _ingesta(manejador, max_bytes=8 * 1024).descargar("https://img.test/sin-largo.png")
+    assert error.value.status_code == 413
+    assert len(enviados) <= 10
+
+
+@pytest.mark.parametrize("tipo,contenido", [
+    ("text/html", b"<html>hola</html>"),
+    ("image/png", b"<html>no soy una imagen</html>"),  # Content-Type mentiroso: se valida por los bytes
+    ("", b"%PDF-1.4 ........"),
+])
+async def test_contenido_que_no_es_imagen(tipo, contenido):
+    headers = {"Content-Type": tipo} if tipo else {}
+    ingesta = _ingesta(lambda request: httpx.Response(200, content=contenido, headers=headers))
+    with pytest.raises(IngestaError) as error:
+        await ingesta.descargar("https://img.test/falsa")
+    assert error.value.status_code == 415
+
+
+@pytest.mark.parametrize("url,respuesta", [
+    ("ftp://img.test/a.png", None),
+    ("https://img.test/no-existe.png", httpx.Response(404)),
+])
+async def test_url_invalida_o_inexistente(url, respuesta):
+    ingesta = _ingesta(lambda request: respuesta)
+    with pytest.raises(IngestaError) as error:
+        await ingesta.descargar(url)
+    assert error.value.status_code == 400
+
+
+async def test_error_de_red():
+    def manejador(request):
+        raise httpx.ConnectError("rechazada", request=request)
+
+    with pytest.raises(IngestaError) as error:
+        await _ingesta(manejador).descargar("https://img.test/a.png")
+    assert error.value.status_code == 400
@@ -0,0 +1,25 @@
+# Imports de terceros
+import pytest
+
+# Imports internos
+from app.utils import auth
+
+pytestmark = pytest.mark.anyio
+
+RUTAS_INTERNAS = ["/interno/pool", "/interno/muro", "/interno/logs", "/metrics"]
+
+
+@pytest.mark.parametrize("ruta", RUTAS_INTERNAS)
+async def test_sin_token_configurado_no_existen(client, monkeypatch, ruta):
+    monkeypatch.setattr(auth, "INTERNO_TOKEN", None)
+    response = await client.get(ruta, headers={"X-Interno-Token": "cualquiera"})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("ruta", RUTAS_INTERNAS)
+async def test_requieren_el_secreto_compartido(client, monkeypatch, ruta):
+    monkeypatch.setattr(auth, "INTERNO_TOKEN", "s3creto")
+    assert (await client.get(ruta)).status_code == 401
+    assert (await client.get(ruta, headers={"X-Interno-Token": "otro"})).status_code == 401
+    assert (await client.get(ruta, headers={"X-Interno-Token": "s3creto"})).status_code == 200
+    assert (await client.get(ruta, headers={"Authorization": "Bearer s3creto"})).status_code == 200
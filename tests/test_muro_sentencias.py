@@ -0,0 +1,54 @@
+# Imports de terceros
+import pytest
+
+# Imports internos
+from app.services.cache_muro import cache_muro
+from app.utils.auth import cache_usuarios
+from app.models.valoracion import Valoracion
+from app.db.database import SessionLocal
+from tests.datos import crear_usuario, crear_obras, autorizacion
+
+pytestmark = pytest.mark.anyio
+
+
+# Cantidad de sentencias de un GET /obras/muro sin nada en los caches de la app
+async def _sentencias_muro(client, sentencias, headers=None) -> int:
+    cache_muro.invalidar()
+    cache_usuarios._entradas.clear()
+    sentencias.clear()
+    response = await client.get("/obras/muro", params={"sin_paginar": True}, headers=headers or {})
+    assert response.status_code == 200
+    return len(sentencias)
+
+
+# El muro no puede volver a hacer una consulta por obra (N+1) ni para anónimos ni con sesión
+@pytest.mark.parametrize("con_sesion", [False, True])
+async def test_sentencias_del_muro_no_dependen_de_la_cantidad_de_obras(client, sentencias, con_sesion):
+    autora = await crear_usuario()
+    lectora = await crear_usuario("lectora@test.com", "lectora")
+    headers = autorizacion(lectora) if con_sesion else None
+
+    await crear_obras(autora, 2)
+    pocas = await _sentencias_muro(client, sentencias, headers)
+
+    obras = await crear_obras(autora, 50)
+    async with SessionLocal() as db:
+        db.add_all(Valoracion(obra_id=obra.id, usuario_id=lectora.id, puntuacion=4) for obra in obras[::2])
+        await db.commit()
+    muchas = await _sentencias_muro(client, sentencias, headers)
+
+    # Feed + (con sesión) usuario del token y sus valoraciones de la página
+    assert pocas == muchas == (3 if con_sesion else 1)
+
+
+async def test_muro_con_sesion_marca_las_obras_valoradas(client):
+    autora = await crear_usuario()
+    lectora = await crear_usuario("lectora@test.com", "lectora")
+    obras = await crear_obras(autora, 3)
+    async with SessionLocal() as db:
+        db.add(Valoracion(obra_id=obras[1].id, usuario_id=lectora.id, puntuacion=5))
+        await db.commit()
+
+    response = await client.get("/obras/muro", params={"sin_paginar": True}, headers=autorizacion(lectora))
+    valoradas = {obra["id"] for obra in response.json() if obra["ya_valorada"]}
+    assert valoradas == {obras[1].id}
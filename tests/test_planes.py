@@ -0,0 +1,70 @@
+# Imports estándar
+import re
+from typing import List, Tuple
+
+# Imports de terceros
+import pytest
+from sqlalchemy import event
+
+# Imports internos
+from app.db.database import engine
+from app.services.cache_muro import cache_muro
+from tests.datos import crear_usuario, crear_obras, autorizacion
+
+pytestmark = pytest.mark.anyio
+
+# Recorrer la tabla entera (sin índice) u ordenar en memoria: lo que no debe aparecer en los feeds
+_RECORRIDO_COMPLETO = re.compile(r"SCAN (obras|valoraciones)(?! USING (COVERING )?INDEX)")
+_ORDEN_EN_MEMORIA = "USE TEMP B-TREE FOR ORDER BY"
+
+
+# Sentencias con sus parámetros, para repetirlas con EXPLAIN QUERY PLAN
+@pytest.fixture
+def sentencias_con_parametros() -> List[Tuple[str, tuple]]:
+    ejecutadas: List[Tuple[str, tuple]] = []
+
+    def registrar(conn, cursor, sentencia, parametros, contexto, executemany):
+        if sentencia.lstrip().upper().startswith("SELECT"):
+            ejecutadas.append((sentencia, parametros))
+
+    event.listen(engine.sync_engine, "after_cursor_execute", registrar)
+    yield ejecutadas
+    event.remove(engine.sync_engine, "after_cursor_execute", registrar)
+
+
+async def _planes(sentencias: List[Tuple[str, tuple]]) -> List[Tuple[str, List[str]]]:
+    planes = []
+    async with engine.connect() as conexion:
+        for sentencia, parametros in sentencias:
+            filas = (await conexion.exec_driver_sql(f"EXPLAIN QUERY PLAN {sentencia}", parametros)).all()
+            planes.append((sentencia, [fila[-1] for fila in filas]))
+    return planes
+
+
+@pytest.mark.parametrize("ruta,con_sesion", [
+    ("/obras/muro", False),
+    ("/obras/muro", True),  # Incluye la búsqueda de las valoraciones del usuario
+    ("/obras/mis-obras", True),
+    ("/obras/obras/todas", False),
+])
+async def test_feeds_usan_indices(client, sentencias_con_parametros, ruta, con_sesion):
+    autora = await crear_usuario()
+    obras = await crear_obras(autora, 30)
+    headers = autorizacion(autora) if con_sesion else {}
+    await client.post(f"/obras/{obras[0].id}/valorar", json={"puntuacion": 5}, headers=autorizacion(autora))
+
+    # Primera página y la siguiente (con cursor)
+    cache_muro.invalidar()
+    sentencias_con_parametros.clear()
+    pagina = await client.get(ruta, params={"limit": 10}, headers=headers)
+    cursor = pagina.json()["next_cursor"]
+    assert (await client.get(ruta, params={"limit": 10, "cursor": cursor}, headers=headers)).status_code == 200
+
+    planes = await _planes(sentencias_con_parametros)
+    assert any("FROM obras" in sentencia for sentencia, _ in planes)
+    if con_sesion and ruta == "/obras/muro":
+        assert any("FROM valoraciones" in sentencia for sentencia, _ in planes)
+    for sentencia, plan in planes:
+        detalle = f"{' '.join(sentencia.split())}\n" + "\n".join(plan)
+        assert not any(_RECORRIDO_COMPLETO.search(paso) for paso in plan), detalle
+        assert _ORDEN_EN_MEMORIA not in plan, detalle
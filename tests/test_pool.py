@@ -0,0 +1,48 @@
+# Imports estándar
+from typing import List
+
+# Imports de terceros
+import pytest
+from sqlalchemy import event
+
+# Imports internos
+from app.db.database import engine
+from app.services.cache_muro import cache_muro
+from app.utils.auth import cache_usuarios
+from tests.datos import crear_usuario, crear_obras, autorizacion
+
+pytestmark = pytest.mark.anyio
+
+
+# Checkouts del pool de la primaria mientras dura el test
+@pytest.fixture
+def checkouts() -> List[int]:
+    conteo = [0]
+
+    def registrar(conexion_dbapi, registro, proxy):
+        conteo[0] += 1
+
+    event.listen(engine.sync_engine, "checkout", registrar)
+    yield conteo
+    event.remove(engine.sync_engine, "checkout", registrar)
+
+
+# La dependencia de autenticación y el handler comparten la sesión: una conexión por request,
+# tanto con el usuario ya cacheado como cuando hay que buscarlo en la base
+@pytest.mark.parametrize("ruta", ["/obras/mis-obras", "/obras/muro"])
+@pytest.mark.parametrize("usuario_cacheado", [False, True], ids=["usuario_frio", "usuario_cacheado"])
+async def test_un_checkout_por_request_con_token(client, checkouts, ruta, usuario_cacheado):
+    autora = await crear_usuario()
+    await crear_obras(autora, 5)
+    headers = autorizacion(autora)
+    if usuario_cacheado:
+        assert (await client.get(ruta, headers=headers)).status_code == 200
+    else:
+        cache_usuarios._entradas.clear()
+
+    cache_muro.invalidar()
+    checkouts[0] = 0
+    response = await client.get(ruta, headers=headers)
+
+    assert response.status_code == 200 and len(response.json()["items"]) == 5
+    assert checkouts[0] == 1
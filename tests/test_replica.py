@@ -0,0 +1,143 @@
+# Imports estándar
+import os
+import shutil
+
+# Imports de terceros
+import pytest
+from jose import jwt
+
+# Imports internos
+from app.db import dependency
+from app.db.database import DATABASE_URL, engine, _crear_motor
+from app.db.dependency import RuteoLecturas
+from app.services import cache_muro as modulo_cache_muro
+from app.services.cache_muro import cache_muro
+from app.utils.jwt import SECRET_KEY, ALGORITHM
+from tests.datos import crear_usuario, crear_obras, autorizacion
+
+pytestmark = pytest.mark.anyio
+
+
+# Réplica = un segundo motor sobre la misma base de los tests (o sobre una ruta que no se puede abrir)
+@pytest.fixture
+async def replica(monkeypatch, tmp_path):
+    motores = []
+
+    def configurar(url: str = DATABASE_URL) -> RuteoLecturas:
+        motor = _crear_motor(url)
+        motores.append(motor)
+        ruteo = RuteoLecturas()
+        monkeypatch.setattr(dependency, "engine_lectura", motor)
+        monkeypatch.setattr(dependency, "ruteo_lecturas", ruteo)
+        monkeypatch.setattr(modulo_cache_muro, "MURO_CACHE_ESPERA_REPLICA", 0)  # Sin lag real que esperar
+        return ruteo
+
+    yield configurar
+    for motor in motores:
+        await motor.dispose()
+
+
+def _checkouts(*motores) -> int:
+    return sum(motor.pool.metricas["checkouts"] for motor in motores)
+
+
+async def test_hits_del_cache_y_304_no_toman_conexiones(client, replica):
+    ruteo = replica()
+    await crear_obras(await crear_usuario(), 3)
+    cache_muro.invalidar()
+
+    primera = await client.get("/obras/muro")
+    assert primera.status_code == 200 and ruteo.metricas["replica"] == 1
+
+    antes = _checkouts(engine, dependency.engine_lectura)
+    assert (await client.get("/obras/muro")).status_code == 200
+    no_modificada = await client.get("/obras/muro", headers={"If-None-Match": primera.headers["etag"]})
+    assert no_modificada.status_code == 304
+    assert _checkouts(engine, dependency.engine_lectura) == antes
+    assert ruteo.metricas["replica"] == 1 and ruteo.metricas["primaria"] == 0
+
+
+async def test_ping_cacheado_entre_requests(client, replica):
+    ruteo = replica()
+    await crear_obras(await crear_usuario(), 1)
+    for _ in range(3):
+        cache_muro.invalidar()
+        assert (await client.get("/obras/muro")).status_code == 200
+    assert ruteo.metricas["replica"] == 3 and ruteo.metricas["pings"] == 1
+
+
+async def test_replica_caida_cae_a_la_primaria(client, replica, tmp_path):
+    ruteo = replica(f"sqlite+aiosqlite:///{tmp_path / 'no-existe' / 'replica.db'}")
+    await crear_obras(await crear_usuario(), 2)
+    cache_muro.invalidar()
+
+    response = await client.get("/obras/muro")
+    assert response.status_code == 200 and len(response.json()["items"]) == 2
+    assert ruteo.metricas == {"replica": 0, "primaria": 1, "read_your_writes": 0, "caidas": 1, "pings": 1}
+
+    # Mientras dura DB_REPLICA_REINTENTO ni se intenta
+    cache_muro.invalidar()
+    assert (await client.get("/obras/muro")).status_code == 200
+    assert ruteo.metricas["pings"] == 1 and ruteo.metricas["primaria"] == 2
+
+
+async def test_desconexion_en_medio_del_request_marca_la_caida(client, replica, tmp_path):
+    await crear_obras(await crear_usuario(), 1)
+    ruta = tmp_path / "replica.db"
+    shutil.copy(DATABASE_URL.split("///", 1)[1], ruta)
+    ruteo = replica(f"sqlite+aiosqlite:///{ruta}")
+    cache_muro.invalidar()
+    assert (await client.get("/obras/muro")).status_code == 200
+    assert ruteo.metricas["replica"] == 1 and ruteo.metricas["pings"] == 1
+
+    # La réplica deja de existir con el ping todavía vigente: la primera consulta falla y marca la caída
+    await dependency.engine_lectura.dispose()
+    os.remove(ruta)
+    os.mkdir(ruta)
+    cache_muro.invalidar()
+    with pytest.raises(Exception):
+        await client.get("/obras/muro")
+    assert ruteo.metricas["caidas"] == 1
+
+    cache_muro.invalidar()
+    assert (await client.get("/obras/muro")).status_code == 200
+    assert ruteo.metricas["primaria"] == 1
+
+
+# Read-your-writes por sujeto del token: el login (anónimo) deja al primer GET con el token nuevo en la
+# primaria, y no fija en la primaria al resto de los anónimos que comparten IP detrás del proxy
+async def test_primer_get_con_token_recien_emitido_va_a_la_primaria(client, replica):
+    ruteo = replica()
+    autora = await crear_usuario()
+    await crear_obras(autora, 1)
+
+    login = await client.post("/usuarios/login", params={"email": autora.email})
+    assert login.status_code == 200
+    headers = {"Authorization": f"Bearer {login.json()['token']}"}
+
+    assert (await client.get("/obras/mis-obras", headers=headers)).status_code == 200
+    assert ruteo.metricas["read_your_writes"] == 1 and ruteo.metricas["replica"] == 0
+
+    cache_muro.invalidar()
+    assert (await client.get("/obras/muro")).status_code == 200
+    assert ruteo.metricas["replica"] == 1
+
+
+# Una escritura marca al usuario, no al token: otro token suyo también lee de la primaria; uno con firma
+# inválida no cuenta como él
+async def test_escritura_registrada_por_usuario_y_no_por_token(client, replica):
+    ruteo = replica()
+    autora = await crear_usuario()
+    obra, = await crear_obras(autora, 1, publicada=False)
+
+    publicar = await client.patch(f"/obras/{obra.id}/publicar", json={"publicada": True}, headers=autorizacion(autora))
+    assert publicar.status_code == 200
+
+    otro_token = jwt.encode({"sub": autora.email, "jti": "otra-sesion"}, SECRET_KEY, algorithm=ALGORITHM)
+    assert (await client.get("/obras/mis-obras", headers={"Authorization": f"Bearer {otro_token}"})).status_code == 200
+    assert ruteo.metricas["read_your_writes"] == 1
+
+    falsificado = jwt.encode({"sub": autora.email}, "otra-clave", algorithm=ALGORITHM)
+    cache_muro.invalidar()
+    assert (await client.get("/obras/muro", headers={"Authorization": f"Bearer {falsificado}"})).status_code == 200
+    assert ruteo.metricas["read_your_writes"] == 1 and ruteo.metricas["replica"] == 1
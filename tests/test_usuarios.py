@@ -0,0 +1,33 @@
+# Imports de terceros
+import pytest
+
+# Imports internos
+from tests.datos import crear_usuario
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_login_lee_las_credenciales_del_cuerpo(client):
+    usuario = await crear_usuario()
+
+    response = await client.post("/usuarios/login", json={"email": usuario.email})
+    assert response.status_code == 200
+    assert response.json()["user"]["id"] == usuario.id
+
+    # Usuario sin contraseña (alta por Google): si se manda una, no se acepta
+    response = await client.post("/usuarios/login", json={"email": usuario.email, "password": "x"})
+    assert response.status_code == 401
+
+    response = await client.post("/usuarios/login", json={"email": "otra@test.com"})
+    assert response.status_code == 401
+
+
+# Contrato anterior (?email=) sigue funcionando para los clientes existentes
+async def test_login_por_query_sigue_funcionando(client):
+    usuario = await crear_usuario()
+    response = await client.post("/usuarios/login", params={"email": usuario.email})
+    assert response.status_code == 200
+    assert response.json()["user"]["id"] == usuario.id
+
+    assert (await client.post("/usuarios/login", params={"email": "otra@test.com"})).status_code == 401
+    assert (await client.post("/usuarios/login")).status_code == 422
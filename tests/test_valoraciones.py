@@ -0,0 +1,75 @@
+# Imports estándar
+import asyncio
+from collections import Counter
+from decimal import Decimal, ROUND_DOWN
+
+# Imports de terceros
+import pytest
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+# Imports internos
+from app.db.database import SessionLocal
+from app.models.obra import Obra
+from app.models.valoracion import Valoracion
+from app.services.valoraciones import promedio_truncado
+from tests.datos import crear_usuario, crear_obras, autorizacion
+
+pytestmark = pytest.mark.anyio
+
+PEDIDOS = 100
+
+
+# Los agregados de la obra tienen que coincidir con la tabla de valoraciones
+async def _verificar_agregados(obra_id: str):
+    async with SessionLocal() as db:
+        obra = await db.get(Obra, obra_id)
+        suma, cantidad = (await db.execute(
+            select(func.coalesce(func.sum(Valoracion.puntuacion), 0), func.count(Valoracion.id))
+            .where(Valoracion.obra_id == obra_id)
+        )).one()
+    assert (obra.suma_puntuacion, obra.cantidad_valoraciones) == (suma, cantidad)
+    return suma, cantidad
+
+
+async def test_valoraciones_simultaneas_del_mismo_usuario(client):
+    obra = (await crear_obras(await crear_usuario(), 1))[0]
+    visitante = await crear_usuario("visitante@test.com", "visitante")
+    headers = autorizacion(visitante)
+
+    respuestas = await asyncio.gather(*[
+        client.post(f"/obras/{obra.id}/valorar", json={"puntuacion": 1 + i % 5}, headers=headers)
+        for i in range(PEDIDOS)
+    ])
+
+    assert Counter(r.status_code for r in respuestas) == {200: 1, 400: PEDIDOS - 1}
+    suma, cantidad = await _verificar_agregados(obra.id)
+    assert cantidad == 1 and 1 <= suma <= 5
+
+
+async def test_valoraciones_simultaneas_de_distintos_usuarios(client):
+    obra = (await crear_obras(await crear_usuario(), 1))[0]
+    visitantes = [await crear_usuario(f"v{i}@test.com", f"v{i}") for i in range(20)]
+
+    respuestas = await asyncio.gather(*[
+        client.post(f"/obras/{obra.id}/valorar", json={"puntuacion": 3}, headers=autorizacion(visitante))
+        for visitante in visitantes
+    ])
+
+    assert all(r.status_code == 200 for r in respuestas)
+    assert await _verificar_agregados(obra.id) == (3 * len(visitantes), len(visitantes))
+
+
+@pytest.mark.parametrize("suma,cantidad,esperado", [
+    (23, 5, 4.6), (23, 10, 2.3), (41, 10, 4.1), (7, 3, 2.33), (5, 1, 5.0), (1, 3, 0.33), (0, 0, None),
+])
+def test_promedio_truncado(suma, cantidad, esperado):
+    assert promedio_truncado(suma, cantidad) == esperado
+
+
+# Contra la truncación exacta con Decimal (lo que daba el avg de Postgres) para todas las cantidades 1..199
+def test_promedio_truncado_coincide_con_decimal():
+    for cantidad in range(1, 200):
+        for suma in range(cantidad, 5 * cantidad + 1):
+            exacto = (Decimal(suma) / Decimal(cantidad)).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
+            assert promedio_truncado(suma, cantidad) == float(exacto), (suma, cantidad)